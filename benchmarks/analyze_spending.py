@@ -0,0 +1,60 @@
+# benchmarks/analyze_spending.py
+"""Compare the row-by-row and vectorized analyze_spending paths.
+
+Usage: python benchmarks/analyze_spending.py [rows ...]
+
+Defaults to 10k, 1M and 10M rows. For each size the script times
+analyze_spending() on a list of expense dicts, on a DataFrame and on
+integer category codes, and checks that all three give identical output.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+import pandas as pd
+
+from finance_calculator import ALL_CATEGORIES, analyze_spending, summarize_columnar
+
+MONTHLY_INCOME = 10_000_000
+POOL_SIZE = 4096
+
+def timed(func, *args):
+    began = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - began
+
+def run(rows: int):
+    rng = np.random.default_rng(42)
+    pool_codes = rng.integers(0, len(ALL_CATEGORIES), size=POOL_SIZE)
+    pool_amounts = rng.integers(1_000, 1_000_000, size=POOL_SIZE).astype(float)
+    pick = rng.integers(0, POOL_SIZE, size=rows)
+
+    # Row dicts are shared from a small pool so 10M rows still fit in memory
+    pool = [{"category": ALL_CATEGORIES[code], "amount": amount}
+            for code, amount in zip(pool_codes.tolist(), pool_amounts.tolist())]
+    expenses = [pool[i] for i in pick.tolist()]
+    codes = pool_codes[pick]
+    amounts = pool_amounts[pick]
+    frame = pd.DataFrame({"category": np.array(ALL_CATEGORIES, dtype=object)[codes], "amount": amounts})
+
+    loop_result, loop_time = timed(analyze_spending, expenses, MONTHLY_INCOME)
+    frame_result, frame_time = timed(analyze_spending, frame, MONTHLY_INCOME)
+    codes_totals, codes_time = timed(summarize_columnar, codes, amounts)
+    codes_result = analyze_spending(codes_totals, MONTHLY_INCOME)
+
+    match = loop_result == frame_result == codes_result
+    print(f"{rows:>12,} rows | loop {loop_time * 1000:9.1f} ms | DataFrame {frame_time * 1000:8.1f} ms"
+          f" ({loop_time / frame_time:5.1f}x) | codes {codes_time * 1000:8.1f} ms"
+          f" ({loop_time / codes_time:5.1f}x) | {'match' if match else 'MISMATCH'}")
+    return match
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 1_000_000, 10_000_000]
+    ok = all([run(rows) for rows in sizes])
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
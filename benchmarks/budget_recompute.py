@@ -0,0 +1,101 @@
+# benchmarks/budget_recompute.py
+"""Check what saving a budget allocation recomputes in the app.
+
+Usage: python benchmarks/budget_recompute.py
+
+Opens the Budget Planner with AppTest for a user with expenses, reruns it
+several times, then saves a new allocation through the page's form and
+reruns again. Counts analyses and spending-total queries along the way
+and fails unless:
+
+- reruns without changes recompute nothing,
+- saving an allocation recomputes the analysis exactly once, without
+  querying the spending totals again,
+- the page, health score and ideal budget follow the new allocation,
+- an allocation that doesn't add up to 100 is rejected and changes nothing.
+
+Runs in a temporary directory, so no real database is touched.
+"""
+import os
+import sys
+import tempfile
+from collections import Counter
+from datetime import date, timedelta
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+RERUNS = 5
+
+def count_calls(module, name, counts):
+    original = getattr(module, name)
+
+    def counted(*args, **kwargs):
+        counts[name] += 1
+        return original(*args, **kwargs)
+    setattr(module, name, counted)
+
+def main():
+    os.chdir(tempfile.mkdtemp())
+    from streamlit.testing.v1 import AppTest
+    import finance_calculator
+    import finance_db
+
+    owner = finance_db.DEFAULT_USER_ID
+    finance_db.save_user_profile("Bench", 10_000_000, user_id=owner)
+    today = date.today()
+    finance_db.bulk_add_expenses([((today - timedelta(days=day)).isoformat(), category, 250_000.0)
+                                  for day in range(20) for category in ("Transportasi", "Hobi")], user_id=owner)
+
+    counts = Counter()
+    count_calls(finance_calculator, "analyze_spending", counts)
+    count_calls(finance_db, "get_spending_totals_for_windows", counts)
+
+    app = AppTest.from_file(os.path.join(ROOT, "streamlit_app.py"), default_timeout=120)
+    app.run()
+    app.sidebar.radio[0].set_value("📝 Budget Planner").run()
+
+    def step(label, action):
+        before = counts.copy()
+        action()
+        for _ in range(RERUNS - 1):
+            app.run()
+        delta = {name: counts[name] - before[name] for name in
+                 ("analyze_spending", "get_spending_totals_for_windows")}
+        # load_analysis analyses the window and the one before it
+        analyses = delta["analyze_spending"] // 2
+        print(f"{label:<28} | analyses {analyses} | totals queries {delta['get_spending_totals_for_windows']} | "
+              f"title {app.title[0].value!r}")
+        return analyses, delta["get_spending_totals_for_windows"]
+
+    def save(needs, wants, savings):
+        def action():
+            for label, value in (("Needs (%)", needs), ("Wants (%)", wants), ("Savings (%)", savings)):
+                next(field for field in app.number_input if field.label == label).set_value(value)
+            next(button for button in app.button if button.label == "💾 Save Allocation").click().run()
+            errors.extend(error.value for error in app.error)
+        return action
+
+    ok, errors = True, []
+    health_before = finance_calculator.get_financial_health_score(
+        finance_calculator.analyze_spending(finance_db.get_spending_totals(user_id=owner), 10_000_000))
+
+    ok &= step("reruns, no changes", app.run) == (0, 0)
+    ok &= step("save 60/25/15", save(60.0, 25.0, 15.0)) == (1, 0)
+    ok &= "60/25/15" in app.title[0].value
+    ok &= step("reruns after save", app.run) == (0, 0)
+
+    step_result = step("save 60/30/20 (invalid)", save(60.0, 30.0, 20.0))
+    ok &= step_result == (0, 0) and any("add up to 100" in error for error in errors)
+    ok &= finance_db.get_budget_allocation(owner)["needs_percentage"] == 60.0
+
+    allocation = finance_db.get_budget_allocation(owner)
+    analysis = finance_calculator.analyze_spending(finance_db.get_spending_totals(user_id=owner), 10_000_000, allocation=allocation)
+    ok &= analysis["ideal_budget"]["needs"] == 6_000_000
+    health_after = finance_calculator.get_financial_health_score(analysis)
+    print(f"Health score: {health_before['score']} with 50/30/20, {health_after['score']} with 60/25/15")
+    ok &= not app.exception
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
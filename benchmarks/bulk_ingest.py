@@ -0,0 +1,78 @@
+# benchmarks/bulk_ingest.py
+"""Measure bulk_add_expenses throughput into a local database file.
+
+Usage: python benchmarks/bulk_ingest.py [rows] [runs]
+
+Inserts `rows` generated expenses (default 500,000) with bulk_add_expenses
+into a fresh database file in a temporary directory, with every expense
+index and the monthly rollup in place, and prints rows per second for each
+of `runs` runs (default 3) and whether the best run of each order meets
+TARGET_ROWS_PER_SECOND. Rows are generated up front so only the insert
+is timed, once in date order (like a bank statement) and once shuffled.
+A last pass inserts the shuffled rows again on top of the first copy,
+since a large table costs more per insert than an empty one. Fails unless
+every row and the rollup totals are accounted for.
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import finance_db
+from finance_calculator import ALL_CATEGORIES
+
+TARGET_ROWS_PER_SECOND = 100_000
+
+def generate(count: int, seed: int = 7) -> list:
+    """(date, category, amount, note) tuples spread over three years, in random order"""
+    rng = random.Random(seed)
+    first_day = date(2022, 1, 1)
+    return [((first_day + timedelta(days=rng.randrange(1095))).isoformat(), rng.choice(ALL_CATEGORIES),
+             float(rng.randrange(5_000, 2_000_000, 500)), "") for _ in range(count)]
+
+def ingest(rows: list) -> float:
+    started = time.perf_counter()
+    inserted = finance_db.bulk_add_expenses(rows, user_id=finance_db.DEFAULT_USER_ID)
+    elapsed = time.perf_counter() - started
+    assert inserted == len(rows)
+    return len(rows) / elapsed
+
+def check(expected_rows: int) -> bool:
+    counted = finance_db.count_expenses(user_id=finance_db.DEFAULT_USER_ID)
+    totals = finance_db.get_spending_totals(user_id=finance_db.DEFAULT_USER_ID)
+    return counted["count"] == expected_rows == totals["expense_count"] and \
+        abs(counted["total"] - totals["total_expenses"]) < 1e-3 * max(counted["total"], 1)
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    os.chdir(tempfile.mkdtemp())
+    shuffled = generate(count)
+    orders = {"date order": sorted(shuffled, key=lambda row: row[0]), "shuffled": shuffled}
+
+    ok, best = True, {}
+    for number, (label, rows) in enumerate(orders.items()):
+        for run in range(runs):
+            finance_db.close_connections()
+            finance_db.DB_PATH = f"ingest_{number}_{run}.db"
+            finance_db.init_database()
+            rate = ingest(rows)
+            best[label] = max(best.get(label, 0), rate)
+            ok &= check(count)
+            print(f"{label:<10} run {run + 1}: {count:,} rows into an empty table | {rate:>9,.0f} rows/s")
+
+    rate = ingest(shuffled)
+    ok &= check(2 * count)
+    print(f"shuffled again: {count:,} rows on top of {count:,}   | {rate:>9,.0f} rows/s")
+    for label, rate in best.items():
+        verdict = "meets" if rate >= TARGET_ROWS_PER_SECOND else "BELOW"
+        print(f"best {label}: {rate:,.0f} rows/s, {verdict} the {TARGET_ROWS_PER_SECOND:,} rows/s target")
+    print(f"rows and rollup {'ok' if ok else 'MISMATCH'}")
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
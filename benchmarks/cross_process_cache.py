@@ -0,0 +1,94 @@
+# benchmarks/cross_process_cache.py
+"""Check that writes from other processes invalidate the app's cached reads.
+
+Usage: python benchmarks/cross_process_cache.py
+
+Renders the Dashboard with AppTest, then writes from separate processes
+through each documented entry point and reruns the app after each one:
+
+1. `python finance_importer.py` imports a statement for the default user,
+2. another process (standing in for a second app worker) adds an expense,
+3. `python finance_db.py rebuild-rollup` rewrites the rollup,
+4. another process saves a budget allocation,
+5. another process writes for a different user.
+
+Fails unless the Dashboard shows the new total (or split) on the very next
+rerun after 1-4, and unless 5 leaves every cached read in place. Runs in a
+temporary directory, so no real database is touched.
+"""
+import os
+import subprocess
+import sys
+import tempfile
+from datetime import date
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+def run(args):
+    subprocess.run([sys.executable] + args, check=True, capture_output=True)
+
+def write(code):
+    run(["-c", f"import sys; sys.path.insert(0, {ROOT!r}); import finance_db; {code}"])
+
+def main():
+    os.chdir(tempfile.mkdtemp())
+    from streamlit.testing.v1 import AppTest
+    import finance_db
+
+    today = date.today().isoformat()
+    owner = finance_db.DEFAULT_USER_ID
+    finance_db.save_user_profile("Bench", 10_000_000, user_id=owner)
+    finance_db.add_expense(today, "Hobi", 100_000.0, user_id=owner)
+    other = finance_db.get_or_create_user("other")
+    with open("statement.csv", "w") as handle:
+        handle.write(f"date,description,amount\n{today},GRAB RIDE,-50000\n{today},NETFLIX,-150000\n")
+
+    counts = {"queries": 0}
+    get_spending_totals_for_windows = finance_db.get_spending_totals_for_windows
+
+    def counted(*args, **kwargs):
+        counts["queries"] += 1
+        return get_spending_totals_for_windows(*args, **kwargs)
+    finance_db.get_spending_totals_for_windows = counted
+
+    app = AppTest.from_file(os.path.join(ROOT, "streamlit_app.py"), default_timeout=120)
+    app.run()
+
+    def total_expenses():
+        return next(metric.value for metric in app.metric if "Total Expenses" in metric.label)
+
+    def ideal_needs():
+        app.sidebar.radio[0].set_value("📝 Budget Planner").run()
+        value = app.metric[0].label
+        app.sidebar.radio[0].set_value("🏠 Dashboard").run()
+        return value
+
+    ok = True
+    steps = [
+        ("finance_importer.py", lambda: run([os.path.join(ROOT, "finance_importer.py"), "statement.csv"]),
+         total_expenses, True),
+        ("second worker write", lambda: write(f"finance_db.add_expense({today!r}, 'Hobi', 25000.0, user_id={owner})"),
+         total_expenses, True),
+        ("rebuild-rollup", lambda: run([os.path.join(ROOT, "finance_db.py"), "rebuild-rollup"]),
+         lambda: counts["queries"], True),
+        ("budget allocation", lambda: write(f"finance_db.save_budget_allocation(60, 25, 15, {owner})"),
+         ideal_needs, True),
+        ("other user's write", lambda: write(f"finance_db.add_expense({today!r}, 'Hobi', 1.0, '', user_id={other})"),
+         lambda: counts["queries"], False),
+    ]
+    for label, action, observe, should_change in steps:
+        app.run()
+        before = observe()
+        action()
+        app.run()
+        after = observe()
+        passed = (before != after) == should_change
+        ok = ok and passed
+        print(f"{label:<22} | {before!s:>16} -> {after!s:<16} | "
+              f"{'ok' if passed else 'FAILED'} ({'should' if should_change else 'should not'} change)")
+    ok = ok and not app.exception
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
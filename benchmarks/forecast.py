@@ -0,0 +1,49 @@
+# benchmarks/forecast.py
+"""Time the Monte Carlo goal forecaster.
+
+Usage: python benchmarks/forecast.py [goals] [paths]
+
+Forecasts `goals` goals (default 20) over `paths` simulated paths (default
+10,000) from 24 months of synthetic net flows, reporting time and peak
+memory, and checks that a constant net flow reproduces the exact month count.
+"""
+import os
+import sys
+import time
+import tracemalloc
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+
+from finance_forecast import forecast_goals
+
+def main():
+    goal_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    paths = int(sys.argv[2]) if len(sys.argv) > 2 else 10_000
+    today = date(2025, 1, 1)
+
+    rng = np.random.default_rng(42)
+    net_flows = rng.normal(3_000_000, 1_500_000, size=24)
+    goals = [{"id": i, "goal_name": f"Goal {i}", "target_amount": float(rng.integers(5, 200)) * 1_000_000,
+              "current_amount": 0.0, "deadline": "2027-01-01"} for i in range(goal_count)]
+
+    tracemalloc.start()
+    began = time.perf_counter()
+    forecasts = forecast_goals(goals, net_flows, paths=paths, seed=0, today=today)
+    elapsed = time.perf_counter() - began
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    exact = forecast_goals([{"goal_name": "Exact", "target_amount": 12_000_000, "current_amount": 0.0,
+                             "deadline": "2026-01-01"}], np.array([1_000_000.0]), paths=100, today=today)[0]
+    ok = exact['p50_months'] == 12 and exact['p50_date'] == "2026-01-01" and exact['deadline_probability'] == 1.0
+
+    print(f"{goal_count} goals x {paths:,} paths | {elapsed * 1000:7.1f} ms | peak {peak / 1e6:6.1f} MB | "
+          f"median P50 {np.median([f['p50_months'] for f in forecasts]):.0f} months | "
+          f"exact check {'ok' if ok else 'FAILED'}")
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
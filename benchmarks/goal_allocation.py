@@ -0,0 +1,57 @@
+# benchmarks/goal_allocation.py
+"""Time the savings allocator and check incremental updates against a full re-solve.
+
+Usage: python benchmarks/goal_allocation.py [goals] [updates]
+
+Builds an allocator over `goals` random goals (default 500), applies
+`updates` progress updates one goal at a time (default 200) and compares
+the result with an allocator built from scratch on the updated goals.
+"""
+import os
+import random
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from finance_goals import GoalAllocator
+
+MONTHLY_SAVINGS = 50_000_000
+DEADLINES = [None, "2025-06-01", "2026-01-01", "2027-06-01", "2030-01-01"]
+
+def main():
+    goal_count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    updates = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    today = date(2025, 1, 1)
+
+    rng = random.Random(42)
+    goals = [{"id": i, "goal_name": f"Goal {i}", "target_amount": rng.randrange(1, 200) * 1_000_000.0,
+              "current_amount": 0.0, "deadline": rng.choice(DEADLINES), "priority": rng.choice([1, 2, 3])}
+             for i in range(goal_count)]
+
+    began = time.perf_counter()
+    allocator = GoalAllocator(goals, MONTHLY_SAVINGS, today)
+    build_time = time.perf_counter() - began
+
+    began = time.perf_counter()
+    for _ in range(updates):
+        goal = rng.choice(goals)
+        goal["current_amount"] = min(goal["current_amount"] + rng.randrange(0, 20) * 1_000_000.0,
+                                     goal["target_amount"])
+        allocator.update_goal(goal["id"], goal["current_amount"])
+    update_time = (time.perf_counter() - began) / updates
+
+    fresh = GoalAllocator(goals, MONTHLY_SAVINGS, today).allocation()
+    plans = allocator.allocation()
+    match = plans == fresh
+    allocated = sum(plan["monthly_contribution"] for plan in plans.values())
+    on_track = sum(plan["meets_deadline"] is True for plan in plans.values())
+
+    print(f"{goal_count} goals | build {build_time * 1000:6.2f} ms | update {update_time * 1000:6.3f} ms | "
+          f"allocated {allocated / MONTHLY_SAVINGS:.0%} | {on_track} deadlines on track | "
+          f"{'match' if match and allocated <= MONTHLY_SAVINGS + 1e-6 else 'MISMATCH'}")
+    sys.exit(0 if match else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# benchmarks/monthly_trend.py
+"""Compare the monthly trend engine with analyzing each month separately.
+
+Usage: python benchmarks/monthly_trend.py [rows] [months]
+
+Fills a temporary database with `rows` expenses (default 1M) spread over
+`months` months (default 24), then times:
+
+- per-month: get_expenses() + analyze_spending() once per month
+- trend: one get_monthly_totals() GROUP BY + monthly_trend()
+
+and checks that both give the same totals, savings rates and health scores.
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import finance_db
+from finance_calculator import (ALL_CATEGORIES, analyze_spending, get_financial_health_score,
+                                monthly_trend, recent_month_windows)
+
+MONTHLY_INCOME = 10_000_000
+USER_ID = finance_db.DEFAULT_USER_ID
+
+def timed(func, *args):
+    began = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - began
+
+def per_month(windows):
+    trend = []
+    for window in windows:
+        expenses = finance_db.get_expenses(window.start, window.end, user_id=USER_ID)
+        analysis = analyze_spending(expenses, MONTHLY_INCOME)
+        trend.append((analysis['total_expenses'], analysis['savings_percentage'],
+                      get_financial_health_score(analysis)['score']))
+    return trend
+
+def engine(windows):
+    monthly_totals = finance_db.get_monthly_totals(windows[0].start[:7], windows[-1].start[:7], user_id=USER_ID)
+    return [(month['total_expenses'], month['savings_percentage'], month['health_score'])
+            for month in monthly_trend(monthly_totals, MONTHLY_INCOME, windows)]
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    months = int(sys.argv[2]) if len(sys.argv) > 2 else 24
+
+    with tempfile.TemporaryDirectory() as tmp:
+        finance_db.DB_PATH = os.path.join(tmp, "trend.db")
+        finance_db.init_database()
+
+        windows = recent_month_windows(months)
+        first = date.fromisoformat(windows[0].start)
+        span = (date.fromisoformat(windows[-1].end) - first).days + 1
+        rng = random.Random(42)
+        finance_db.bulk_add_expenses(
+            (((first + timedelta(days=rng.randrange(span))).isoformat(), rng.choice(ALL_CATEGORIES),
+              float(rng.randrange(1_000, 500_000)), "") for _ in range(rows)), user_id=USER_ID)
+
+        slow, slow_time = timed(per_month, windows)
+        fast, fast_time = timed(engine, windows)
+        finance_db.close_connections()
+
+    match = all(abs(a[0] - b[0]) < 1e-3 and abs(a[1] - b[1]) < 1e-6 and a[2] == b[2] for a, b in zip(slow, fast))
+    print(f"{rows:,} rows over {months} months | per-month {slow_time * 1000:9.1f} ms | "
+          f"trend engine {fast_time * 1000:7.1f} ms ({slow_time / fast_time:6.1f}x) | "
+          f"{'match' if match else 'MISMATCH'}")
+    sys.exit(0 if match else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# benchmarks/multi_user.py
+"""Load test per-user queries while the number of users grows.
+
+Usage: python benchmarks/multi_user.py [rows_per_user] [seconds]
+
+For 10, 100 and 1,000 users, builds a throwaway database where every user
+has `rows_per_user` expenses (default 500), then runs READERS reader threads
+(a 30-day spending total plus the first history page of a random user) next
+to WRITERS writer threads (add_expense for a random user) for `seconds`
+seconds (default 3). Prints read latency p50/p95 and write throughput, and
+exits non-zero if p95 at the largest user count is more than FLAT_FACTOR
+times p95 at the smallest.
+"""
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import finance_db
+from finance_calculator import ALL_CATEGORIES, rolling_window
+
+USER_COUNTS = (10, 100, 1000)
+READERS = 4
+WRITERS = 2
+FLAT_FACTOR = 3.0
+HISTORY_DAYS = 365
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(int(len(samples) * p / 100), len(samples) - 1)]
+
+def populate(user_ids, rows_per_user, rng):
+    first = date.today() - timedelta(days=HISTORY_DAYS)
+    for user_id in user_ids:
+        finance_db.save_user_profile(f"User {user_id}", 10_000_000, user_id=user_id)
+        rows = [((first + timedelta(days=rng.randrange(HISTORY_DAYS))).isoformat(), rng.choice(ALL_CATEGORIES),
+                 float(rng.randrange(1_000, 500_000)), "") for _ in range(rows_per_user)]
+        finance_db.bulk_add_expenses(rows, user_id=user_id)
+
+def run_load(user_ids, seconds):
+    window = rolling_window(30)
+    stop = threading.Event()
+    latencies, writes = [], []
+
+    def reader(seed):
+        rng, samples = random.Random(seed), []
+        while not stop.is_set():
+            user_id = rng.choice(user_ids)
+            began = time.perf_counter()
+            finance_db.get_spending_totals(window.start, window.end, user_id=user_id)
+            finance_db.get_expenses_page(user_id=user_id)
+            samples.append(time.perf_counter() - began)
+        latencies.extend(samples)
+
+    def writer(seed):
+        rng, count = random.Random(seed), 0
+        while not stop.is_set():
+            finance_db.add_expense(date.today().isoformat(), rng.choice(ALL_CATEGORIES),
+                                   float(rng.randrange(1_000, 500_000)), "", user_id=rng.choice(user_ids))
+            count += 1
+        writes.append(count)
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(READERS)]
+    threads += [threading.Thread(target=writer, args=(100 + i,)) for i in range(WRITERS)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return latencies, sum(writes) / seconds
+
+def main():
+    rows_per_user = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    p95s = []
+    for user_count in USER_COUNTS:
+        with tempfile.TemporaryDirectory() as tmp:
+            finance_db.DB_PATH = os.path.join(tmp, "users.db")
+            finance_db.init_database()
+            user_ids = [finance_db.get_or_create_user(f"user{i}") for i in range(user_count)]
+            populate(user_ids, rows_per_user, random.Random(42))
+
+            latencies, write_rate = run_load(user_ids, seconds)
+            finance_db.close_connections()
+
+        p50, p95 = percentile(latencies, 50), percentile(latencies, 95)
+        p95s.append(p95)
+        print(f"{user_count:5d} users x {rows_per_user} rows | {len(latencies):6d} reads | "
+              f"p50 {p50 * 1000:6.2f} ms | p95 {p95 * 1000:6.2f} ms | {write_rate:7.0f} writes/s")
+
+    flat = p95s[-1] <= FLAT_FACTOR * p95s[0]
+    print("latency flat" if flat else f"p95 grew {p95s[-1] / p95s[0]:.1f}x")
+    sys.exit(0 if flat else 1)
+
+if __name__ == "__main__":
+    main()
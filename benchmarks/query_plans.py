@@ -0,0 +1,91 @@
+# benchmarks/query_plans.py
+"""Time the hot expense reads on a large database and show the plans SQLite picks for them.
+
+Usage: python benchmarks/query_plans.py [rows]
+
+Builds a throwaway database with `rows` expenses (default 1,000,000) spread
+over USERS users, then runs each finance_db read below and prints its time
+and the query plan of every statement it issued (captured from the pooled
+connections, so this is the SQL the app runs). Exits non-zero if any of
+them scans the whole expenses table. tests/test_query_plans.py makes the
+same check on a small database.
+"""
+import os
+import random
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import finance_db
+from finance_calculator import ALL_CATEGORIES
+
+USERS = 20
+USER_ID = 7
+
+READS = {
+    "get_expenses(range)": lambda: finance_db.get_expenses("2024-03-01", "2024-03-31", user_id=USER_ID),
+    "summary by category": lambda: finance_db.get_expense_summary_by_category(USER_ID),
+    "totals, whole month": lambda: finance_db.get_spending_totals("2024-03-01", "2024-03-31", user_id=USER_ID),
+    "totals in range": lambda: finance_db.get_spending_totals("2024-03-05", "2024-04-20", user_id=USER_ID),
+    "category in range": lambda: finance_db.count_expenses("Hobi", "2024-03-01", "2024-03-31", user_id=USER_ID),
+    "history page": lambda: finance_db.get_expenses_page(after=("2024-03-15", 10**9), user_id=USER_ID),
+}
+
+def populate(rows: int):
+    start = date(2020, 1, 1)
+    per_user = rows // USERS
+    for user_id in range(1, USERS + 1):
+        finance_db.bulk_add_expenses((((start + timedelta(days=random.randrange(2000))).isoformat(),
+                                       random.choice(ALL_CATEGORIES), float(random.randrange(1000, 500000)))
+                                      for _ in range(per_user)), user_id=user_id)
+
+def trace_new_connections(statements: list):
+    """Record every statement run on pooled connections opened from now on"""
+    connect = finance_db.ConnectionPool._connect
+
+    def traced_connect(pool):
+        conn = connect(pool)
+        conn.set_trace_callback(statements.append)
+        return conn
+    finance_db.ConnectionPool._connect = traced_connect
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    with tempfile.TemporaryDirectory() as tmp:
+        finance_db.DB_PATH = os.path.join(tmp, "bench.db")
+        populate(rows)
+        with finance_db.get_connection() as conn:
+            conn.execute("ANALYZE")
+        finance_db.close_connections()
+
+        statements = []
+        trace_new_connections(statements)
+        failures = 0
+        plans = sqlite3.connect(finance_db.DB_PATH)
+        for name, read in READS.items():
+            read()
+            del statements[:]
+            began = time.perf_counter()
+            read()
+            elapsed = (time.perf_counter() - began) * 1000
+            steps = [row[3] for sql in statements if sql.lstrip().upper().startswith(("SELECT", "WITH"))
+                     for row in plans.execute("EXPLAIN QUERY PLAN " + sql)]
+            aliases = {"expenses"} | {alias for sql in statements for alias in
+                                      re.findall(r"\bexpenses\s+(?:AS\s+)?(?!WHERE|ORDER|GROUP|ON\b)(\w+)", sql, re.I)}
+            full_scan = any(step.split(" ")[0] == "SCAN" and step.split(" ")[1] in aliases for step in steps)
+            failures += full_scan
+            print(f"{name}: {elapsed:.1f} ms {'FULL SCAN' if full_scan else 'ok'}")
+            for step in steps:
+                print(f"    {step}")
+        plans.close()
+        finance_db.close_connections()
+
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
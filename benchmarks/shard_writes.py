@@ -0,0 +1,90 @@
+# benchmarks/shard_writes.py
+"""Measure write throughput as the number of shards grows.
+
+Usage: python benchmarks/shard_writes.py [writers] [seconds]
+
+For a single database file and for 2, 4 and 8 shards, runs `writers`
+processes (default 8) that each add expenses one transaction at a time for
+their own users for `seconds` seconds (default 3), and prints the commits
+per second. Processes are used so the measurement shows SQLite's one-writer
+lock rather than the GIL. A final check moves every user back to one file
+with rebalance() and verifies that no expense was lost.
+"""
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import finance_db
+from finance_calculator import ALL_CATEGORIES
+
+SHARD_COUNTS = (0, 2, 4, 8)
+USERS = 64
+
+def writer(db_path, shard_count, user_ids, seconds, start, counts):
+    finance_db.DB_PATH = db_path
+    finance_db.SHARD_COUNT = shard_count
+    rng, count = random.Random(user_ids[0]), 0
+    start.wait()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        finance_db.add_expense(date.today().isoformat(), rng.choice(ALL_CATEGORIES),
+                               float(rng.randrange(1_000, 500_000)), "", user_id=rng.choice(user_ids))
+        count += 1
+    counts.put(count)
+
+def run_writers(user_ids, writers, seconds):
+    start, counts = multiprocessing.Event(), multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=writer, args=(finance_db.DB_PATH, finance_db.SHARD_COUNT,
+                                                             user_ids[i::writers], seconds, start, counts))
+                 for i in range(writers)]
+    for process in processes:
+        process.start()
+    start.set()
+    written = sum(counts.get() for _ in processes)
+    for process in processes:
+        process.join()
+    return written
+
+def main():
+    writers = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 3
+    shard_count = finance_db.SHARD_COUNT
+
+    ok = True
+    baseline = None
+    for count in SHARD_COUNTS:
+        with tempfile.TemporaryDirectory() as tmp:
+            finance_db.DB_PATH = os.path.join(tmp, "catalog.db")
+            finance_db.SHARD_COUNT = count
+            finance_db.init_database()
+            user_ids = [finance_db.get_or_create_user(f"user{i}") for i in range(USERS)]
+            for user_id in user_ids:
+                finance_db.save_user_profile(f"User {user_id}", 10_000_000, user_id=user_id)
+            finance_db.close_connections()
+
+            written = run_writers(user_ids, writers, seconds)
+            rate = written / seconds
+            baseline = baseline or rate
+
+            # Collapse to one file and check every committed write survived the moves
+            finance_db.rebalance(0)
+            finance_db.SHARD_COUNT = 0
+            stored = sum(finance_db.count_expenses(user_id=user_id)['count'] for user_id in user_ids)
+            ok = ok and stored == written
+            finance_db.close_connections()
+
+        label = f"{count} shards" if count else "single file"
+        print(f"{label:>12} | {writers} writers | {rate:8.0f} writes/s ({rate / baseline:4.1f}x) | "
+              f"{'all rows kept' if stored == written else f'LOST {written - stored} rows'}")
+
+    finance_db.SHARD_COUNT = shard_count
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
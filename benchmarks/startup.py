@@ -0,0 +1,104 @@
+# benchmarks/startup.py
+"""Profile app startup: module imports, schema setup and first renders.
+
+Usage: python benchmarks/startup.py
+
+1. Runs `python -X importtime` on the modules streamlit_app imports at the
+   top level and prints the slowest ones. Fails if any of them pulls in
+   pandas, plotly.express, numpy or google.genai.
+2. Reruns the app several times with AppTest, counting create_schema()
+   calls. Fails unless the schema is set up exactly once per process.
+3. Times the first render of the app in a fresh process, for a new user
+   and for a user with data, and lists the heavy modules each one loaded.
+
+Every step runs in a subprocess inside a temporary directory, so imports
+start cold and no real database is touched.
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from datetime import date
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+APP_MODULES = ["finance_db", "finance_calculator", "finance_importer", "finance_chat",
+               "finance_context", "finance_history", "finance_goals"]
+HEAVY_MODULES = ["pandas", "plotly.express", "numpy", "google.genai"]
+RERUNS = 5
+
+RENDER_SCRIPT = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+from streamlit.testing.v1 import AppTest
+import finance_db
+calls = []
+create_schema = finance_db.create_schema
+finance_db.create_schema = lambda *args, **kwargs: calls.append(1) or create_schema(*args, **kwargs)
+if {with_data}:
+    finance_db.save_user_profile("Bench", 10_000_000, user_id=finance_db.DEFAULT_USER_ID)
+    finance_db.bulk_add_expenses([("{today}", "Hobi", 100_000.0), ("{today}", "Transportasi", 50_000.0)],
+                                 user_id=finance_db.DEFAULT_USER_ID)
+    preloaded = [name for name in {heavy!r} if name in sys.modules]
+else:
+    preloaded = []
+app = AppTest.from_file({app!r}, default_timeout=120)
+began = time.perf_counter()
+app.run()
+first = time.perf_counter() - began
+for _ in range({reruns} - 1):
+    app.run()
+print(json.dumps({{"first_render": first, "schema_setups": len(calls), "errors": [str(e.value) for e in app.exception],
+                  "loaded": [name for name in {heavy!r} if name in sys.modules and name not in preloaded]}}))
+"""
+
+def run_python(args, cwd):
+    result = subprocess.run([sys.executable] + args, cwd=cwd, capture_output=True, text=True)
+    if result.returncode:
+        raise RuntimeError(result.stderr[-2000:])
+    return result
+
+def import_profile(tmp):
+    """(total seconds, [(cumulative seconds, app module)] slowest first, heavy modules loaded)"""
+    code = f"import sys; sys.path.insert(0, {ROOT!r}); import " + ", ".join(APP_MODULES)
+    stderr = run_python(["-X", "importtime", "-c", code], tmp).stderr
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "self [us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules.append((int(cumulative) / 1e6, name.rstrip()))
+    # Top-level entries are the app modules themselves (plus interpreter startup, skipped)
+    top_level = [(seconds, name.strip()) for seconds, name in modules if name.strip() in APP_MODULES]
+    loaded = {name.strip() for _, name in modules}
+    return (sum(seconds for seconds, _ in top_level), sorted(top_level, reverse=True),
+            [name for name in HEAVY_MODULES if name in loaded])
+
+def render(tmp, with_data):
+    script = RENDER_SCRIPT.format(root=ROOT, app=os.path.join(ROOT, "streamlit_app.py"), with_data=with_data,
+                                  today=date.today().isoformat(), heavy=HEAVY_MODULES, reruns=RERUNS)
+    return json.loads(run_python(["-c", script], tmp).stdout.strip().splitlines()[-1])
+
+def main():
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        total, slowest, heavy = import_profile(tmp)
+        print(f"App module imports: {total * 1000:7.1f} ms")
+        for seconds, name in slowest[:8]:
+            print(f"  {seconds * 1000:7.1f} ms  {name}")
+        print(f"  heavy modules loaded: {', '.join(heavy) or 'none'}")
+        ok = ok and not heavy
+
+        for label, with_data in (("new user", False), ("user with data", True)):
+            with tempfile.TemporaryDirectory() as app_dir:
+                stats = render(app_dir, with_data)
+            print(f"First render ({label}): {stats['first_render'] * 1000:7.1f} ms | "
+                  f"schema set up {stats['schema_setups']}x over {RERUNS} runs | "
+                  f"loaded {', '.join(stats['loaded']) or 'no heavy modules'}"
+                  + (f" | ERRORS {stats['errors']}" if stats['errors'] else ""))
+            ok = ok and not stats['errors'] and stats['schema_setups'] == 1
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
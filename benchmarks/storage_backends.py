@@ -0,0 +1,116 @@
+# benchmarks/storage_backends.py
+"""An identical workload for every storage backend.
+
+Usage: python benchmarks/storage_backends.py [rows_per_user] [url ...]
+
+Runs against a temporary SQLite database, the in-memory backend and the
+Postgres backend on PostgresStandIn, plus any extra repository URLs given
+(e.g. postgresql://localhost/finance_test, which needs psycopg and an
+empty database). The same seeded workload (USERS users with
+`rows_per_user` expenses each, default 20,000, bulk inserted in batches of
+BATCH_SIZE on every backend) is timed phase by phase and the query results
+are compared across backends. Exits non-zero on any mismatch. The
+behaviour each backend must share is tested in tests/test_finance_storage.py.
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from finance_calculator import ALL_CATEGORIES
+from finance_storage import open_repository
+
+USERS = 5
+QUERIES = 300
+FIRST_DAY = date(2023, 1, 1)
+DAYS = 730
+BATCH_SIZE = 5_000
+
+# ==================== WORKLOAD ====================
+def workload(repo, rows_per_user: int):
+    """Time each phase of a seeded workload; returns ({phase: seconds}, results to compare)"""
+    rng = random.Random(42)
+    users = list(range(1_001, 1_001 + USERS))
+    timings, results = {}, []
+
+    def phase(name, func):
+        began = time.perf_counter()
+        func()
+        timings[name] = time.perf_counter() - began
+
+    def day():
+        return (FIRST_DAY + timedelta(days=rng.randrange(DAYS))).isoformat()
+
+    def bulk_insert():
+        for user_id in users:
+            repo.save_user_profile(f"User {user_id}", 10_000_000, user_id=user_id)
+            repo.bulk_add_expenses(((day(), rng.choice(ALL_CATEGORIES), float(rng.randrange(1_000, 500_000)))
+                                    for _ in range(rows_per_user)), BATCH_SIZE, user_id=user_id)
+
+    def single_inserts():
+        for _ in range(QUERIES):
+            repo.add_expense(day(), rng.choice(ALL_CATEGORIES), float(rng.randrange(1_000, 500_000)), "",
+                             user_id=rng.choice(users))
+
+    def range_totals():
+        for _ in range(QUERIES):
+            start = day()
+            end = (date.fromisoformat(start) + timedelta(days=rng.randrange(1, 90))).isoformat()
+            totals = repo.get_spending_totals(start, end, user_id=rng.choice(users))
+            results.append((round(totals["total_expenses"], 2), totals["expense_count"]))
+
+    def monthly_totals():
+        for _ in range(QUERIES):
+            months = repo.get_monthly_totals("2023-01", "2024-12", user_id=rng.choice(users))
+            results.append(tuple(round(m["total_expenses"], 2) for m in months.values()))
+
+    def pages():
+        for _ in range(QUERIES):
+            user_id, category = rng.choice(users), rng.choice([None] + ALL_CATEGORIES)
+            page = repo.get_expenses_page(category, user_id=user_id)
+            page = repo.get_expenses_page(category, after=(page[-1]["date"], page[-1]["id"]), user_id=user_id)
+            results.append(tuple((e["date"], e["amount"]) for e in page))
+
+    def deletes():
+        for _ in range(QUERIES // 10):
+            user_id = rng.choice(users)
+            page = repo.get_expenses_page(user_id=user_id, limit=5)
+            results.append(repo.delete_expenses([e["id"] for e in page], user_id))
+        results.append(tuple(repo.count_expenses(user_id=user_id)["count"] for user_id in users))
+
+    phase("bulk insert", bulk_insert)
+    phase(f"{QUERIES} inserts", single_inserts)
+    phase(f"{QUERIES} range totals", range_totals)
+    phase(f"{QUERIES} monthly", monthly_totals)
+    phase(f"{QUERIES} page pairs", pages)
+    phase(f"{QUERIES // 10} deletes", deletes)
+    return timings, results
+
+def main():
+    rows_per_user = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    extra_urls = sys.argv[2:]
+
+    ok = True
+    reference = None
+    with tempfile.TemporaryDirectory() as tmp:
+        urls = [f"sqlite:///{os.path.join(tmp, 'finance.db')}", "memory://",
+                f"standin://{os.path.join(tmp, 'standin.db')}"] + extra_urls
+        for url in urls:
+            name = url.split("://")[0]
+            repo = open_repository(url)
+            timings, results = workload(repo, rows_per_user)
+            repo.close()
+            reference = reference or results
+            same = results == reference
+            ok = ok and same
+            print(f"{name:>10} | "
+                  + " | ".join(f"{phase} {seconds * 1000:7.1f} ms" for phase, seconds in timings.items())
+                  + f" | {'same results' if same else 'RESULTS DIFFER'}")
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,8 @@
 # finance_calculator.py
-from datetime import datetime, timedelta
+import calendar
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+from types import MappingProxyType
 from typing import Dict, List
 
 # Expense categories mapping
@@ -24,33 +27,73 @@ EXPENSE_CATEGORIES = {
     ]
 }
 
-# Flatten all categories for dropdown
+EXPENSE_TYPES = ["Needs", "Wants", "Other"]
+
+# Flatten all categories for dropdown (kept in sync by rebuild_category_index)
 ALL_CATEGORIES = []
-for group, cats in EXPENSE_CATEGORIES.items():
-    ALL_CATEGORIES.extend(cats)
+
+# Precomputed lookups, rebuilt only when the category configuration changes:
+# CATEGORY_TYPES maps category -> "Needs"/"Wants"/"Other", CATEGORY_CODES maps
+# category -> stable integer code, CATEGORY_NAMES is the reverse of CATEGORY_CODES
+# and CATEGORY_TYPE_CODES gives the EXPENSE_TYPES index for each code.
+_category_types = {}
+_category_codes = {}
+CATEGORY_TYPES = MappingProxyType(_category_types)
+CATEGORY_CODES = MappingProxyType(_category_codes)
+CATEGORY_NAMES = []
+CATEGORY_TYPE_CODES = []
+CATEGORY_INDEX_VERSION = 0
+
+def _group_type(group: str) -> str:
+    """Expense type for a category group name"""
+    if "Kebutuhan" in group:
+        return "Needs"
+    elif "Keinginan" in group:
+        return "Wants"
+    return "Other"
+
+def rebuild_category_index():
+    """Rebuild ALL_CATEGORIES and the category lookup tables from EXPENSE_CATEGORIES
+
+    Existing categories keep their integer code; new ones get the next free code.
+    """
+    global CATEGORY_INDEX_VERSION
+    
+    ALL_CATEGORIES.clear()
+    _category_types.clear()
+    for group, cats in EXPENSE_CATEGORIES.items():
+        expense_type = _group_type(group)
+        for category in cats:
+            if category not in _category_types:
+                ALL_CATEGORIES.append(category)
+                _category_types[category] = expense_type
+            _category_codes.setdefault(category, len(_category_codes))
+    
+    CATEGORY_NAMES[:] = sorted(_category_codes, key=_category_codes.get)
+    CATEGORY_TYPE_CODES[:] = [EXPENSE_TYPES.index(_category_types.get(name, "Other")) for name in CATEGORY_NAMES]
+    CATEGORY_INDEX_VERSION += 1
+
+rebuild_category_index()
 
 def categorize_expense_type(category: str) -> str:
     """Determine if expense is Needs, Wants, or Other"""
-    for expense_type, categories in EXPENSE_CATEGORIES.items():
-        if category in categories:
-            if "Kebutuhan" in expense_type:
-                return "Needs"
-            elif "Keinginan" in expense_type:
-                return "Wants"
-            else:
-                return "Other"
-    return "Other"
+    return _category_types.get(category, "Other")
 
-def calculate_budget_503020(monthly_income: float) -> Dict[str, float]:
-    """Calculate 50/30/20 budget rule"""
+# Needs/Wants/Savings split used when a user has not set their own
+# (finance_db.get_budget_allocation)
+DEFAULT_BUDGET = MappingProxyType({"needs_percentage": 50.0, "wants_percentage": 30.0, "savings_percentage": 20.0})
+
+def calculate_budget_503020(monthly_income: float, allocation: Dict[str, float] = None) -> Dict[str, float]:
+    """Split income by the budget rule: 50/30/20 unless `allocation` gives other percentages"""
+    allocation = allocation or DEFAULT_BUDGET
     return {
-        "needs": monthly_income * 0.50,
-        "wants": monthly_income * 0.30,
-        "savings": monthly_income * 0.20
+        "needs": monthly_income * allocation['needs_percentage'] / 100,
+        "wants": monthly_income * allocation['wants_percentage'] / 100,
+        "savings": monthly_income * allocation['savings_percentage'] / 100
     }
 
-def analyze_spending(expenses: List[Dict], monthly_income: float) -> Dict:
-    """Analyze spending patterns and compare with 50/30/20 rule"""
+def summarize_expenses(expenses: List[Dict]) -> Dict:
+    """Aggregate expense rows into category and Needs/Wants/Other totals"""
     total_expenses = sum(exp['amount'] for exp in expenses)
     
     # Categorize expenses
@@ -79,18 +122,172 @@ def analyze_spending(expenses: List[Dict], monthly_income: float) -> Dict:
         else:
             other_total += amount
     
+    return {
+        "total_expenses": total_expenses,
+        "needs_total": needs_total,
+        "wants_total": wants_total,
+        "other_total": other_total,
+        "category_breakdown": category_breakdown,
+        "expense_count": len(expenses)
+    }
+
+def summarize_columnar(categories, amounts) -> Dict:
+    """Vectorized summarize_expenses() for columnar data
+
+    `categories` holds integer codes from CATEGORY_CODES, category names, or
+    a pandas categorical Series; `amounts` is the matching
+    numeric column. Category and type totals are accumulated in row order with
+    bincount and the grand total uses the builtin sum, so the result matches
+    summarize_expenses() on the same rows. Rows with a missing
+    category (code -1) are kept under that missing value and count as Other.
+    """
+    import numpy as np
+    
+    amounts = np.asarray(amounts, dtype=float)
+    
+    if hasattr(categories, "cat"):
+        # pandas categorical column: reuse its codes instead of hashing strings
+        names = list(categories.cat.categories)
+        codes = categories.cat.codes.to_numpy().astype(np.intp)
+        values = categories.to_numpy()
+    else:
+        values = categories = np.asarray(categories)
+        if categories.dtype.kind in "iu":
+            names = CATEGORY_NAMES
+            codes = categories.astype(np.intp, copy=False)
+            values = None
+        else:
+            import pandas as pd
+            codes, names = pd.factorize(categories)
+            names = list(names)
+    
+    if names is CATEGORY_NAMES:
+        type_of_code = list(CATEGORY_TYPE_CODES)
+    else:
+        type_of_code = [EXPENSE_TYPES.index(categorize_expense_type(name)) for name in names]
+    
+    # Missing categories get one extra code; like summarize_expenses(), they
+    # are keyed on the row's own value (None or NaN) and typed Other
+    missing = codes < 0
+    if missing.any():
+        first_missing = int(np.argmax(missing))
+        names = list(names) + [values[first_missing] if values is not None else None]
+        type_of_code.append(EXPENSE_TYPES.index("Other"))
+        codes = np.where(missing, len(names) - 1, codes)
+    
+    # Keep first-appearance order, like the dict built by summarize_expenses()
+    # (first row of each code in one pass; np.unique would sort the column)
+    first_seen = np.full(len(names), len(codes), dtype=np.intp)
+    np.minimum.at(first_seen, codes, np.arange(len(codes), dtype=np.intp))
+    present = np.flatnonzero(first_seen < len(codes))
+    order = present[np.argsort(first_seen[present])]
+    
+    category_sums = np.bincount(codes, weights=amounts, minlength=len(names))
+    
+    type_sums = np.bincount(np.array(type_of_code, dtype=np.intp)[codes], weights=amounts, minlength=len(EXPENSE_TYPES))
+    # The builtin sum, as in summarize_expenses(): it is compensated from
+    # Python 3.12 on, so a plain running total could differ in the last bits
+    total_expenses = sum(amounts.tolist())
+    
+    return {
+        "total_expenses": float(total_expenses),
+        "needs_total": float(type_sums[0]),
+        "wants_total": float(type_sums[1]),
+        "other_total": float(type_sums[2]),
+        "category_breakdown": {names[code]: float(category_sums[code]) for code in order},
+        "expense_count": len(amounts)
+    }
+
+# Analysis windows: inclusive ISO date range plus a display label
+Window = namedtuple("Window", ["start", "end", "label"])
+
+DAYS_PER_MONTH = 365.25 / 12
+
+def month_window(year: int, month: int) -> Window:
+    """Calendar month window"""
+    last_day = calendar.monthrange(year, month)[1]
+    return Window(date(year, month, 1).isoformat(), date(year, month, last_day).isoformat(),
+                  date(year, month, 1).strftime("%b %Y"))
+
+def rolling_window(days: int = 30, today: date = None) -> Window:
+    """The last `days` days, including today"""
+    today = today or date.today()
+    return Window((today - timedelta(days=days - 1)).isoformat(), today.isoformat(), f"Last {days} days")
+
+def ytd_window(today: date = None) -> Window:
+    """January 1st through today"""
+    today = today or date.today()
+    return Window(date(today.year, 1, 1).isoformat(), today.isoformat(), f"YTD {today.year}")
+
+def recent_month_windows(count: int, today: date = None) -> List[Window]:
+    """The last `count` calendar months (oldest first), ending with the current month"""
+    today = today or date.today()
+    index = today.year * 12 + today.month - 1
+    return [month_window(i // 12, i % 12 + 1) for i in range(index - count + 1, index + 1)]
+
+def previous_window(window: Window) -> Window:
+    """The comparable window just before `window` (previous month, previous N days, same period last year)"""
+    start, end = date.fromisoformat(window.start), date.fromisoformat(window.end)
+    if start.day == 1 and end.day == calendar.monthrange(end.year, end.month)[1] and start.replace(day=1) == end.replace(day=1):
+        index = start.year * 12 + start.month - 2
+        return month_window(index // 12, index % 12 + 1)
+    if start.month == 1 and start.day == 1 and end.year == start.year:
+        last_year_end = end.replace(year=end.year - 1, day=min(end.day, calendar.monthrange(end.year - 1, end.month)[1]))
+        return ytd_window(last_year_end)
+    days = (end - start).days + 1
+    return Window((start - timedelta(days=days)).isoformat(), (start - timedelta(days=1)).isoformat(),
+                  f"Previous {days} days")
+
+def window_months(window: Window) -> float:
+    """Length of a window in months, used to scale monthly income to the window"""
+    start, end = date.fromisoformat(window.start), date.fromisoformat(window.end)
+    if start.day == 1 and end.day == calendar.monthrange(end.year, end.month)[1]:
+        return float((end.year - start.year) * 12 + end.month - start.month + 1)
+    return ((end - start).days + 1) / DAYS_PER_MONTH
+
+def analyze_spending(expenses, monthly_income: float, months: float = 1.0,
+                     allocation: Dict[str, float] = None) -> Dict:
+    """Analyze spending patterns and compare with the user's budget rule
+
+    `expenses` is either a list of expense rows, a DataFrame with category
+    and amount columns, or pre-aggregated totals as returned by
+    summarize_expenses() or finance_db.get_spending_totals().
+
+    `months` is the length of the analysed window (see window_months());
+    income and the budget are scaled to it. `allocation` holds the budget
+    percentages (DEFAULT_BUDGET when omitted) and is kept in the result for
+    get_financial_health_score().
+    """
+    if isinstance(expenses, dict):
+        totals = expenses
+    elif hasattr(expenses, "columns"):
+        totals = summarize_columnar(expenses["category"], expenses["amount"])
+    else:
+        totals = summarize_expenses(expenses)
+    total_expenses = totals['total_expenses']
+    needs_total = totals['needs_total']
+    wants_total = totals['wants_total']
+    other_total = totals['other_total']
+    category_breakdown = totals['category_breakdown']
+    
+    # Income over the analysed window
+    income = monthly_income * months
+    
     # Calculate ideal budget
-    ideal_budget = calculate_budget_503020(monthly_income)
+    allocation = dict(allocation or DEFAULT_BUDGET)
+    ideal_budget = calculate_budget_503020(income, allocation)
     
     # Calculate savings
-    actual_savings = monthly_income - total_expenses
+    actual_savings = income - total_expenses
     
     # Calculate percentages
-    needs_percentage = (needs_total / monthly_income * 100) if monthly_income > 0 else 0
-    wants_percentage = (wants_total / monthly_income * 100) if monthly_income > 0 else 0
-    savings_percentage = (actual_savings / monthly_income * 100) if monthly_income > 0 else 0
+    needs_percentage = (needs_total / income * 100) if income > 0 else 0
+    wants_percentage = (wants_total / income * 100) if income > 0 else 0
+    savings_percentage = (actual_savings / income * 100) if income > 0 else 0
     
     return {
+        "income": income,
+        "months": months,
         "total_expenses": total_expenses,
         "needs_total": needs_total,
         "wants_total": wants_total,
@@ -100,12 +297,46 @@ def analyze_spending(expenses: List[Dict], monthly_income: float) -> Dict:
         "wants_percentage": wants_percentage,
         "savings_percentage": savings_percentage,
         "ideal_budget": ideal_budget,
+        "allocation": allocation,
         "category_breakdown": category_breakdown,
         "needs_difference": needs_total - ideal_budget["needs"],
         "wants_difference": wants_total - ideal_budget["wants"],
         "savings_difference": actual_savings - ideal_budget["savings"]
     }
 
+def savings_per_month(analysis: Dict) -> float:
+    """Savings per month over the analysed window, never below zero (what goals are funded from)"""
+    return max(analysis['actual_savings'] / (analysis.get('months') or 1.0), 0.0)
+
+def monthly_trend(monthly_totals: Dict[str, Dict], monthly_income: float, windows: List[Window],
+                  allocation: Dict[str, float] = None) -> List[Dict]:
+    """Per-month totals, savings rate and health score for each month window
+
+    `monthly_totals` maps "YYYY-MM" to totals (finance_db.get_monthly_totals());
+    months missing from it count as months with no spending.
+    """
+    empty = {"total_expenses": 0, "needs_total": 0, "wants_total": 0, "other_total": 0,
+             "category_breakdown": {}, "expense_count": 0}
+    trend = []
+    for window in windows:
+        totals = monthly_totals.get(window.start[:7], empty)
+        analysis = analyze_spending(totals, monthly_income, allocation=allocation)
+        health = get_financial_health_score(analysis)
+        trend.append({
+            "month": window.start[:7],
+            "label": window.label,
+            "total_expenses": analysis['total_expenses'],
+            "needs_total": analysis['needs_total'],
+            "wants_total": analysis['wants_total'],
+            "other_total": analysis['other_total'],
+            "actual_savings": analysis['actual_savings'],
+            "savings_percentage": analysis['savings_percentage'],
+            "health_score": health['score'],
+            "category_breakdown": analysis['category_breakdown'],
+            "expense_count": totals['expense_count']
+        })
+    return trend
+
 def calculate_savings_timeline(current_amount: float, target_amount: float, monthly_saving: float) -> Dict:
     """Calculate how long it takes to reach savings goal"""
     if monthly_saving <= 0:
@@ -133,22 +364,28 @@ def calculate_savings_timeline(current_amount: float, target_amount: float, mont
         "remaining_amount": remaining
     }
 
-def get_financial_health_score(analysis: Dict) -> Dict:
-    """Calculate financial health score (0-100)"""
+def get_financial_health_score(analysis: Dict, allocation: Dict[str, float] = None) -> Dict:
+    """Calculate financial health score (0-100)
+
+    Savings and needs targets come from `allocation`, else the allocation the
+    analysis was made with, else DEFAULT_BUDGET.
+    """
+    allocation = allocation or analysis.get('allocation') or DEFAULT_BUDGET
+    savings_target = allocation['savings_percentage']
     score = 0
     
-    # Savings rate (max 40 points)
-    if analysis['savings_percentage'] >= 20:
+    # Savings rate (max 40 points): the target, half of it, a quarter of it
+    if analysis['savings_percentage'] >= savings_target:
         score += 40
-    elif analysis['savings_percentage'] >= 10:
+    elif analysis['savings_percentage'] >= savings_target / 2:
         score += 30
-    elif analysis['savings_percentage'] >= 5:
+    elif analysis['savings_percentage'] >= savings_target / 4:
         score += 20
     else:
         score += 10
     
     # Budget adherence (max 30 points)
-    needs_adherence = max(0, 30 - abs(analysis['needs_percentage'] - 50) / 2)
+    needs_adherence = max(0, 30 - abs(analysis['needs_percentage'] - allocation['needs_percentage']) / 2)
     score += needs_adherence
     
     # Expense control (max 30 points)
@@ -187,9 +424,10 @@ def format_currency(amount: float) -> str:
 def get_financial_tips(analysis: Dict) -> List[str]:
     """Generate personalized financial tips based on spending analysis"""
     tips = []
+    savings_target = (analysis.get('allocation') or DEFAULT_BUDGET)['savings_percentage']
     
-    if analysis['savings_percentage'] < 10:
-        tips.append("💡 **Tip Tabungan**: Saving rate kamu di bawah 10%. Coba targetkan minimal 10-20% dari penghasilan untuk masa depan yang lebih aman.")
+    if analysis['savings_percentage'] < savings_target / 2:
+        tips.append(f"💡 **Tip Tabungan**: Saving rate kamu di bawah {savings_target / 2:g}%. Coba targetkan minimal {savings_target / 2:g}-{savings_target:g}% dari penghasilan untuk masa depan yang lebih aman.")
     
     if analysis['needs_difference'] > 0:
         tips.append(f"⚠️ **Pengeluaran Kebutuhan**: Over budget {format_currency(analysis['needs_difference'])}. Review tagihan bulanan dan cari alternatif lebih hemat.")
@@ -197,7 +435,7 @@ def get_financial_tips(analysis: Dict) -> List[str]:
     if analysis['wants_difference'] > 0:
         tips.append(f"🎯 **Pengeluaran Keinginan**: Over budget {format_currency(analysis['wants_difference'])}. Pertimbangkan mengurangi hiburan atau belanja yang tidak urgent.")
     
-    if analysis['savings_percentage'] > 30:
+    if analysis['savings_percentage'] > savings_target * 1.5:
         tips.append("✨ **Excellent!**: Saving rate kamu sangat baik! Pertimbangkan untuk mulai investasi agar uang bekerja untuk kamu.")
     
     # Category-specific tips
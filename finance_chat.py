@@ -0,0 +1,460 @@
+# finance_chat.py
+"""Chat helpers for the AI Finance Assistant.
+
+Wraps the Gemini chat session so replies can be streamed token by token
+with per-turn latency metrics, runs requests off the Streamlit thread with
+timeouts, retries and cancellation, caches answers to repeated questions,
+and provides a fake client so the chat page can be exercised offline (set
+FINANCE_FAKE_LLM=1).
+"""
+import asyncio
+import hashlib
+import os
+import queue
+import random
+import re
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Union
+
+import finance_db
+from finance_history import content_role, content_text, split_turns
+
+CHAT_MODEL = "gemini-2.5-flash"
+
+# Response cache settings
+RESPONSE_CACHE_FILE = "chat_cache.db"
+RESPONSE_CACHE_SIZE = 500
+RESPONSE_CACHE_TTL = 24 * 60 * 60
+# Earlier turns a cached answer must share with the question, so follow-ups
+# like "and last month?" only match answers given in the same conversation
+CACHE_HISTORY_TURNS = 2
+
+# Async request settings
+REQUEST_TIMEOUT = 60.0
+MAX_RETRIES = 3
+RETRY_BASE_DELAY = 0.5
+MAX_CONCURRENT_REQUESTS = 4
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+# Use the offline FakeClient instead of Gemini (no API key needed)
+FAKE_LLM = bool(os.environ.get("FINANCE_FAKE_LLM"))
+
+def create_client(api_key: str):
+    """Create the Gemini client, or a FakeClient when FINANCE_FAKE_LLM is set"""
+    if FAKE_LLM:
+        return FakeClient()
+    from google import genai
+    return genai.Client(api_key=api_key)
+
+def _record(metrics: Optional[List[Dict]], started: float, first_token: Optional[float],
+            chunks: int, chars: int, streamed: bool):
+    """Append a turn's time to first token ("ttft") and total latency in seconds to `metrics`"""
+    if metrics is None:
+        return
+    total = time.perf_counter() - started
+    metrics.append({
+        "ttft": first_token if first_token is not None else total,
+        "total": total,
+        "chunks": chunks,
+        "chars": chars,
+        "streamed": streamed
+    })
+
+# ==================== ASYNC CLIENT ====================
+
+class ChatRequestError(Exception):
+    """A chat request failed, timed out after all retries, or was cancelled"""
+
+class ChatCancelledError(ChatRequestError):
+    """The chat request was cancelled (conversation reset or page left)"""
+
+def is_transient(error: BaseException) -> bool:
+    """Whether a failed request is worth retrying"""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    return code in TRANSIENT_STATUS_CODES
+
+_DONE = object()
+_loop = None
+_loop_lock = threading.Lock()
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    """Process-wide event loop, running in a daemon thread, that executes chat requests"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="finance-chat-loop", daemon=True).start()
+        return _loop
+
+class AsyncChatClient:
+    """Non-blocking wrapper around an async Gemini chat (client.aio.chats.create).
+
+    Requests run on a background event loop so the Streamlit script thread
+    never blocks on the network. Each attempt has a timeout; transient errors
+    (timeouts, connection errors, 429/5xx) are retried with exponential
+    backoff, but only before the first chunk has been delivered. At most
+    `max_concurrent` requests per process are in flight at once; clients
+    created with the same limit share its slots.
+    """
+
+    # One semaphore per limit, so a client's max_concurrent always applies
+    _slots: Dict[int, asyncio.Semaphore] = {}
+
+    def __init__(self, timeout: float = REQUEST_TIMEOUT, max_retries: int = MAX_RETRIES,
+                 backoff: float = RETRY_BASE_DELAY, max_concurrent: int = MAX_CONCURRENT_REQUESTS):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_concurrent = max_concurrent
+
+    @classmethod
+    def _request_slots(cls, size: int) -> asyncio.Semaphore:
+        # Created lazily on the background loop, which is the only caller
+        if size not in cls._slots:
+            cls._slots[size] = asyncio.Semaphore(size)
+        return cls._slots[size]
+
+    async def _attempt(self, chat, message: str, out: queue.Queue, streaming: bool, delivered: list):
+        if streaming:
+            async for chunk in await chat.send_message_stream(message):
+                text = getattr(chunk, "text", None)
+                if text:
+                    delivered[0] = True
+                    out.put(text)
+        else:
+            response = await chat.send_message(message)
+            delivered[0] = True
+            out.put(response.text if hasattr(response, "text") else str(response))
+
+    async def _run(self, chat, message: str, out: queue.Queue, streaming: bool):
+        delivered = [False]
+        async with self._request_slots(self.max_concurrent):
+            for attempt in range(self.max_retries + 1):
+                try:
+                    await asyncio.wait_for(self._attempt(chat, message, out, streaming, delivered), self.timeout)
+                    return
+                except asyncio.CancelledError:
+                    raise
+                except Exception as error:
+                    if delivered[0] or attempt == self.max_retries or not is_transient(error):
+                        raise
+                    delay = self.backoff * (2 ** attempt)
+                    await asyncio.sleep(delay + random.uniform(0, delay / 10))
+
+    def stream(self, chat, message: str, metrics: Optional[List[Dict]] = None,
+               cancel: Optional[threading.Event] = None,
+               on_wait: Optional[Callable[[float], None]] = None,
+               streaming: bool = True) -> Iterator[str]:
+        """Yield reply chunks while the request runs in the background
+
+        `cancel` aborts the request when set. `on_wait` is called with the
+        elapsed seconds while waiting for the first chunk; in Streamlit it
+        should touch a placeholder so a rerun or page change interrupts the
+        wait. Closing the generator early also cancels the request.
+        """
+        out = queue.Queue()
+        future = asyncio.run_coroutine_threadsafe(self._run(chat, message, out, streaming), _background_loop())
+        future.add_done_callback(lambda _: out.put(_DONE))
+
+        started = time.perf_counter()
+        first_token = None
+        chunks = chars = 0
+        try:
+            while True:
+                try:
+                    item = out.get(timeout=0.25)
+                except queue.Empty:
+                    if cancel is not None and cancel.is_set():
+                        raise ChatCancelledError("Chat request cancelled")
+                    if on_wait and first_token is None:
+                        on_wait(time.perf_counter() - started)
+                    continue
+                if item is _DONE:
+                    break
+                if first_token is None:
+                    first_token = time.perf_counter() - started
+                chunks += 1
+                chars += len(item)
+                yield item
+
+            if future.cancelled():
+                raise ChatCancelledError("Chat request cancelled")
+            error = future.exception()
+            if isinstance(error, (asyncio.TimeoutError, TimeoutError)):
+                raise ChatRequestError(f"No reply within {self.timeout:g}s") from error
+            if error is not None:
+                raise ChatRequestError(str(error)) from error
+        finally:
+            if not future.done():
+                future.cancel()
+            _record(metrics, started, first_token, chunks, chars, streamed=streaming)
+
+    def send(self, chat, message: str, metrics: Optional[List[Dict]] = None,
+             cancel: Optional[threading.Event] = None,
+             on_wait: Optional[Callable[[float], None]] = None) -> str:
+        """Wait for the whole reply (non-streaming mode), still off the script thread"""
+        return "".join(self.stream(chat, message, metrics, cancel, on_wait, streaming=False))
+
+# ==================== RESPONSE CACHE ====================
+
+def normalize_prompt(prompt: str) -> str:
+    """Normalize a question so trivial variations share a cache entry"""
+    text = re.sub(r"[^\w\s]", " ", prompt.lower())
+    return " ".join(text.split())
+
+def context_hash(context: str) -> str:
+    """Short stable hash of the financial context"""
+    return hashlib.sha256(context.encode("utf-8")).hexdigest()[:16]
+
+def history_hash(history: List, turns: int = CACHE_HISTORY_TURNS) -> str:
+    """Short stable hash of the last `turns` turns of a chat history"""
+    recent = [content for turn in split_turns(history)[-turns:] for content in turn] if turns else []
+    text = "\0".join(f"{content_role(content)}:{normalize_prompt(content_text(content))}" for content in recent)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+class ResponseCache:
+    """Persistent LRU/TTL cache of assistant answers, stored in SQLite.
+
+    Entries are keyed on the user, the normalized prompt, a hash of the
+    financial context and a hash of the last few turns of the conversation,
+    so any change to the user's data misses the cache and a follow-up
+    question only reuses an answer given after the same turns. Hit and miss
+    counters are kept for this process.
+    """
+
+    def __init__(self, path: str = None, max_entries: int = RESPONSE_CACHE_SIZE,
+                 ttl: float = RESPONSE_CACHE_TTL):
+        if path is None:
+            path = os.path.join(os.path.dirname(os.path.abspath(finance_db.DB_PATH)), RESPONSE_CACHE_FILE)
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+        CREATE TABLE IF NOT EXISTS response_cache (
+            key TEXT PRIMARY KEY,
+            prompt TEXT NOT NULL,
+            answer TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            last_used REAL NOT NULL
+        )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_response_cache_last_used ON response_cache(last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(prompt: str, context: str, history: List = (), *, user_id: int) -> str:
+        key = f"{user_id}\0{normalize_prompt(prompt)}\0{context_hash(context)}\0{history_hash(list(history))}"
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def get(self, prompt: str, context: str, history: List = (), *, user_id: int) -> Optional[str]:
+        """Cached answer for this prompt, context and conversation, or None"""
+        key = self.make_key(prompt, context, history, user_id=user_id)
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT answer, created_at FROM response_cache WHERE key=?", (key,)).fetchone()
+            if row and now - row[1] <= self.ttl:
+                self._conn.execute("UPDATE response_cache SET last_used=? WHERE key=?", (now, key))
+                self.hits += 1
+                return row[0]
+            if row:
+                self._conn.execute("DELETE FROM response_cache WHERE key=?", (key,))
+            self.misses += 1
+            return None
+
+    def put(self, prompt: str, context: str, answer: str, history: List = (), *, user_id: int):
+        """Store an answer, evicting the least recently used entries beyond max_entries"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, prompt, answer, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (self.make_key(prompt, context, history, user_id=user_id), prompt, answer, now, now)
+            )
+            self._conn.execute("""
+            DELETE FROM response_cache WHERE key IN (
+                SELECT key FROM response_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+            )
+            """, (self.max_entries,))
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM response_cache")
+
+    def stats(self) -> Dict:
+        """Hit/miss counters for this process and the number of stored entries"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries
+        }
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+def get_response_cache() -> ResponseCache:
+    """Process-wide ResponseCache stored next to the finance database"""
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache()
+        return _response_cache
+
+def cached_reply(cache: ResponseCache, prompt: str, context: str, history: List = (),
+                 metrics: Optional[List[Dict]] = None, *, user_id: int) -> Optional[str]:
+    """Look up a cached answer; on a hit the turn is recorded in `metrics` as cached"""
+    started = time.perf_counter()
+    answer = cache.get(prompt, context, history, user_id=user_id)
+    if answer is not None and metrics is not None:
+        elapsed = time.perf_counter() - started
+        metrics.append({"ttft": elapsed, "total": elapsed, "chunks": 1, "chars": len(answer),
+                        "streamed": False, "cached": True})
+    return answer
+
+def local_reply(prompt: str, profile: Dict, goals: List[Dict],
+                metrics: Optional[List[Dict]] = None) -> Optional[str]:
+    """Answer factual lookups locally via finance_intents; None means ask the LLM"""
+    from finance_intents import route_question
+
+    started = time.perf_counter()
+    answer = route_question(prompt, profile, goals)
+    if answer is not None and metrics is not None:
+        elapsed = time.perf_counter() - started
+        metrics.append({"ttft": elapsed, "total": elapsed, "chunks": 1, "chars": len(answer),
+                        "streamed": False, "local": True})
+    return answer
+
+# ==================== FAKE CLIENT ====================
+
+class FakeResponse:
+    """Minimal stand-in for a GenerateContentResponse"""
+
+    def __init__(self, text: str):
+        self.text = text
+
+def _content(role: str, text: str) -> Dict:
+    return {"role": role, "parts": [{"text": text}]}
+
+class FakeChat:
+    """Offline chat session that replies from a canned list or a callable.
+
+    Replies are streamed in `chunk_size` character pieces with an optional
+    `delay` (seconds) before each chunk to simulate network latency.
+    """
+
+    def __init__(self, replies: Union[List[str], Callable[[str], str], None] = None,
+                 chunk_size: int = 8, delay: float = 0.0, config=None, history=None):
+        self.replies = replies
+        self.chunk_size = chunk_size
+        self.delay = delay
+        self.config = config
+        self.history = list(history or [])
+        self.sent = []
+
+    def _reply(self, message: str) -> str:
+        if callable(self.replies):
+            return self.replies(message)
+        if self.replies:
+            return self.replies[(len(self.sent) - 1) % len(self.replies)]
+        return f"(offline) Kamu bertanya: {message.splitlines()[-1] if message else ''}"
+
+    def send_message(self, message: str, config=None) -> FakeResponse:
+        self.sent.append(message)
+        if self.delay:
+            time.sleep(self.delay)
+        answer = self._reply(message)
+        self.history.extend([_content("user", message), _content("model", answer)])
+        return FakeResponse(answer)
+
+    def send_message_stream(self, message: str, config=None) -> Iterator[FakeResponse]:
+        self.sent.append(message)
+        answer = self._reply(message)
+        for start in range(0, len(answer), self.chunk_size):
+            if self.delay:
+                time.sleep(self.delay)
+            yield FakeResponse(answer[start:start + self.chunk_size])
+        self.history.extend([_content("user", message), _content("model", answer)])
+
+    def get_history(self):
+        return list(self.history)
+
+class FakeTransientError(Exception):
+    """Simulated 503 from the API, used to exercise retries"""
+    code = 503
+
+class FakeAsyncChat(FakeChat):
+    """Async counterpart of FakeChat (client.aio.chats.create).
+
+    `fail_times` makes the first N requests raise FakeTransientError and
+    `hang` makes every request wait forever, to exercise retries and timeouts.
+    """
+
+    def __init__(self, fail_times: int = 0, hang: bool = False, **options):
+        super().__init__(**options)
+        self.fail_times = fail_times
+        self.hang = hang
+        self.attempts = 0
+
+    async def _start(self):
+        self.attempts += 1
+        if self.hang:
+            await asyncio.Event().wait()
+        if self.attempts <= self.fail_times:
+            raise FakeTransientError("503 Service Unavailable (fake)")
+
+    async def send_message(self, message: str, config=None) -> FakeResponse:
+        await self._start()
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.sent.append(message)
+        answer = self._reply(message)
+        self.history.extend([_content("user", message), _content("model", answer)])
+        return FakeResponse(answer)
+
+    async def send_message_stream(self, message: str, config=None):
+        await self._start()
+        self.sent.append(message)
+        answer = self._reply(message)
+
+        async def chunks():
+            for start in range(0, len(answer), self.chunk_size):
+                if self.delay:
+                    await asyncio.sleep(self.delay)
+                yield FakeResponse(answer[start:start + self.chunk_size])
+            self.history.extend([_content("user", message), _content("model", answer)])
+
+        return chunks()
+
+class FakeChats:
+    def __init__(self, chat_class=FakeChat, **chat_options):
+        self.chat_class = chat_class
+        self.chat_options = chat_options
+        self.created = []
+
+    def create(self, model: str = CHAT_MODEL, config=None, history=None) -> FakeChat:
+        chat = self.chat_class(config=config, history=history, **self.chat_options)
+        self.created.append(chat)
+        return chat
+
+class FakeAio:
+    def __init__(self, **chat_options):
+        self.chats = FakeChats(FakeAsyncChat, **chat_options)
+
+class FakeClient:
+    """Drop-in for genai.Client exposing client.chats and client.aio.chats"""
+
+    def __init__(self, **chat_options):
+        async_options = {key: chat_options.pop(key) for key in ("fail_times", "hang") if key in chat_options}
+        self.chats = FakeChats(**chat_options)
+        self.aio = FakeAio(**chat_options, **async_options)
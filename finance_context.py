@@ -0,0 +1,114 @@
+# finance_context.py
+"""Build the financial context the chat assistant sends to Gemini.
+
+The context is sent once per chat session as a system instruction rather
+than prepended to every prompt. It is memoized per finance_db data version
+and analysis window, and trimmed to a token budget, dropping lower-priority sections first.
+"""
+import heapq
+import os
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Dict, List, Optional
+
+from finance_calculator import format_currency
+
+# Rough token budget for the context block (override with FINANCE_CONTEXT_TOKENS)
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("FINANCE_CONTEXT_TOKENS", "400"))
+TOP_CATEGORIES = 3
+CHARS_PER_TOKEN = 4
+CACHE_SIZE = 32
+
+SYSTEM_PROMPT = (
+    "Kamu adalah asisten keuangan pribadi. Jawab dalam bahasa yang dipakai user, "
+    "singkat dan praktis, dan gunakan data keuangan user di bawah ini sebagai konteks."
+)
+
+# Shared by every Streamlit script thread, so reads and writes take the lock
+_context_cache = OrderedDict()
+_context_lock = threading.Lock()
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (about four characters per token)"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def top_categories(category_breakdown: Dict[str, float], k: int = TOP_CATEGORIES):
+    """Largest k categories by amount, without sorting the whole breakdown"""
+    return heapq.nlargest(k, category_breakdown.items(), key=lambda item: item[1])
+
+def budget_rule(allocation: Dict[str, float]) -> str:
+    """Allocation as "50/30/20" style text"""
+    return "/".join(f"{allocation[key]:g}" for key in ("needs_percentage", "wants_percentage", "savings_percentage"))
+
+def build_financial_context(profile: Dict, analysis: Optional[Dict], goals: List[Dict],
+                            max_tokens: int = CONTEXT_TOKEN_BUDGET) -> str:
+    """Render the user's financial context within roughly `max_tokens` tokens
+
+    Sections are added in priority order (profile, summary, top categories,
+    goals); goals are cut off with a "... more" line once the budget is used up.
+    """
+    sections = [f"""User Profile:
+- Name: {profile['name']}
+- Monthly Income: {format_currency(profile['monthly_income'])}
+- Status: {profile['status']}
+"""]
+
+    if analysis and analysis['total_expenses']:
+        sections.append(f"""Financial Summary:
+- Total Expenses: {format_currency(analysis['total_expenses'])}
+- Current Savings: {format_currency(analysis['actual_savings'])}
+- Savings Rate: {analysis['savings_percentage']:.1f}%
+- Needs Spending: {format_currency(analysis['needs_total'])} ({analysis['needs_percentage']:.1f}%)
+- Wants Spending: {format_currency(analysis['wants_total'])} ({analysis['wants_percentage']:.1f}%)
+- Budget Rule: {budget_rule(analysis['allocation'])} (Needs/Wants/Savings)
+""")
+        top = "Top Expense Categories:\n"
+        for category, amount in top_categories(analysis['category_breakdown']):
+            top += f"- {category}: {format_currency(amount)}\n"
+        sections.append(top)
+
+    context = ""
+    for section in sections:
+        if estimate_tokens(context + section) > max_tokens and context:
+            return context
+        context += section + "\n"
+
+    if goals:
+        context += "Savings Goals:\n"
+        for shown, goal in enumerate(goals):
+            line = f"- {goal['goal_name']}: {format_currency(goal['current_amount'])} / {format_currency(goal['target_amount'])}\n"
+            if estimate_tokens(context + line) > max_tokens:
+                context += f"- ... and {len(goals) - shown} more goals\n"
+                break
+            context += line
+
+    return context
+
+def get_financial_context(data_version, profile: Dict, analysis: Optional[Dict], goals: List[Dict],
+                          window=None, max_tokens: int = CONTEXT_TOKEN_BUDGET) -> str:
+    """Memoized build_financial_context(), keyed on the user, `data_version` and `window`
+
+    `data_version` is any hashable that changes whenever the stored data does,
+    e.g. the user's finance_db data and budget versions. `window` is the
+    period `analysis` covers; a rolling window moves with the date even when
+    no data changes. Without a window, entries are keyed on today's date.
+    """
+    key = (profile.get('user_id'), data_version, window or date.today().isoformat(), max_tokens)
+    with _context_lock:
+        if key in _context_cache:
+            _context_cache.move_to_end(key)
+            return _context_cache[key]
+
+    context = build_financial_context(profile, analysis, goals, max_tokens)
+    with _context_lock:
+        # Another thread may have built the same entry meanwhile; keep the first
+        context = _context_cache.setdefault(key, context)
+        _context_cache.move_to_end(key)
+        if len(_context_cache) > CACHE_SIZE:
+            _context_cache.popitem(last=False)
+    return context
+
+def system_instruction(context: str, digest: str = "") -> str:
+    """Full system instruction for a chat session, with the digest of older turns if any"""
+    return "\n\n".join(part for part in (SYSTEM_PROMPT, context, digest) if part)
@@ -1,14 +1,654 @@
 # finance_db.py
+import argparse
+import calendar
+import getpass
+import hashlib
+import hmac
+import secrets
 import sqlite3
 import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
 from datetime import datetime
-from typing import List, Dict, Any
+from itertools import islice
+from operator import itemgetter
+from typing import Callable, Iterable, List, Dict, Any, Optional, Sequence
+
+import finance_calculator
+from finance_calculator import ALL_CATEGORIES, CATEGORY_CODES, CATEGORY_TYPES, DEFAULT_BUDGET, EXPENSE_TYPES
 
 DB_PATH = "finance_data.db"
 
-def init_database():
-    """Initialize the finance database with necessary tables"""
-    conn = sqlite3.connect(DB_PATH)
+# Owner of the data created before per-user storage existed. Every API function
+# takes the user_id explicitly; it is keyword-only after optional parameters.
+DEFAULT_USER_ID = 1
+
+# Sharding. With SHARD_COUNT = 0 every user lives in DB_PATH. Otherwise DB_PATH
+# is the catalog (users and shared lookups) and each user's rows live in a
+# shard file next to it, picked when the user is created and recorded in
+# users.shard. FINANCE_DB_SHARDS=user gives every user a file of their own.
+PER_USER_SHARDS = -1
+
+def _shard_count(value: str) -> int:
+    return PER_USER_SHARDS if value == "user" else int(value)
+
+SHARD_COUNT = _shard_count(os.environ.get("FINANCE_DB_SHARDS", "0"))
+MAX_OPEN_SHARDS = 32
+
+# Connection tuning
+POOL_SIZE = 8
+BULK_BATCH_SIZE = 50000
+PAGE_SIZE = 50
+STATEMENT_CACHE_SIZE = 256
+CACHE_SIZE_KB = 16000
+
+class ShardConnection(sqlite3.Connection):
+    """sqlite3 connection that remembers which database file it belongs to"""
+    path = None
+
+class ConnectionPool:
+    """Small pool of long-lived SQLite connections shared across threads.
+
+    Streamlit runs every rerun in a script thread, so connections are opened
+    with check_same_thread=False and handed out one borrower at a time.
+    """
+
+    def __init__(self, path: str, size: int = POOL_SIZE):
+        self.path = path
+        self.size = size
+        self.closed = False
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.path,
+            timeout=30,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE,
+            factory=ShardConnection
+        )
+        conn.path = self.path
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KB}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self._connect()
+
+    def release(self, conn: sqlite3.Connection):
+        with self._lock:
+            if not self.closed and len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def close(self):
+        with self._lock:
+            self.closed = True
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+class ShardRouter:
+    """Maps users to shard files and keeps an LRU of open shard pools.
+
+    A user's shard is read from the catalog once and cached. Shard files are
+    created and migrated on first use; when more than `max_open` shards are
+    open, the least recently used pool is closed.
+    """
+
+    def __init__(self, catalog_path: str, shard_count: int = 0, max_open: int = MAX_OPEN_SHARDS):
+        self.catalog_path = catalog_path
+        self.shard_count = shard_count
+        self.max_open = max_open
+        self.catalog = ConnectionPool(catalog_path)
+        self._pools = OrderedDict()
+        self._user_shards = {}
+        self._catalog_version = None
+        self._ready = set()
+        self._lock = threading.Lock()
+        self._schema_lock = threading.Lock()
+
+    def default_shard(self, user_id: int, shard_count: int = None) -> Optional[str]:
+        """Shard a user is placed on with `shard_count` shards (None = the catalog file)"""
+        shard_count = self.shard_count if shard_count is None else shard_count
+        if shard_count == PER_USER_SHARDS:
+            return f"user-{user_id}"
+        if shard_count > 0:
+            return f"shard-{user_id % shard_count}"
+        return None
+
+    def shard_path(self, shard: Optional[str]) -> str:
+        if shard is None:
+            return self.catalog_path
+        base, ext = os.path.splitext(self.catalog_path)
+        return f"{base}.{shard}{ext or '.db'}"
+
+    def shard_of(self, user_id: int) -> Optional[str]:
+        """Shard holding a user's rows, from the catalog (unknown users get their default shard)"""
+        with self._lock:
+            if user_id in self._user_shards:
+                return self._user_shards[user_id]
+        conn = self.catalog.acquire()
+        try:
+            row = conn.execute("SELECT shard FROM users WHERE id=?", (user_id,)).fetchone()
+        finally:
+            self.catalog.release(conn)
+        shard = row['shard'] if row else self.default_shard(user_id)
+        with self._lock:
+            self._user_shards[user_id] = shard
+        return shard
+
+    def set_shard(self, user_id: int, shard: Optional[str]):
+        with self._lock:
+            self._user_shards[user_id] = shard
+
+    def refresh(self, catalog_version: int):
+        """Forget cached shard lookups if the catalog changed (e.g. another process moved users)"""
+        with self._lock:
+            if catalog_version != self._catalog_version:
+                self._catalog_version = catalog_version
+                self._user_shards.clear()
+
+    def pool(self, shard: Optional[str]) -> ConnectionPool:
+        """Pool for a shard, opening (and on first use creating) its file"""
+        if shard is None:
+            return self.catalog
+        with self._lock:
+            pool = self._pools.get(shard)
+            if pool is not None:
+                self._pools.move_to_end(shard)
+                return pool
+            pool = ConnectionPool(self.shard_path(shard))
+            self._pools[shard] = pool
+            evicted = self._pools.popitem(last=False)[1] if len(self._pools) > self.max_open else None
+        if evicted is not None:
+            evicted.close()
+        if pool.path not in self._ready:
+            self._prepare(pool)
+        return pool
+
+    def _prepare(self, pool: ConnectionPool):
+        """Create or migrate a shard's schema the first time it is opened in this process"""
+        with self._schema_lock:
+            if pool.path in self._ready:
+                return
+            conn = pool.acquire()
+            try:
+                with conn:
+                    create_schema(conn, catalog=False)
+                    sync_category_types(conn, force=True)
+            finally:
+                pool.release(conn)
+            self._ready.add(pool.path)
+
+    def pool_for(self, user_id: Optional[int]) -> ConnectionPool:
+        """Pool holding a user's rows; the catalog without a user"""
+        return self.catalog if user_id is None else self.pool(self.shard_of(user_id))
+
+    def close(self):
+        with self._lock:
+            pools, self._pools = list(self._pools.values()), OrderedDict()
+        for pool in pools:
+            pool.close()
+        self.catalog.close()
+
+_router = None
+_router_lock = threading.Lock()
+
+# Router that replaces the DB_PATH one inside use_router(), so callers such as
+# finance_storage.SQLiteRepository can each keep their own database files
+_active_router: ContextVar[Optional[ShardRouter]] = ContextVar("finance_db_router", default=None)
+
+@contextmanager
+def use_router(router: ShardRouter):
+    """Send every finance_db call made inside the block to `router`'s files instead of DB_PATH's"""
+    token = _active_router.set(router)
+    try:
+        yield router
+    finally:
+        _active_router.reset(token)
+
+def close_router(router: ShardRouter):
+    """Close a router passed to use_router(); its files' schema is checked again on next use"""
+    router.close()
+    _initialized_paths.discard(router.catalog_path)
+
+def _get_router() -> ShardRouter:
+    """Return the use_router() router, else the one for the current DB_PATH and SHARD_COUNT
+
+    The DB_PATH router is recreated if either setting changed.
+    """
+    active = _active_router.get()
+    if active is not None:
+        return active
+    global _router
+    with _router_lock:
+        if _router is None or (_router.catalog_path, _router.shard_count) != (DB_PATH, SHARD_COUNT):
+            if _router is not None:
+                _router.close()
+            _router = ShardRouter(DB_PATH, SHARD_COUNT)
+        return _router
+
+@contextmanager
+def _borrow(pool: ConnectionPool):
+    conn = pool.acquire()
+    try:
+        with conn:
+            yield conn
+    finally:
+        pool.release(conn)
+
+def get_connection(user_id: Optional[int] = None):
+    """Borrow a pooled connection to a user's shard (the catalog without a user)
+
+    Commits on success and rolls back on error. The first connection to a
+    database in this process creates or migrates its schema.
+    """
+    ensure_database()
+    return _borrow(_get_router().pool_for(user_id))
+
+def _shard_connection(shard: Optional[str]):
+    """Borrow a pooled connection to one shard file (None = the catalog)"""
+    ensure_database()
+    return _borrow(_get_router().pool(shard))
+
+# Write counters, stored in the data_versions table so callers can key read
+# caches on them. Every write bumps its user's counter in the same
+# transaction, so writes from any process (the app's workers, the importer
+# and maintenance CLIs) invalidate those caches, and one user's writes don't
+# invalidate another user's. Row SHARED_VERSION_ID in the catalog counts
+# writes shared by all users (categories, maintenance, shard moves).
+SHARED_VERSION_ID = 0
+
+def _read_version(conn: sqlite3.Connection, user_id: int, column: str = "data_version") -> int:
+    row = conn.execute(f"SELECT {column} FROM data_versions WHERE user_id=?", (user_id,)).fetchone()
+    return row[0] if row else 0
+
+def _bump_version(conn: sqlite3.Connection, user_id: Optional[int], column: str = "data_version"):
+    """Bump a counter inside the caller's write transaction (user_id None = shared)"""
+    conn.execute(f"""
+    INSERT INTO data_versions (user_id, {column}) VALUES (?, 1)
+    ON CONFLICT (user_id) DO UPDATE SET {column} = {column} + 1
+    """, (SHARED_VERSION_ID if user_id is None else user_id,))
+
+def get_data_version(user_id: int) -> int:
+    """Get the write counter for a user's data; any committed write to it, from any process, changes it"""
+    with get_connection() as conn:
+        shared = _read_version(conn, SHARED_VERSION_ID)
+    _get_router().refresh(shared)
+    with get_connection(user_id) as conn:
+        # Both counters only grow, so their sum changes whenever either does
+        return shared + _read_version(conn, user_id)
+
+@contextmanager
+def write_connection(user_id: Optional[int] = None):
+    """Borrow a pooled connection for a write that also bumps the data version
+
+    Pass the user_id whose data is written; without one the write counts as
+    shared by all users (categories, maintenance). The bump commits or rolls
+    back together with the write.
+    """
+    with get_connection(user_id) as conn:
+        yield conn
+        _bump_version(conn, user_id)
+
+def close_connections():
+    """Close every idle pooled connection (e.g. before deleting the database files)
+
+    The next connection checks the schema again, in case the files are replaced.
+    """
+    global _router
+    with _router_lock:
+        if _router is not None:
+            _router.close()
+            _router = None
+    _initialized_paths.clear()
+
+# Schema migrations, applied in order. PRAGMA user_version records how many
+# have run, so existing databases are upgraded in place by init_database().
+MIGRATIONS = [
+    # 1: indexes for date-range listings and per-category aggregates
+    [
+        "CREATE INDEX IF NOT EXISTS idx_expenses_date ON expenses(date)",
+        "CREATE INDEX IF NOT EXISTS idx_expenses_category_date ON expenses(category, date, amount)",
+        "CREATE INDEX IF NOT EXISTS idx_expenses_date_category_amount ON expenses(date, category, amount)",
+    ],
+    # 2: category -> Needs/Wants/Other lookup so type totals can be computed with a join
+    [
+        """
+        CREATE TABLE IF NOT EXISTS category_types (
+            category TEXT PRIMARY KEY,
+            expense_type TEXT NOT NULL
+        ) WITHOUT ROWID
+        """,
+    ],
+    # 3: monthly per-category rollup. Inserts are rolled up explicitly by
+    # add_expense/bulk_add_expenses (per batch, much cheaper than a per-row
+    # trigger); deletes and edits are handled by triggers.
+    [
+        """
+        CREATE TABLE IF NOT EXISTS monthly_category_totals (
+            year_month TEXT NOT NULL,
+            category TEXT NOT NULL,
+            total REAL NOT NULL DEFAULT 0,
+            expense_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (year_month, category)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_expenses_rollup_delete AFTER DELETE ON expenses
+        BEGIN
+            UPDATE monthly_category_totals
+            SET total = total - OLD.amount, expense_count = expense_count - 1
+            WHERE year_month = substr(OLD.date, 1, 7) AND category = OLD.category;
+            DELETE FROM monthly_category_totals
+            WHERE year_month = substr(OLD.date, 1, 7) AND category = OLD.category AND expense_count <= 0;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_expenses_rollup_update AFTER UPDATE OF date, category, amount ON expenses
+        BEGIN
+            UPDATE monthly_category_totals
+            SET total = total - OLD.amount, expense_count = expense_count - 1
+            WHERE year_month = substr(OLD.date, 1, 7) AND category = OLD.category;
+            DELETE FROM monthly_category_totals
+            WHERE year_month = substr(OLD.date, 1, 7) AND category = OLD.category AND expense_count <= 0;
+            INSERT INTO monthly_category_totals (year_month, category, total, expense_count)
+            VALUES (substr(NEW.date, 1, 7), NEW.category, NEW.amount, 1)
+            ON CONFLICT (year_month, category) DO UPDATE
+            SET total = total + excluded.total, expense_count = expense_count + 1;
+        END
+        """,
+        "DELETE FROM monthly_category_totals",
+        """
+        INSERT INTO monthly_category_totals (year_month, category, total, expense_count)
+        SELECT substr(date, 1, 7), category, SUM(amount), COUNT(*)
+        FROM expenses
+        GROUP BY substr(date, 1, 7), category
+        """,
+    ],
+    # 4: share the calculator's integer category codes and persist user-defined categories
+    [
+        "ALTER TABLE category_types ADD COLUMN code INTEGER",
+        "ALTER TABLE category_types ADD COLUMN is_custom INTEGER NOT NULL DEFAULT 0",
+    ],
+    # 5: keyset pagination of a single category, newest first
+    [
+        "CREATE INDEX IF NOT EXISTS idx_expenses_category_page ON expenses(category, date, id)",
+    ],
+    # 6: goal priority for the savings allocator (1 = high, 2 = normal, 3 = low)
+    [
+        "ALTER TABLE savings_goals ADD COLUMN priority INTEGER NOT NULL DEFAULT 2",
+    ],
+    # 7: per-user storage. Existing rows belong to DEFAULT_USER_ID, indexes lead
+    # with user_id and the rollup is rebuilt with user_id in its key.
+    # category_types stays a shared lookup.
+    [
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL UNIQUE,
+            created_at TEXT NOT NULL
+        )
+        """,
+        "INSERT OR IGNORE INTO users (id, username, created_at) VALUES (1, 'default', strftime('%Y-%m-%dT%H:%M:%f', 'now'))",
+        "ALTER TABLE user_profile ADD COLUMN user_id INTEGER NOT NULL DEFAULT 1",
+        "ALTER TABLE expenses ADD COLUMN user_id INTEGER NOT NULL DEFAULT 1",
+        "ALTER TABLE savings_goals ADD COLUMN user_id INTEGER NOT NULL DEFAULT 1",
+        "ALTER TABLE budget_allocations ADD COLUMN user_id INTEGER NOT NULL DEFAULT 1",
+        "DELETE FROM budget_allocations WHERE id NOT IN (SELECT MIN(id) FROM budget_allocations)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_user_profile_user ON user_profile(user_id)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_budget_allocations_user ON budget_allocations(user_id)",
+        "CREATE INDEX IF NOT EXISTS idx_savings_goals_user ON savings_goals(user_id, status, created_at)",
+        "DROP INDEX IF EXISTS idx_expenses_date",
+        "DROP INDEX IF EXISTS idx_expenses_category_date",
+        "DROP INDEX IF EXISTS idx_expenses_date_category_amount",
+        "DROP INDEX IF EXISTS idx_expenses_category_page",
+        "CREATE INDEX IF NOT EXISTS idx_expenses_user_date ON expenses(user_id, date)",
+        "CREATE INDEX IF NOT EXISTS idx_expenses_user_category_date ON expenses(user_id, category, date, amount)",
+        "CREATE INDEX IF NOT EXISTS idx_expenses_user_date_category_amount ON expenses(user_id, date, category, amount)",
+        "CREATE INDEX IF NOT EXISTS idx_expenses_user_category_page ON expenses(user_id, category, date, id)",
+        "DROP TRIGGER IF EXISTS trg_expenses_rollup_delete",
+        "DROP TRIGGER IF EXISTS trg_expenses_rollup_update",
+        "DROP TABLE IF EXISTS monthly_category_totals",
+        """
+        CREATE TABLE monthly_category_totals (
+            user_id INTEGER NOT NULL,
+            year_month TEXT NOT NULL,
+            category TEXT NOT NULL,
+            total REAL NOT NULL DEFAULT 0,
+            expense_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, year_month, category)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TRIGGER trg_expenses_rollup_delete AFTER DELETE ON expenses
+        BEGIN
+            UPDATE monthly_category_totals
+            SET total = total - OLD.amount, expense_count = expense_count - 1
+            WHERE user_id = OLD.user_id AND year_month = substr(OLD.date, 1, 7) AND category = OLD.category;
+            DELETE FROM monthly_category_totals
+            WHERE user_id = OLD.user_id AND year_month = substr(OLD.date, 1, 7) AND category = OLD.category
+              AND expense_count <= 0;
+        END
+        """,
+        """
+        CREATE TRIGGER trg_expenses_rollup_update AFTER UPDATE OF date, category, amount, user_id ON expenses
+        BEGIN
+            UPDATE monthly_category_totals
+            SET total = total - OLD.amount, expense_count = expense_count - 1
+            WHERE user_id = OLD.user_id AND year_month = substr(OLD.date, 1, 7) AND category = OLD.category;
+            DELETE FROM monthly_category_totals
+            WHERE user_id = OLD.user_id AND year_month = substr(OLD.date, 1, 7) AND category = OLD.category
+              AND expense_count <= 0;
+            INSERT INTO monthly_category_totals (user_id, year_month, category, total, expense_count)
+            VALUES (NEW.user_id, substr(NEW.date, 1, 7), NEW.category, NEW.amount, 1)
+            ON CONFLICT (user_id, year_month, category) DO UPDATE
+            SET total = total + excluded.total, expense_count = expense_count + 1;
+        END
+        """,
+        """
+        INSERT INTO monthly_category_totals (user_id, year_month, category, total, expense_count)
+        SELECT user_id, substr(date, 1, 7), category, SUM(amount), COUNT(*)
+        FROM expenses
+        GROUP BY user_id, substr(date, 1, 7), category
+        """,
+    ],
+    # 8: shard holding each user's rows (NULL = the catalog file itself)
+    [
+        "ALTER TABLE users ADD COLUMN shard TEXT",
+    ],
+    # 9: per-user write counters (see get_data_version and get_budget_version)
+    [
+        """
+        CREATE TABLE IF NOT EXISTS data_versions (
+            user_id INTEGER PRIMARY KEY,
+            data_version INTEGER NOT NULL DEFAULT 0,
+            budget_version INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+    ],
+    # 10: sign-in. A user without a passphrase can't sign in to the app; the
+    # session key signs that user's session tokens.
+    [
+        "ALTER TABLE users ADD COLUMN passphrase_hash TEXT",
+        "ALTER TABLE users ADD COLUMN session_key TEXT",
+    ],
+    # 11: custom categories belong to the user who added them; category_types
+    # keeps only the shared built-in catalog. Custom categories added before
+    # this go to DEFAULT_USER_ID.
+    [
+        """
+        CREATE TABLE IF NOT EXISTS custom_categories (
+            user_id INTEGER NOT NULL,
+            category TEXT NOT NULL,
+            expense_type TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            PRIMARY KEY (user_id, category)
+        ) WITHOUT ROWID
+        """,
+        """
+        INSERT OR IGNORE INTO custom_categories (user_id, category, expense_type, created_at)
+        SELECT 1, category, expense_type, strftime('%Y-%m-%dT%H:%M:%f', 'now')
+        FROM category_types WHERE is_custom = 1
+        """,
+        "DELETE FROM category_types WHERE is_custom = 1",
+    ],
+    # 12: two expense indexes instead of four, since every bulk insert row
+    # updates each of them. Both carry id right after the date, so keyset
+    # pages come out in index order, and category and amount at the end, so
+    # range totals and counts never read the table.
+    [
+        "CREATE INDEX IF NOT EXISTS idx_expenses_user_date_id ON expenses(user_id, date, id, category, amount)",
+        "CREATE INDEX IF NOT EXISTS idx_expenses_user_category_date_id ON expenses(user_id, category, date, id, amount)",
+        "DROP INDEX IF EXISTS idx_expenses_user_date",
+        "DROP INDEX IF EXISTS idx_expenses_user_category_date",
+        "DROP INDEX IF EXISTS idx_expenses_user_date_category_amount",
+        "DROP INDEX IF EXISTS idx_expenses_user_category_page",
+    ],
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Get the schema version stored in the database file"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate_database(conn: sqlite3.Connection) -> int:
+    """Apply pending migrations and return the resulting schema version
+
+    sqlite3 does not open transactions for DDL, so each migration runs in an
+    explicit BEGIN IMMEDIATE transaction together with its user_version bump:
+    a crash cannot leave it half-applied. The version is read again once the
+    write lock is held, so processes migrating at the same time (the app and
+    a CLI) apply each migration once.
+    """
+    if get_schema_version(conn) >= SCHEMA_VERSION:
+        return get_schema_version(conn)
+    
+    if conn.in_transaction:
+        conn.commit()
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = get_schema_version(conn)
+            if version >= SCHEMA_VERSION:
+                conn.commit()
+                return version
+            for statement in MIGRATIONS[version]:
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {version + 1}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+# CATEGORY_INDEX_VERSION last written to category_types, by database file
+_synced_category_index = {}
+
+def sync_category_types(conn: sqlite3.Connection, force: bool = False):
+    """Mirror the calculator's category index (type and code) into category_types
+
+    Skipped when the index has not changed since the last sync of this database.
+    """
+    path = getattr(conn, "path", None) or _catalog_path()
+    if _synced_category_index.get(path) == finance_calculator.CATEGORY_INDEX_VERSION and not force:
+        return
+    
+    conn.executemany("""
+    INSERT INTO category_types (category, expense_type, code) VALUES (?, ?, ?)
+    ON CONFLICT (category) DO UPDATE
+    SET expense_type = excluded.expense_type, code = excluded.code
+    """, [
+        (category, expense_type, CATEGORY_CODES[category])
+        for category, expense_type in CATEGORY_TYPES.items()
+    ])
+    _synced_category_index[path] = finance_calculator.CATEGORY_INDEX_VERSION
+
+# Custom categories are private to the user who added them. Totals look a
+# category's type up in the shared catalog first, then in the user's own.
+def save_custom_category(category: str, expense_type: str = "Other", *, user_id: int) -> bool:
+    """Add a category of the user's own; returns False if the name is built in or already theirs"""
+    if expense_type not in EXPENSE_TYPES:
+        raise ValueError(f"Unknown expense type: {expense_type}")
+    if category in CATEGORY_TYPES:
+        return False
+    with write_connection(user_id) as conn:
+        return conn.execute("""
+        INSERT INTO custom_categories (user_id, category, expense_type, created_at) VALUES (?, ?, ?, ?)
+        ON CONFLICT (user_id, category) DO NOTHING
+        """, (user_id, category, expense_type, datetime.now().isoformat())).rowcount == 1
+
+def get_custom_categories(user_id: int) -> Dict[str, str]:
+    """A user's own categories mapped to their expense type, oldest first"""
+    with get_connection(user_id) as conn:
+        rows = conn.execute("""
+        SELECT category, expense_type FROM custom_categories WHERE user_id=? ORDER BY created_at
+        """, (user_id,)).fetchall()
+    return {row['category']: row['expense_type'] for row in rows}
+
+def get_categories(user_id: int) -> List[str]:
+    """Categories a user can pick: the built-in catalog followed by their own"""
+    return ALL_CATEGORIES + list(get_custom_categories(user_id))
+
+ROLLUP_UPSERT = """
+INSERT INTO monthly_category_totals (user_id, year_month, category, total, expense_count)
+VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (user_id, year_month, category) DO UPDATE
+SET total = total + excluded.total, expense_count = expense_count + excluded.expense_count
+"""
+
+def _rollup_rows(rows, user_id: int) -> list:
+    """Aggregate (date, category, amount, ...) rows into rollup upsert parameters"""
+    totals = {}
+    for row in rows:
+        key = (user_id, row[0][:7], row[1])
+        total, count = totals.get(key, (0, 0))
+        totals[key] = (total + row[2], count + 1)
+    return [key + value for key, value in totals.items()]
+
+def rebuild_monthly_totals() -> int:
+    """Rebuild the monthly_category_totals rollup for all users from the raw expenses; returns the row count"""
+    rows = 0
+    for shard in list_shards():
+        with _shard_connection(shard) as conn:
+            conn.execute("DELETE FROM monthly_category_totals")
+            conn.execute("""
+            INSERT INTO monthly_category_totals (user_id, year_month, category, total, expense_count)
+            SELECT user_id, substr(date, 1, 7), category, SUM(amount), COUNT(*)
+            FROM expenses
+            GROUP BY user_id, substr(date, 1, 7), category
+            """)
+            rows += conn.execute("SELECT COUNT(*) FROM monthly_category_totals").fetchone()[0]
+    with get_connection() as conn:
+        _bump_version(conn, None)
+    return rows
+
+def month_span(start_date: str = None, end_date: str = None):
+    """Return (first, last) year-months if the range covers whole calendar months, else None"""
+    if not (start_date and end_date):
+        return None
+    try:
+        year, month, day = (int(part) for part in end_date[:10].split("-"))
+    except ValueError:
+        return None
+    if start_date[8:10] != "01" or len(start_date) != 10 or day != calendar.monthrange(year, month)[1]:
+        return None
+    return start_date[:7], end_date[:7]
+
+def create_schema(conn: sqlite3.Connection, catalog: bool = True):
+    """Create the tables in a catalog or shard file and apply pending migrations"""
     cursor = conn.cursor()
     
     # User profile table
@@ -59,156 +699,694 @@ def init_database():
     )
     """)
     
-    # Insert default budget allocation if not exists
-    cursor.execute("SELECT COUNT(*) FROM budget_allocations")
-    if cursor.fetchone()[0] == 0:
+    # Insert default budget allocation if not exists (shards start empty)
+    if catalog and cursor.execute("SELECT COUNT(*) FROM budget_allocations").fetchone()[0] == 0:
         cursor.execute(
             "INSERT INTO budget_allocations (needs_percentage, wants_percentage, savings_percentage, updated_at) VALUES (?, ?, ?, ?)",
             (50, 30, 20, datetime.now().isoformat())
         )
     
-    conn.commit()
-    conn.close()
+    migrate_database(conn)
+
+def init_database():
+    """Initialize the finance database with necessary tables"""
+    with _borrow(_get_router().catalog) as conn:
+        create_schema(conn)
+        sync_category_types(conn, force=True)
+    _initialized_paths.add(_catalog_path())
+    
     return "Database initialized successfully"
 
-def save_user_profile(name: str, monthly_income: float, status: str = "Single", dependents: int = 0):
+# Catalog files whose schema this process has already set up
+_initialized_paths = set()
+_init_lock = threading.Lock()
+
+def _catalog_path() -> str:
+    active = _active_router.get()
+    return DB_PATH if active is None else active.catalog_path
+
+def ensure_database():
+    """Run init_database() for the catalog in use once per process; afterwards a set lookup"""
+    path = _catalog_path()
+    if path in _initialized_paths:
+        return
+    with _init_lock:
+        if path not in _initialized_paths:
+            init_database()
+
+def _insert_user(conn: sqlite3.Connection, username: str, passphrase_hash: Optional[str] = None) -> Optional[int]:
+    """Insert a user and assign their shard; None if the username is taken"""
+    cursor = conn.execute(
+        "INSERT INTO users (username, created_at, passphrase_hash) VALUES (?, ?, ?) ON CONFLICT (username) DO NOTHING",
+        (username, datetime.now().isoformat(), passphrase_hash)
+    )
+    if not cursor.rowcount:
+        return None
+    user_id = cursor.lastrowid
+    conn.execute("UPDATE users SET shard=? WHERE id=?", (_get_router().default_shard(user_id), user_id))
+    return user_id
+
+def get_or_create_user(username: str) -> int:
+    """Get the id of a user by username, creating the user (without a passphrase) if needed"""
+    with get_connection() as conn:
+        row = conn.execute("SELECT id FROM users WHERE username=?", (username,)).fetchone()
+        if row:
+            return row['id']
+        user_id = _insert_user(conn, username)
+        if user_id is not None:
+            return user_id
+        return conn.execute("SELECT id FROM users WHERE username=?", (username,)).fetchone()['id']
+
+def list_users() -> List[Dict]:
+    """Get every user (id, username, created_at, shard)"""
+    with get_connection() as conn:
+        return [dict(row) for row in conn.execute("SELECT id, username, created_at, shard FROM users ORDER BY id")]
+
+def get_user_id(username: str) -> Optional[int]:
+    """A user's id, or None if there is no such user"""
+    with get_connection() as conn:
+        row = conn.execute("SELECT id FROM users WHERE username=?", (username,)).fetchone()
+    return row['id'] if row else None
+
+def get_username(user_id: int) -> Optional[str]:
+    """A user's username, or None if there is no such user"""
+    with get_connection() as conn:
+        row = conn.execute("SELECT username FROM users WHERE id=?", (user_id,)).fetchone()
+    return row['username'] if row else None
+
+# ==================== SIGN-IN ====================
+# Passphrases are stored as PBKDF2-HMAC-SHA256 "salt$hash". Session tokens are
+# "user_id.expiry.signature", signed with the user's session key, so they can't
+# be forged from a user id and stop working when the passphrase changes.
+PASSPHRASE_ITERATIONS = 200_000
+MIN_PASSPHRASE_LENGTH = 8
+SESSION_TTL = 30 * 24 * 60 * 60
+
+def _hash_passphrase(passphrase: str, salt: bytes = None) -> str:
+    salt = salt or secrets.token_bytes(16)
+    digest = hashlib.pbkdf2_hmac("sha256", passphrase.encode("utf-8"), salt, PASSPHRASE_ITERATIONS)
+    return f"{salt.hex()}${digest.hex()}"
+
+def _passphrase_matches(stored: Optional[str], passphrase: str) -> bool:
+    if not stored:
+        return False
+    salt, _ = stored.split("$", 1)
+    return hmac.compare_digest(stored, _hash_passphrase(passphrase, bytes.fromhex(salt)))
+
+def _check_passphrase_length(passphrase: str):
+    if len(passphrase) < MIN_PASSPHRASE_LENGTH:
+        raise ValueError(f"Passphrase must be at least {MIN_PASSPHRASE_LENGTH} characters")
+
+def create_user(username: str, passphrase: str) -> int:
+    """Create a user who signs in with `passphrase`; ValueError if the username is taken"""
+    _check_passphrase_length(passphrase)
+    with get_connection() as conn:
+        user_id = _insert_user(conn, username, _hash_passphrase(passphrase))
+    if user_id is None:
+        raise ValueError(f"Username {username!r} is already taken")
+    return user_id
+
+def set_passphrase(user_id: int, passphrase: str):
+    """Set or change a user's passphrase; their existing session tokens stop working"""
+    _check_passphrase_length(passphrase)
+    with get_connection() as conn:
+        conn.execute("UPDATE users SET passphrase_hash=?, session_key=NULL WHERE id=?",
+                     (_hash_passphrase(passphrase), user_id))
+
+def has_passphrase(user_id: int) -> bool:
+    """Whether the user has set a passphrase"""
+    with get_connection() as conn:
+        row = conn.execute("SELECT passphrase_hash FROM users WHERE id=?", (user_id,)).fetchone()
+    return bool(row and row['passphrase_hash'])
+
+def authenticate(username: str, passphrase: str) -> Optional[int]:
+    """The user's id if the passphrase matches, else None"""
+    with get_connection() as conn:
+        row = conn.execute("SELECT id, passphrase_hash FROM users WHERE username=?", (username,)).fetchone()
+    if row and _passphrase_matches(row['passphrase_hash'], passphrase):
+        return row['id']
+    return None
+
+def _sign(key: str, payload: str) -> str:
+    return hmac.new(bytes.fromhex(key), payload.encode("ascii"), hashlib.sha256).hexdigest()
+
+def issue_session_token(user_id: int, ttl: int = SESSION_TTL) -> str:
+    """Signed token that binds a browser session to the user until it expires"""
+    with get_connection() as conn:
+        conn.execute("UPDATE users SET session_key=? WHERE id=? AND session_key IS NULL",
+                     (secrets.token_hex(32), user_id))
+        key = conn.execute("SELECT session_key FROM users WHERE id=?", (user_id,)).fetchone()['session_key']
+    payload = f"{user_id}.{int(time.time()) + ttl}"
+    return f"{payload}.{_sign(key, payload)}"
+
+def user_for_session_token(token: str) -> Optional[int]:
+    """The user a session token was issued to, or None if it is forged, expired or revoked"""
+    try:
+        user_id, expires, signature = token.split(".")
+        user_id, expires = int(user_id), int(expires)
+    except (AttributeError, ValueError):
+        return None
+    if expires < time.time():
+        return None
+    with get_connection() as conn:
+        row = conn.execute("SELECT session_key FROM users WHERE id=?", (user_id,)).fetchone()
+    if not (row and row['session_key']):
+        return None
+    return user_id if hmac.compare_digest(signature, _sign(row['session_key'], f"{user_id}.{expires}")) else None
+
+def save_user_profile(name: str, monthly_income: float, status: str = "Single", dependents: int = 0,
+                      *, user_id: int):
     """Save or update user profile"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    # Check if profile exists
-    cursor.execute("SELECT COUNT(*) FROM user_profile")
-    exists = cursor.fetchone()[0] > 0
-    
-    if exists:
-        cursor.execute("""
-        UPDATE user_profile 
-        SET name=?, monthly_income=?, status=?, dependents=?
-        WHERE id=1
-        """, (name, monthly_income, status, dependents))
-    else:
-        cursor.execute("""
-        INSERT INTO user_profile (id, name, monthly_income, status, dependents, created_at)
-        VALUES (1, ?, ?, ?, ?, ?)
-        """, (name, monthly_income, status, dependents, datetime.now().isoformat()))
-    
-    conn.commit()
-    conn.close()
+    with write_connection(user_id) as conn:
+        conn.execute("""
+        INSERT INTO user_profile (user_id, name, monthly_income, status, dependents, created_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (user_id) DO UPDATE
+        SET name=excluded.name, monthly_income=excluded.monthly_income,
+            status=excluded.status, dependents=excluded.dependents
+        """, (user_id, name, monthly_income, status, dependents, datetime.now().isoformat()))
 
-def get_user_profile():
+def get_user_profile(user_id: int):
     """Get user profile"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    cursor.execute("SELECT * FROM user_profile WHERE id=1")
-    profile = cursor.fetchone()
-    conn.close()
+    with get_connection(user_id) as conn:
+        profile = conn.execute("SELECT * FROM user_profile WHERE user_id=?", (user_id,)).fetchone()
     
     if profile:
         return dict(profile)
     return None
 
-def add_expense(date: str, category: str, amount: float, note: str = ""):
+def add_expense(date: str, category: str, amount: float, note: str = "", *, user_id: int):
     """Add a new expense"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    with write_connection(user_id) as conn:
+        conn.execute("""
+        INSERT INTO expenses (user_id, date, category, amount, note, created_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """, (user_id, date, category, amount, note, datetime.now().isoformat()))
+        conn.execute(ROLLUP_UPSERT, (user_id, date[:7], category, amount, 1))
+
+def _expense_tuple(row, created_at: str, user_id: int) -> tuple:
+    """Normalize a dict or (date, category, amount[, note]) row for insertion"""
+    if isinstance(row, dict):
+        return (row["date"], row["category"], row["amount"], row.get("note") or "", created_at, user_id)
+    if len(row) == 3:
+        return (row[0], row[1], row[2], "", created_at, user_id)
+    return (row[0], row[1], row[2], row[3] or "", created_at, user_id)
+
+def bulk_add_expenses(rows: Iterable, batch_size: int = BULK_BATCH_SIZE,
+                      progress: Optional[Callable[[int], None]] = None,
+                      *, user_id: int) -> int:
+    """Insert many expenses in chunked transactions and return the row count.
+
+    Rows are consumed lazily, one batch at a time, so memory stays flat for any
+    input size. Categories are checked against the category index and the
+    user's own categories once per batch;
+    a batch with an unknown category raises ValueError before it is written
+    (batches already committed are kept). `progress` is called with the
+    running total after each batch. Rows within a batch are inserted in date
+    order (same-day rows keep their order), so ids follow the date.
+    """
+    rows = iter(rows)
+    inserted = 0
     
-    cursor.execute("""
-    INSERT INTO expenses (date, category, amount, note, created_at)
-    VALUES (?, ?, ?, ?, ?)
-    """, (date, category, amount, note, datetime.now().isoformat()))
+    with write_connection(user_id) as conn:
+        valid_categories = CATEGORY_TYPES.keys() | {
+            row[0] for row in conn.execute("SELECT category FROM custom_categories WHERE user_id=?", (user_id,))}
+        while True:
+            created_at = datetime.now().isoformat()
+            batch = [_expense_tuple(row, created_at, user_id) for row in islice(rows, batch_size)]
+            if not batch:
+                break
+            
+            unknown = {row[1] for row in batch} - valid_categories
+            if unknown:
+                raise ValueError(f"Unknown categories: {', '.join(sorted(unknown))}")
+            
+            # Every expense index has the date right after user_id (and category),
+            # so date order keeps consecutive inserts on neighbouring index pages
+            batch.sort(key=itemgetter(0))
+            conn.executemany("""
+            INSERT INTO expenses (date, category, amount, note, created_at, user_id)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """, batch)
+            conn.executemany(ROLLUP_UPSERT, _rollup_rows(batch, user_id))
+            _bump_version(conn, user_id)
+            conn.commit()
+            
+            inserted += len(batch)
+            if progress:
+                progress(inserted)
     
-    conn.commit()
-    conn.close()
+    return inserted
 
-def get_expenses(start_date: str = None, end_date: str = None):
+def get_expenses(start_date: str = None, end_date: str = None, *, user_id: int):
     """Get expenses with optional date filtering"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    if start_date and end_date:
-        cursor.execute("""
-        SELECT * FROM expenses 
-        WHERE date BETWEEN ? AND ?
-        ORDER BY date DESC
-        """, (start_date, end_date))
-    else:
-        cursor.execute("SELECT * FROM expenses ORDER BY date DESC")
-    
-    expenses = cursor.fetchall()
-    conn.close()
+    with get_connection(user_id) as conn:
+        if start_date and end_date:
+            expenses = conn.execute("""
+            SELECT * FROM expenses 
+            WHERE user_id = ? AND date BETWEEN ? AND ?
+            ORDER BY date DESC
+            """, (user_id, start_date, end_date)).fetchall()
+        else:
+            expenses = conn.execute("SELECT * FROM expenses WHERE user_id = ? ORDER BY date DESC", (user_id,)).fetchall()
     
     return [dict(row) for row in expenses]
 
-def delete_expense(expense_id: int):
+def delete_expense(expense_id: int, user_id: int):
     """Delete an expense by ID"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    with write_connection(user_id) as conn:
+        conn.execute("DELETE FROM expenses WHERE id=? AND user_id=?", (expense_id, user_id))
+
+def _expense_filters(category: str = None, start_date: str = None, end_date: str = None,
+                     *, user_id: int):
+    """Build the WHERE clause and parameters shared by the paginated expense queries"""
+    clauses = ["user_id = ?"]
+    params = [user_id]
+    if category:
+        clauses.append("category = ?")
+        params.append(category)
+    if start_date:
+        clauses.append("date >= ?")
+        params.append(start_date)
+    if end_date:
+        clauses.append("date <= ?")
+        params.append(end_date)
+    return clauses, params
+
+def get_expenses_page(category: str = None, start_date: str = None, end_date: str = None,
+                      after: tuple = None, limit: int = PAGE_SIZE, *, user_id: int) -> List[Dict]:
+    """Get one page of expenses, newest first, using keyset pagination
+
+    `after` is the (date, id) of the last row on the previous page, so every
+    page costs the same no matter how deep into the history it is.
+    """
+    clauses, params = _expense_filters(category, start_date, end_date, user_id=user_id)
+    if after:
+        clauses.append("(date, id) < (?, ?)")
+        params.extend(after)
+    
+    query = "SELECT * FROM expenses WHERE " + " AND ".join(clauses)
+    query += " ORDER BY date DESC, id DESC LIMIT ?"
+    params.append(limit)
     
-    cursor.execute("DELETE FROM expenses WHERE id=?", (expense_id,))
+    with get_connection(user_id) as conn:
+        rows = conn.execute(query, params).fetchall()
     
-    conn.commit()
-    conn.close()
+    return [dict(row) for row in rows]
 
-def add_savings_goal(goal_name: str, target_amount: float, deadline: str = None):
-    """Add a new savings goal"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+def count_expenses(category: str = None, start_date: str = None, end_date: str = None,
+                   *, user_id: int) -> Dict[str, float]:
+    """Get the number and total amount of expenses matching the filters"""
+    clauses, params = _expense_filters(category, start_date, end_date, user_id=user_id)
+    query = "SELECT COUNT(*) AS count, COALESCE(SUM(amount), 0) AS total FROM expenses WHERE " + " AND ".join(clauses)
     
-    cursor.execute("""
-    INSERT INTO savings_goals (goal_name, target_amount, deadline, created_at)
-    VALUES (?, ?, ?, ?)
-    """, (goal_name, target_amount, deadline, datetime.now().isoformat()))
+    with get_connection(user_id) as conn:
+        row = conn.execute(query, params).fetchone()
     
-    conn.commit()
-    conn.close()
+    return dict(row)
+
+def get_expense_date_range(user_id: int):
+    """First and last expense dates as (min, max), or (None, None) when there are no expenses"""
+    with get_connection(user_id) as conn:
+        row = conn.execute("SELECT MIN(date), MAX(date) FROM expenses WHERE user_id = ?", (user_id,)).fetchone()
+    return row[0], row[1]
+
+def delete_expenses(expense_ids: Iterable[int], user_id: int) -> int:
+    """Delete several expenses in one transaction; returns the number deleted"""
+    with write_connection(user_id) as conn:
+        cursor = conn.executemany("DELETE FROM expenses WHERE id=? AND user_id=?",
+                                  [(expense_id, user_id) for expense_id in expense_ids])
+        return cursor.rowcount
+
+def add_savings_goal(goal_name: str, target_amount: float, deadline: str = None, priority: int = 2,
+                     *, user_id: int):
+    """Add a new savings goal"""
+    with write_connection(user_id) as conn:
+        conn.execute("""
+        INSERT INTO savings_goals (user_id, goal_name, target_amount, deadline, priority, created_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """, (user_id, goal_name, target_amount, deadline, priority, datetime.now().isoformat()))
 
-def get_savings_goals():
+def get_savings_goals(user_id: int):
     """Get all active savings goals"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    cursor.execute("SELECT * FROM savings_goals WHERE status='active' ORDER BY created_at DESC")
-    goals = cursor.fetchall()
-    conn.close()
+    with get_connection(user_id) as conn:
+        goals = conn.execute("""
+        SELECT * FROM savings_goals WHERE user_id=? AND status='active' ORDER BY created_at DESC
+        """, (user_id,)).fetchall()
     
     return [dict(row) for row in goals]
 
-def update_goal_progress(goal_id: int, current_amount: float):
+# Called as hook(user_id, goal_id, current_amount, previous_version) after a
+# goal's progress is saved; previous_version is the user's data version before the write
+GOAL_UPDATE_HOOKS: List[Callable[[int, int, float, int], None]] = []
+
+def update_goal_progress(goal_id: int, current_amount: float, user_id: int):
     """Update savings goal progress"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    previous_version = get_data_version(user_id)
+    with write_connection(user_id) as conn:
+        conn.execute("""
+        UPDATE savings_goals 
+        SET current_amount=?
+        WHERE id=? AND user_id=?
+        """, (current_amount, goal_id, user_id))
     
-    cursor.execute("""
-    UPDATE savings_goals 
-    SET current_amount=?
-    WHERE id=?
-    """, (current_amount, goal_id))
+    for hook in GOAL_UPDATE_HOOKS:
+        hook(user_id, goal_id, current_amount, previous_version)
+
+# Budget allocations are read by every analysis but rarely change, so they
+# are versioned separately from the data version: saving one only
+# invalidates caches of what was computed from the allocation.
+def get_budget_version(user_id: int) -> int:
+    """Get the counter for a user's budget allocation; saving one, from any process, changes it"""
+    with get_connection(user_id) as conn:
+        return _read_version(conn, user_id, "budget_version")
+
+def get_budget_allocation(user_id: int) -> Dict[str, float]:
+    """Get a user's Needs/Wants/Savings percentages (50/30/20 if none were saved)"""
+    with get_connection(user_id) as conn:
+        row = conn.execute("""
+        SELECT needs_percentage, wants_percentage, savings_percentage
+        FROM budget_allocations WHERE user_id=?
+        """, (user_id,)).fetchone()
+
+    return dict(row) if row else dict(DEFAULT_BUDGET)
+
+def save_budget_allocation(needs_percentage: float, wants_percentage: float, savings_percentage: float,
+                           user_id: int):
+    """Save a user's Needs/Wants/Savings percentages; they must add up to 100"""
+    if abs(needs_percentage + wants_percentage + savings_percentage - 100) > 1e-6:
+        raise ValueError("Budget percentages must add up to 100")
+    # Not a data write: expenses and goals are unchanged, only the budget version moves
+    with get_connection(user_id) as conn:
+        conn.execute("""
+        INSERT INTO budget_allocations (user_id, needs_percentage, wants_percentage, savings_percentage, updated_at)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (user_id) DO UPDATE
+        SET needs_percentage=excluded.needs_percentage, wants_percentage=excluded.wants_percentage,
+            savings_percentage=excluded.savings_percentage, updated_at=excluded.updated_at
+        """, (user_id, needs_percentage, wants_percentage, savings_percentage, datetime.now().isoformat()))
+        _bump_version(conn, user_id, "budget_version")
+
+def get_spending_totals(start_date: str = None, end_date: str = None,
+                        *, user_id: int) -> Dict[str, Any]:
+    """Get category and Needs/Wants/Other totals computed in SQL
+
+    The result has the same shape as finance_calculator.summarize_expenses()
+    and can be passed straight to analyze_spending(). Either bound may be
+    left out for an open-ended range. All-time and whole-month ranges are
+    answered from the monthly_category_totals rollup.
+    """
+    months = month_span(start_date, end_date)
+    if months or not (start_date or end_date):
+        # Whole months (or all time): read the monthly rollup instead of raw rows
+        query = """
+        SELECT m.category, COALESCE(t.expense_type, c.expense_type, 'Other') AS expense_type,
+               SUM(m.total) AS total, SUM(m.expense_count) AS count
+        FROM monthly_category_totals m
+        LEFT JOIN category_types t ON t.category = m.category
+        LEFT JOIN custom_categories c ON c.user_id = m.user_id AND c.category = m.category
+        WHERE m.user_id = ?
+        """
+        params = (user_id,)
+        if months:
+            query += " AND m.year_month BETWEEN ? AND ?"
+            params += months
+        query += " GROUP BY m.category ORDER BY total DESC"
+    else:
+        query = """
+        SELECT e.category, COALESCE(t.expense_type, c.expense_type, 'Other') AS expense_type,
+               SUM(e.amount) AS total, COUNT(*) AS count
+        FROM expenses e
+        LEFT JOIN category_types t ON t.category = e.category
+        LEFT JOIN custom_categories c ON c.user_id = e.user_id AND c.category = e.category
+        WHERE e.user_id = ? AND e.date BETWEEN ? AND ?
+        GROUP BY e.category ORDER BY total DESC
+        """
+        params = (user_id, start_date or "0000-00-00", end_date or "9999-99-99")
+    
+    with get_connection(user_id) as conn:
+        sync_category_types(conn)
+        rows = conn.execute(query, params).fetchall()
     
-    conn.commit()
-    conn.close()
+    return totals_from_rows(rows)
 
-def get_expense_summary_by_category():
-    """Get total expenses grouped by category"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
+def totals_from_rows(rows) -> Dict[str, Any]:
+    """Fold (category, expense_type, total, count) rows into a totals dict"""
+    type_totals = {"Needs": 0, "Wants": 0, "Other": 0}
+    category_breakdown = {}
+    expense_count = 0
+    for row in rows:
+        category_breakdown[row['category']] = row['total']
+        type_totals[row['expense_type']] += row['total']
+        expense_count += row['count']
     
-    cursor.execute("""
-    SELECT category, SUM(amount) as total
-    FROM expenses
-    GROUP BY category
-    ORDER BY total DESC
-    """)
+    return {
+        "total_expenses": sum(category_breakdown.values()),
+        "needs_total": type_totals["Needs"],
+        "wants_total": type_totals["Wants"],
+        "other_total": type_totals["Other"],
+        "category_breakdown": category_breakdown,
+        "expense_count": expense_count
+    }
+
+def get_spending_totals_for_windows(windows: Sequence, user_id: int) -> List[Dict[str, Any]]:
+    """Spending totals for several (start_date, end_date, ...) windows in one query
+
+    Windows are passed as a VALUES table and joined to expenses on the date
+    index, so each window reads only its own range. Returns one totals dict
+    per window, in order, each shaped like get_spending_totals().
+    """
+    if not windows:
+        return []
+    values = ", ".join("(?, ?, ?)" for _ in windows)
+    params = [value for index, window in enumerate(windows) for value in (index, window[0], window[1])]
+    params.append(user_id)
+    query = f"""
+    WITH windows(idx, start_date, end_date) AS (VALUES {values})
+    SELECT w.idx, e.category, COALESCE(t.expense_type, c.expense_type, 'Other') AS expense_type,
+           SUM(e.amount) AS total, COUNT(*) AS count
+    FROM windows w
+    JOIN expenses e ON e.user_id = ? AND e.date BETWEEN w.start_date AND w.end_date
+    LEFT JOIN category_types t ON t.category = e.category
+    LEFT JOIN custom_categories c ON c.user_id = e.user_id AND c.category = e.category
+    GROUP BY w.idx, e.category
+    ORDER BY w.idx, total DESC
+    """
+    with get_connection(user_id) as conn:
+        sync_category_types(conn)
+        rows = conn.execute(query, params).fetchall()
     
-    summary = cursor.fetchall()
-    conn.close()
+    grouped = [[] for _ in windows]
+    for row in rows:
+        grouped[row['idx']].append(row)
+    return [totals_from_rows(window_rows) for window_rows in grouped]
+
+def get_monthly_totals(start_month: str = None, end_month: str = None,
+                       *, user_id: int) -> Dict[str, Dict[str, Any]]:
+    """Totals for every month in a range, keyed by "YYYY-MM", from one GROUP BY over the rollup
+
+    Each value is shaped like get_spending_totals(). Months with no expenses
+    are absent. The cost depends on the number of months and categories,
+    not on the number of expenses.
+    """
+    query = """
+    SELECT m.year_month, m.category, COALESCE(t.expense_type, c.expense_type, 'Other') AS expense_type,
+           SUM(m.total) AS total, SUM(m.expense_count) AS count
+    FROM monthly_category_totals m
+    LEFT JOIN category_types t ON t.category = m.category
+    LEFT JOIN custom_categories c ON c.user_id = m.user_id AND c.category = m.category
+    WHERE m.user_id = ? AND m.year_month BETWEEN ? AND ?
+    GROUP BY m.year_month, m.category
+    ORDER BY m.year_month, total DESC
+    """
+    with get_connection(user_id) as conn:
+        sync_category_types(conn)
+        rows = conn.execute(query, (user_id, start_month or "0000-00", end_month or "9999-99")).fetchall()
+    
+    by_month = {}
+    for row in rows:
+        by_month.setdefault(row['year_month'], []).append(row)
+    return {month: totals_from_rows(month_rows) for month, month_rows in by_month.items()}
+
+def get_expense_summary_by_category(user_id: int):
+    """Get total expenses grouped by category"""
+    with get_connection(user_id) as conn:
+        summary = conn.execute("""
+        SELECT category, SUM(total) as total
+        FROM monthly_category_totals
+        WHERE user_id = ?
+        GROUP BY category
+        ORDER BY total DESC
+        """, (user_id,)).fetchall()
     
     return [dict(row) for row in summary]
 
-# Initialize database when module is imported
-if not os.path.exists(DB_PATH):
-    init_database()
\ No newline at end of file
+# ==================== SHARD MAINTENANCE ====================
+# Tables holding per-user rows, copied by move_user(). The rollup comes last
+# so its copy is not disturbed by the expense delete trigger.
+USER_TABLES = ("user_profile", "expenses", "savings_goals", "budget_allocations", "data_versions",
+               "custom_categories", "monthly_category_totals")
+
+def list_shards() -> List[Optional[str]]:
+    """Every shard that may hold user rows: the catalog (None) and each shard named in users.shard"""
+    with get_connection() as conn:
+        rows = conn.execute("SELECT DISTINCT shard FROM users WHERE shard IS NOT NULL ORDER BY shard").fetchall()
+    return [None] + [row['shard'] for row in rows]
+
+def move_user(user_id: int, shard: Optional[str]) -> int:
+    """Move a user's rows to another shard and return how many rows were copied
+
+    Rows are copied to the target (with new ids) and committed, the catalog
+    is pointed at the target, and only then are they deleted from the source.
+    Leftovers on the target from an interrupted move are cleared first, so a
+    failed move can simply be retried. Run it while the app is stopped:
+    writes to the user during a move would be lost.
+    """
+    router = _get_router()
+    with get_connection() as conn:
+        if not conn.execute("SELECT 1 FROM users WHERE id=?", (user_id,)).fetchone():
+            raise ValueError(f"Unknown user: {user_id}")
+    source = router.shard_of(user_id)
+    if source == shard:
+        return 0
+    router.pool(source)
+    
+    copied = 0
+    with _shard_connection(shard) as conn:
+        conn.execute("ATTACH DATABASE ? AS source", (router.shard_path(source),))
+        try:
+            for table in USER_TABLES:
+                columns = ", ".join(row['name'] for row in conn.execute(f"PRAGMA main.table_info({table})")
+                                    if row['name'] != "id")
+                conn.execute(f"DELETE FROM main.{table} WHERE user_id=?", (user_id,))
+                copied += conn.execute(
+                    f"INSERT INTO main.{table} ({columns}) SELECT {columns} FROM source.{table} WHERE user_id=?",
+                    (user_id,)
+                ).rowcount
+            _bump_version(conn, user_id)
+            conn.commit()
+        except BaseException:
+            # End the copy transaction first: DETACH fails while it is open, and the
+            # pooled connection must go back without `source` attached
+            conn.rollback()
+            raise
+        finally:
+            conn.execute("DETACH DATABASE source")
+    
+    # The shared bump tells other processes to look the user's shard up again
+    with get_connection() as conn:
+        conn.execute("UPDATE users SET shard=? WHERE id=?", (shard, user_id))
+        _bump_version(conn, None)
+    router.set_shard(user_id, shard)
+    
+    with _shard_connection(source) as conn:
+        for table in USER_TABLES:
+            conn.execute(f"DELETE FROM {table} WHERE user_id=?", (user_id,))
+    return copied
+
+def rebalance(shard_count: int = None,
+              progress: Optional[Callable[[int, Optional[str]], None]] = None) -> Dict[str, int]:
+    """Move every user to their default shard for `shard_count` shards (default SHARD_COUNT)
+
+    Users already in place are skipped, so an interrupted rebalance can be
+    rerun. `progress` is called with (user_id, target shard) before each move.
+    """
+    router = _get_router()
+    moved = {"users": 0, "rows": 0}
+    for user in list_users():
+        target = router.default_shard(user['id'], shard_count)
+        if user['shard'] != target:
+            if progress:
+                progress(user['id'], target)
+            moved["rows"] += move_user(user['id'], target)
+            moved["users"] += 1
+    return moved
+
+def get_shard_stats() -> List[Dict[str, Any]]:
+    """Users, expenses, total spending and active goals in each shard"""
+    with get_connection() as conn:
+        users = {row['shard']: row['users'] for row in conn.execute(
+            "SELECT shard, COUNT(*) AS users FROM users GROUP BY shard")}
+    
+    stats = []
+    for shard in list_shards():
+        with _shard_connection(shard) as conn:
+            row = conn.execute("""
+            SELECT COALESCE(SUM(expense_count), 0) AS expenses, COALESCE(SUM(total), 0) AS total_expenses,
+                   (SELECT COUNT(*) FROM savings_goals WHERE status='active') AS active_goals
+            FROM monthly_category_totals
+            """).fetchone()
+        stats.append({"shard": shard or "catalog", "path": _get_router().shard_path(shard),
+                      "users": users.get(shard, 0), **dict(row)})
+    return stats
+
+def get_global_monthly_totals(start_month: str = None, end_month: str = None) -> Dict[str, Dict[str, Any]]:
+    """Totals across all users and shards for every month in a range, shaped like get_monthly_totals()"""
+    merged = {}
+    for shard in list_shards():
+        with _shard_connection(shard) as conn:
+            sync_category_types(conn)
+            rows = conn.execute("""
+            SELECT m.year_month, m.category, COALESCE(t.expense_type, c.expense_type, 'Other') AS expense_type,
+                   SUM(m.total) AS total, SUM(m.expense_count) AS count
+            FROM monthly_category_totals m
+            LEFT JOIN category_types t ON t.category = m.category
+            LEFT JOIN custom_categories c ON c.user_id = m.user_id AND c.category = m.category
+            WHERE m.year_month BETWEEN ? AND ?
+            GROUP BY m.year_month, m.category
+            """, (start_month or "0000-00", end_month or "9999-99")).fetchall()
+        for row in rows:
+            key = (row['year_month'], row['category'])
+            total = merged.setdefault(key, {"category": row['category'], "expense_type": row['expense_type'],
+                                            "total": 0.0, "count": 0})
+            total['total'] += row['total']
+            total['count'] += row['count']
+    
+    by_month = {}
+    for (month, _), row in sorted(merged.items()):
+        by_month.setdefault(month, []).append(row)
+    return {month: totals_from_rows(month_rows) for month, month_rows in by_month.items()}
+
+def main(argv=None):
+    global DB_PATH, SHARD_COUNT
+    parser = argparse.ArgumentParser(description="Finance database maintenance")
+    parser.add_argument("command", choices=["init", "rebuild-rollup", "rebalance", "shards", "set-passphrase"])
+    parser.add_argument("--db", default=DB_PATH, help="database (catalog) file")
+    parser.add_argument("--shards", type=_shard_count, default=SHARD_COUNT,
+                        help='number of shard files, 0 for none or "user" for one file per user')
+    parser.add_argument("--user", default="default", help="user whose passphrase set-passphrase sets")
+    args = parser.parse_args(argv)
+    
+    DB_PATH = args.db
+    SHARD_COUNT = args.shards
+    print(init_database())
+    if args.command == "rebuild-rollup":
+        print(f"Rebuilt monthly totals: {rebuild_monthly_totals()} rows")
+    elif args.command == "rebalance":
+        moved = rebalance(progress=lambda user_id, shard: print(f"Moving user {user_id} to {shard or 'catalog'}"))
+        print(f"Moved {moved['users']} users ({moved['rows']} rows)")
+    elif args.command == "shards":
+        for stats in get_shard_stats():
+            print(f"{stats['shard']:>12} | {stats['users']:6d} users | {stats['expenses']:9d} expenses | "
+                  f"{stats['active_goals']:5d} goals | {stats['path']}")
+    elif args.command == "set-passphrase":
+        # How an existing user (e.g. the default household) gets its first
+        # passphrase; the app never sets one for a visitor who isn't signed in
+        user_id = get_user_id(args.user)
+        if user_id is None:
+            print(f"Unknown user: {args.user}")
+            return 1
+        passphrase = getpass.getpass(f"New passphrase for {args.user}: ")
+        if passphrase != getpass.getpass("Repeat passphrase: "):
+            print("The passphrases don't match")
+            return 1
+        try:
+            set_passphrase(user_id, passphrase)
+        except ValueError as e:
+            print(e)
+            return 1
+        print(f"Passphrase set for {args.user}; their existing sessions are signed out")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
\ No newline at end of file
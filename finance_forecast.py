@@ -0,0 +1,138 @@
+# finance_forecast.py
+"""Monte Carlo forecasts for savings goals.
+
+Instead of assuming the same saving every month (calculate_savings_timeline),
+future months are bootstrapped from the user's historical monthly net flows
+(income minus that month's spending). Thousands of paths are simulated at
+once with NumPy and shared by all goals, giving P10/P50/P90 completion dates
+and the probability of reaching each goal by its deadline.
+"""
+from datetime import date
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from dateutil.relativedelta import relativedelta
+
+import finance_db
+from finance_calculator import month_window, previous_window, rolling_window
+from finance_goals import months_until
+
+SIMULATION_PATHS = 10_000
+HORIZON_MONTHS = 120
+HISTORY_MONTHS = 24
+PERCENTILES = (10, 50, 90)
+
+def historical_net_flows(monthly_income: float, history_months: int = HISTORY_MONTHS,
+                         today: date = None, *, user_id: int) -> np.ndarray:
+    """Net flow (income - spending) of each complete month with recorded history
+
+    Uses up to `history_months` months before the current one, starting at the
+    month of the first expense; months without expenses count as full savings.
+    With no complete month yet, falls back to the last 30 days.
+    """
+    today = today or date.today()
+    last = previous_window(month_window(today.year, today.month))
+    first_date, _ = finance_db.get_expense_date_range(user_id)
+    if first_date and first_date[:7] <= last.start[:7]:
+        start = date.fromisoformat(last.start) - relativedelta(months=history_months - 1)
+        start_month = max(first_date[:7], start.isoformat()[:7])
+        monthly_totals = finance_db.get_monthly_totals(start_month, last.start[:7], user_id=user_id)
+        months = []
+        month = date.fromisoformat(start_month + "-01")
+        while month.isoformat()[:7] <= last.start[:7]:
+            months.append(month.isoformat()[:7])
+            month += relativedelta(months=1)
+        spending = [monthly_totals[m]['total_expenses'] if m in monthly_totals else 0.0 for m in months]
+        return monthly_income - np.asarray(spending, dtype=float)
+
+    window = rolling_window(30, today)
+    recent = finance_db.get_spending_totals(window.start, window.end, user_id=user_id)
+    return np.asarray([monthly_income - recent['total_expenses']], dtype=float)
+
+def simulate_savings(net_flows: np.ndarray, paths: int = SIMULATION_PATHS, horizon: int = HORIZON_MONTHS,
+                     seed: Optional[int] = None) -> np.ndarray:
+    """Best balance reached so far on each path, shape (paths, horizon)
+
+    Each month's flow is drawn with replacement from `net_flows`. The running
+    maximum is used so a goal counts as reached the first month its balance
+    gets there, even if later months dip below it.
+    """
+    rng = np.random.default_rng(seed)
+    draws = rng.choice(np.asarray(net_flows, dtype=float), size=(paths, horizon))
+    return np.maximum.accumulate(np.cumsum(draws, axis=1), axis=1)
+
+def months_to_reach(balances: np.ndarray, remaining: np.ndarray) -> np.ndarray:
+    """Months until each path reaches each remaining amount, shape (paths, goals)
+
+    inf where the amount is not reached within the horizon; 0 for goals
+    that are already reached.
+    """
+    remaining = np.asarray(remaining, dtype=float)
+    paths, horizon = balances.shape
+    order = np.argsort(remaining, kind="stable")
+    targets = remaining[order]
+    # Rank each balance among the sorted targets: it has reached target j
+    # exactly when its rank is above j. Balances are non-decreasing along each
+    # path, so the months before a path first reaches target j are the months
+    # ranked j or lower, counted with one histogram of ranks per path. Memory
+    # stays at (paths, horizon) + (paths, goals), never their product.
+    ranks = np.searchsorted(targets, balances, side="right")
+    ranks += np.arange(paths)[:, None] * (len(targets) + 1)
+    below = np.bincount(ranks.ravel(), minlength=paths * (len(targets) + 1)).reshape(paths, len(targets) + 1)
+    del ranks
+    np.cumsum(below, axis=1, out=below)
+    months = np.empty((paths, len(targets)), dtype=float)
+    months[:, order] = below[:, :-1]
+    del below
+    months += 1
+    months[months > horizon] = np.inf
+    months[:, remaining <= 0] = 0
+    return months
+
+def _add_months(today: date, months: float) -> Optional[str]:
+    if not np.isfinite(months):
+        return None
+    return (today + relativedelta(months=int(months))).isoformat()
+
+def forecast_goals(goals: List[Dict], net_flows: np.ndarray, paths: int = SIMULATION_PATHS,
+                   horizon: int = HORIZON_MONTHS, seed: Optional[int] = None,
+                   today: date = None, shares: Optional[Sequence[float]] = None) -> List[Dict]:
+    """Forecast every goal from one shared batch of simulated paths
+
+    `shares` is the fraction of each month's savings going to each goal (see
+    finance_goals); without it every goal is assumed to get all of it.
+    Returns one dict per goal (same order) with P10/P50/P90 months and
+    completion dates (None when beyond the horizon) and, for goals with a
+    deadline, the probability of reaching the target by then. A goal that is
+    already reached has probability 1, even past its deadline.
+    """
+    if not goals:
+        return []
+    today = today or date.today()
+    remaining = np.array([goal['target_amount'] - goal['current_amount'] for goal in goals], dtype=float)
+    if shares is not None:
+        # Reaching `remaining` on a share of the savings is reaching remaining / share on all of it
+        shares = np.asarray(shares, dtype=float)
+        with np.errstate(divide="ignore"):
+            remaining = np.where(remaining > 0, remaining / shares, remaining)
+    reached = np.array([goal['current_amount'] >= goal['target_amount'] for goal in goals])
+    if reached.all():
+        months = np.zeros((1, len(goals)))
+    else:
+        months = months_to_reach(simulate_savings(net_flows, paths, horizon, seed), remaining)
+    quantiles = np.quantile(months, [p / 100 for p in PERCENTILES], axis=0, method="inverted_cdf")
+
+    forecasts = []
+    for index, goal in enumerate(goals):
+        forecast = {"goal_id": goal.get('id'), "goal_name": goal['goal_name']}
+        for percentile, value in zip(PERCENTILES, quantiles[:, index]):
+            forecast[f"p{percentile}_months"] = float(value)
+            forecast[f"p{percentile}_date"] = _add_months(today, value)
+        forecast["deadline_probability"] = None
+        if goal.get('deadline') and reached[index]:
+            forecast["deadline_probability"] = 1.0
+        elif goal.get('deadline'):
+            deadline_months = months_until(goal['deadline'], today)
+            forecast["deadline_probability"] = float(np.mean(months[:, index] <= deadline_months))
+        forecasts.append(forecast)
+    return forecasts
@@ -0,0 +1,180 @@
+# finance_goals.py
+"""Split monthly savings across all active savings goals.
+
+Allocation is greedy and deadline-aware, in two passes:
+
+1. Goals with a deadline, by priority and then smallest required monthly
+   contribution first, get exactly what they need to finish on time, while
+   the budget lasts. Funding the cheapest deadlines first meets as many of
+   them as possible.
+2. Whatever is left goes to the remaining need of every goal, by priority
+   and then deadline (goals without a deadline last).
+
+Nothing is double-counted: contributions always add up to at most the
+monthly savings. The allocator keeps both orders sorted, so updating one
+goal re-inserts just that goal and reruns the linear passes, without
+reloading or re-sorting every goal.
+"""
+import bisect
+import math
+import threading
+from datetime import date
+from typing import Dict, List, Optional
+
+from dateutil.relativedelta import relativedelta
+
+import finance_db
+
+PRIORITIES = {1: "High", 2: "Normal", 3: "Low"}
+NO_DEADLINE = "9999-12-31"
+
+def months_until(deadline: Optional[str], today: date) -> Optional[int]:
+    """Whole months left until the deadline (at least 1 if it is still ahead), None without a deadline"""
+    if not deadline:
+        return None
+    end = date.fromisoformat(deadline[:10])
+    if end < today:
+        return 0
+    delta = relativedelta(end, today)
+    return max(delta.years * 12 + delta.months, 1)
+
+class GoalAllocator:
+    """Allocation of `monthly_savings` across goals, updatable one goal at a time"""
+
+    def __init__(self, goals: List[Dict], monthly_savings: float, today: date = None):
+        self.monthly_savings = max(monthly_savings, 0.0)
+        self.today = today or date.today()
+        self.data_version = None
+        self._lock = threading.Lock()
+        self._goals = {}
+        self._deadline_order = []   # (priority, required, deadline, id) for goals racing a deadline
+        self._fill_order = []       # (priority, deadline, id) for every unfinished goal
+        for goal in goals:
+            self._insert(dict(goal))
+        self._allocation = self._solve()
+
+    def _keys(self, goal: Dict):
+        remaining = goal['target_amount'] - goal['current_amount']
+        if remaining <= 0:
+            return None, None
+        deadline = goal.get('deadline') or NO_DEADLINE
+        priority = goal.get('priority') or 2
+        months = months_until(goal.get('deadline'), self.today)
+        deadline_key = (priority, remaining / months, deadline, goal['id']) if months else None
+        return deadline_key, (priority, deadline, goal['id'])
+
+    def _insert(self, goal: Dict):
+        self._goals[goal['id']] = goal
+        deadline_key, fill_key = self._keys(goal)
+        if deadline_key:
+            bisect.insort(self._deadline_order, deadline_key)
+        if fill_key:
+            bisect.insort(self._fill_order, fill_key)
+
+    def _remove(self, goal_id: int):
+        goal = self._goals.pop(goal_id)
+        for order, key in zip((self._deadline_order, self._fill_order), self._keys(goal)):
+            if key:
+                del order[bisect.bisect_left(order, key)]
+
+    def _solve(self) -> Dict[int, float]:
+        contributions = dict.fromkeys(self._goals, 0.0)
+        budget = self.monthly_savings
+
+        # Pass 1: fund on-time contributions, cheapest first within each priority
+        for _, required, _, goal_id in self._deadline_order:
+            if required <= budget:
+                contributions[goal_id] = required
+                budget -= required
+
+        # Pass 2: spread the rest over what each goal still needs
+        for _, _, goal_id in self._fill_order:
+            if budget <= 0:
+                break
+            goal = self._goals[goal_id]
+            need = goal['target_amount'] - goal['current_amount'] - contributions[goal_id]
+            extra = min(max(need, 0.0), budget)
+            contributions[goal_id] += extra
+            budget -= extra
+        return contributions
+
+    def update_goal(self, goal_id: int, current_amount: float = None, **changes):
+        """Re-solve after one goal changed (progress, target, deadline or priority)"""
+        with self._lock:
+            if goal_id not in self._goals:
+                return
+            goal = dict(self._goals[goal_id])
+            if current_amount is not None:
+                goal['current_amount'] = current_amount
+            goal.update(changes)
+            self._remove(goal_id)
+            self._insert(goal)
+            self._allocation = self._solve()
+
+    def set_monthly_savings(self, monthly_savings: float):
+        with self._lock:
+            self.monthly_savings = max(monthly_savings, 0.0)
+            self._allocation = self._solve()
+
+    def plan(self, goal_id: int) -> Dict:
+        """Monthly contribution, ETA and deadline outlook for one goal"""
+        goal = self._goals[goal_id]
+        remaining = max(goal['target_amount'] - goal['current_amount'], 0.0)
+        contribution = self._allocation.get(goal_id, 0.0)
+        months = months_until(goal.get('deadline'), self.today)
+        if remaining == 0:
+            months_needed = 0
+        elif contribution > 0:
+            months_needed = math.ceil(remaining / contribution - 1e-9)
+        else:
+            months_needed = None
+        eta = (self.today + relativedelta(months=months_needed)).isoformat() if months_needed is not None else None
+        meets_deadline = None
+        if goal.get('deadline'):
+            meets_deadline = months_needed is not None and (months_needed == 0 or (bool(months) and months_needed <= months))
+        return {
+            "goal_id": goal_id,
+            "goal_name": goal['goal_name'],
+            "monthly_contribution": contribution,
+            "required_monthly": remaining / months if months else None,
+            "months_needed": months_needed,
+            "eta": eta,
+            "meets_deadline": meets_deadline
+        }
+
+    def allocation(self) -> Dict[int, Dict]:
+        """Plans for every goal, keyed by goal id"""
+        with self._lock:
+            return {goal_id: self.plan(goal_id) for goal_id in self._goals}
+
+def allocate_savings(goals: List[Dict], monthly_savings: float, today: date = None) -> Dict[int, Dict]:
+    """One-off allocation of monthly savings across goals, keyed by goal id"""
+    return GoalAllocator(goals, monthly_savings, today).allocation()
+
+# Process-wide allocator per user, kept current through finance_db.GOAL_UPDATE_HOOKS
+_allocators = {}
+_allocator_lock = threading.Lock()
+
+def get_allocator(monthly_savings: float, user_id: int) -> GoalAllocator:
+    """Allocator for a user's active goals, reloaded only when something other than goal progress changed"""
+    with _allocator_lock:
+        version = finance_db.get_data_version(user_id)
+        allocator = _allocators.get(user_id)
+        if allocator is None or allocator.data_version != version or allocator.today != date.today():
+            allocator = GoalAllocator(finance_db.get_savings_goals(user_id), monthly_savings)
+            allocator.data_version = version
+            _allocators[user_id] = allocator
+        elif allocator.monthly_savings != max(monthly_savings, 0.0):
+            allocator.set_monthly_savings(monthly_savings)
+        return allocator
+
+def _on_goal_update(user_id: int, goal_id: int, current_amount: float, previous_version: int):
+    # Only an allocator that was current just before this write can be patched;
+    # a stale one is reloaded by the next get_allocator() anyway
+    with _allocator_lock:
+        allocator = _allocators.get(user_id)
+        if allocator is not None and allocator.data_version == previous_version:
+            allocator.update_goal(goal_id, current_amount)
+            allocator.data_version = finance_db.get_data_version(user_id)
+
+finance_db.GOAL_UPDATE_HOOKS.append(_on_goal_update)
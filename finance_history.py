@@ -0,0 +1,124 @@
+# finance_history.py
+"""Keep chat history bounded over long sessions.
+
+The last few turns are kept verbatim. Older turns are folded into a short
+rolling digest (the question plus the first sentence of the answer), which
+travels in the system instruction instead of the history. Financial context
+blocks that older sessions embedded in user prompts are stripped, since the
+context is already part of the system instruction.
+"""
+import re
+from typing import Dict, List
+
+from finance_context import estimate_tokens
+
+KEEP_TURNS = 6
+HISTORY_TOKEN_BUDGET = 2000
+DIGEST_TOKEN_BUDGET = 300
+DIGEST_LINE_CHARS = 160
+
+DIGEST_HEADER = "Ringkasan percakapan sebelumnya:"
+
+# Context block that used to be prepended to every user prompt, up to the question itself
+_LEGACY_CONTEXT = re.compile(r"^\[User's financial context:.*?\]\s*User question:\s*", re.S)
+_FIRST_SENTENCE = re.compile(r"^(.+?[.!?])(\s|$)", re.S)
+
+def content_role(content) -> str:
+    """Role of a history entry (genai Content object or dict)"""
+    return content["role"] if isinstance(content, dict) else content.role
+
+def content_text(content) -> str:
+    """Text of a history entry (genai Content object or dict)"""
+    if isinstance(content, dict):
+        parts = content.get("parts") or [{"text": content.get("text", "")}]
+        return "".join(part.get("text") or "" for part in parts)
+    return "".join(getattr(part, "text", None) or "" for part in content.parts or [])
+
+def make_content(role: str, text: str) -> Dict:
+    return {"role": role, "parts": [{"text": text}]}
+
+def strip_context(content) -> str:
+    """Text of a history entry without the context block older sessions put in user prompts
+
+    Model replies are left as they are, even when they list goals or a summary.
+    """
+    text = content_text(content)
+    if content_role(content) == "user":
+        text = _LEGACY_CONTEXT.sub("", text)
+    return text.strip()
+
+def _brief(text: str, limit: int = DIGEST_LINE_CHARS) -> str:
+    text = " ".join(text.split())
+    match = _FIRST_SENTENCE.match(text)
+    if match:
+        text = match.group(1)
+    return text if len(text) <= limit else text[:limit - 3].rstrip() + "..."
+
+def split_turns(history: List) -> List[List]:
+    """Group history entries into turns, each starting with a user message"""
+    turns = []
+    for content in history:
+        if content_role(content) == "user" or not turns:
+            turns.append([])
+        turns[-1].append(content)
+    return turns
+
+class ChatHistory:
+    """Rolling digest of older turns plus the last `keep_turns` turns verbatim"""
+
+    def __init__(self, keep_turns: int = KEEP_TURNS, max_tokens: int = HISTORY_TOKEN_BUDGET,
+                 digest_tokens: int = DIGEST_TOKEN_BUDGET):
+        self.keep_turns = keep_turns
+        self.max_tokens = max_tokens
+        self.digest_tokens = digest_tokens
+        self.digest_lines: List[str] = []
+        self.compacted_turns = 0
+
+    @property
+    def digest(self) -> str:
+        if not self.digest_lines:
+            return ""
+        return DIGEST_HEADER + "\n" + "\n".join(self.digest_lines)
+
+    def _fold(self, turn: List):
+        question = answer = ""
+        for content in turn:
+            text = strip_context(content)
+            if content_role(content) == "user":
+                question = question or text
+            else:
+                answer = answer or text
+        self.digest_lines.append(f"- Q: {_brief(question)} A: {_brief(answer)}")
+        self.compacted_turns += 1
+        # Oldest lines drop off first once the digest is over budget
+        while len(self.digest_lines) > 1 and estimate_tokens(self.digest) > self.digest_tokens:
+            self.digest_lines.pop(0)
+
+    def needs_compaction(self, history: List) -> bool:
+        """Whether the history has grown past the turn or token limits, or carries context blocks"""
+        turns = split_turns(history)
+        if len(turns) > self.keep_turns or (len(turns) > 1 and history_tokens(turns) > self.max_tokens):
+            return True
+        return any(strip_context(content) != content_text(content).strip() for content in history)
+
+    def compact(self, history: List) -> List[Dict]:
+        """Return the history to keep, folding older turns into the digest
+
+        Context blocks are stripped from every kept user message. Older turns are
+        folded until at most `keep_turns` remain and they fit in `max_tokens`;
+        the latest turn is always kept.
+        """
+        turns = [[make_content(content_role(c), strip_context(c)) for c in turn]
+                 for turn in split_turns(history)]
+        while turns and (len(turns) > self.keep_turns or
+                         (len(turns) > 1 and history_tokens(turns) > self.max_tokens)):
+            self._fold(turns.pop(0))
+        return [content for turn in turns for content in turn]
+
+    def payload_tokens(self, system_instruction: str, history: List, message: str = "") -> int:
+        """Estimated size of the next request: system instruction, history and message"""
+        return (estimate_tokens(system_instruction) + history_tokens(split_turns(history)) +
+                estimate_tokens(message))
+
+def history_tokens(turns: List[List]) -> int:
+    return sum(estimate_tokens(content_text(content)) for turn in turns for content in turn)
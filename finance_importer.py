@@ -0,0 +1,304 @@
+# finance_importer.py
+"""Import bank statements (CSV or OFX) into the expenses table.
+
+Statements are parsed lazily, line by line, as a generator pipeline:
+
+    read lines -> parse transactions -> keep debits -> categorize -> bulk insert
+
+so even very large exports import in bounded memory. (Streamlit keeps an
+uploaded file in memory itself, so browser uploads cost their file size on
+top; use the CLI for the largest exports.) Rows that cannot be parsed are
+skipped and reported through `on_error` when one is given.
+
+Usage: python finance_importer.py statement.csv [--format csv|ofx]
+"""
+import argparse
+import csv
+import io
+import os
+import re
+import sys
+from datetime import datetime
+from typing import Callable, Iterable, Iterator, Optional, Tuple
+
+import finance_db
+from finance_calculator import ALL_CATEGORIES
+
+# (date, description, amount) - amount is negative for money leaving the account
+Transaction = Tuple[str, str, float]
+
+# Called with (line number, error message) for each row that cannot be parsed
+ErrorHandler = Callable[[int, str], None]
+
+# Keyword rules for mapping a transaction description to a category.
+# Checked in order, so more specific rules (food delivery) come before broader ones (Grab).
+CATEGORY_KEYWORDS = [
+    ("Makan di Luar (Restaurant)", ["gofood", "grabfood", "shopeefood", "restaurant", "resto", "restoran",
+                                    "cafe", "kafe", "kopi", "coffee", "starbucks", "mcd", "mcdonalds",
+                                    "kfc", "pizza", "warung", "rumah makan"]),
+    ("Traveling", ["traveloka", "tiket.com", "agoda", "airbnb", "booking.com", "hotel", "airasia",
+                   "garuda", "citilink", "lion air", "batik air"]),
+    ("Transportasi", ["grab", "gojek", "gocar", "goride", "maxim", "uber", "transjakarta", "krl", "mrt",
+                      "kai", "pertamina", "spbu", "shell", "bensin", "parkir", "tol", "toll", "e-toll"]),
+    ("Tagihan (Listrik, Air, Internet)", ["pln", "listrik", "token listrik", "pdam", "indihome", "telkom",
+                                          "telkomsel", "xl", "indosat", "biznet", "first media", "myrepublic",
+                                          "pulsa", "paket data", "internet"]),
+    ("Sewa/Cicilan Rumah", ["sewa", "kos", "kost", "kontrakan", "kpr", "cicilan rumah", "rent", "mortgage"]),
+    ("Kesehatan", ["apotek", "apotik", "kimia farma", "guardian", "rumah sakit", "klinik", "dokter",
+                   "halodoc", "bpjs", "pharmacy", "hospital", "clinic"]),
+    ("Pendidikan", ["sekolah", "spp", "kursus", "universitas", "kampus", "udemy", "coursera", "ruangguru",
+                    "gramedia", "tuition"]),
+    ("Hiburan", ["netflix", "spotify", "youtube", "disney", "vidio", "bioskop", "xxi", "cgv", "cinepolis",
+                 "steam", "playstation", "cinema"]),
+    ("Belanja (Fashion, Gadget)", ["tokopedia", "shopee", "lazada", "blibli", "zalora", "uniqlo", "h&m",
+                                   "zara", "ibox", "erafone", "electronic"]),
+    ("Makanan & Minuman", ["indomaret", "alfamart", "alfamidi", "superindo", "hypermart", "transmart",
+                           "lottemart", "supermarket", "grocery", "pasar", "sayur"]),
+    ("Hobi", ["gym", "fitness", "decathlon", "hobby", "hobi", "sport"]),
+]
+
+DEFAULT_CATEGORY = "Lainnya"
+
+_CATEGORY_PATTERNS = [
+    (re.compile(r"(?<![a-z0-9])(?:" + "|".join(re.escape(k) for k in keywords) + r")(?![a-z0-9])"), category)
+    for category, keywords in CATEGORY_KEYWORDS
+    if category in ALL_CATEGORIES
+]
+
+# Header names seen in common bank CSV exports (lowercased)
+DATE_COLUMNS = ("date", "tanggal", "tgl", "transaction date", "tanggal transaksi", "posting date")
+DESCRIPTION_COLUMNS = ("description", "keterangan", "deskripsi", "uraian", "memo", "narrative", "details")
+AMOUNT_COLUMNS = ("amount", "jumlah", "nominal", "mutasi")
+DEBIT_COLUMNS = ("debit", "debet", "withdrawal", "keluar")
+TYPE_COLUMNS = ("type", "jenis", "db/cr", "d/k", "dk")
+
+# Unreadable rows listed by the CLI and the upload page
+SKIPPED_SHOWN = 20
+
+class SkippedRows:
+    """`on_error` handler that counts skipped rows but keeps only the first `shown`
+
+    Memory stays bounded however many rows of a bad file are rejected.
+    """
+
+    def __init__(self, shown: int = SKIPPED_SHOWN):
+        self.shown = shown
+        self.count = 0
+        self.first = []
+
+    def __call__(self, line: int, message: str):
+        self.count += 1
+        if len(self.first) < self.shown:
+            self.first.append((line, message))
+
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%d/%m/%y", "%Y/%m/%d", "%d %b %Y", "%Y%m%d")
+
+def categorize_description(description: str) -> str:
+    """Map a bank transaction description to one of ALL_CATEGORIES"""
+    text = description.lower()
+    for pattern, category in _CATEGORY_PATTERNS:
+        if pattern.search(text):
+            return category
+    return DEFAULT_CATEGORY
+
+def parse_date(value: str) -> str:
+    """Parse a statement date into ISO format (YYYY-MM-DD)"""
+    value = value.strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date().isoformat()
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognized date: {value!r}")
+
+def parse_amount(value: str) -> float:
+    """Parse amounts like '-150000', '1.250.000,00', '1,250,000.00' or '(25.000)'"""
+    text = value.strip().replace("Rp", "").replace(" ", "")
+    negative = text.startswith("-") or (text.startswith("(") and text.endswith(")"))
+    text = text.strip("-()+")
+    if not text:
+        return 0.0
+
+    # The right-most separator is the decimal mark only if followed by 1-2 digits
+    last_sep = max(text.rfind("."), text.rfind(","))
+    if last_sep != -1 and len(text) - last_sep - 1 in (1, 2):
+        whole, decimals = text[:last_sep], text[last_sep + 1:]
+    else:
+        whole, decimals = text, ""
+    whole = whole.replace(".", "").replace(",", "")
+    amount = float(f"{whole}.{decimals}" if decimals else whole)
+    return -amount if negative else amount
+
+def _find_column(fieldnames, candidates) -> Optional[str]:
+    lookup = {name.strip().lower(): name for name in fieldnames if name}
+    for candidate in candidates:
+        if candidate in lookup:
+            return lookup[candidate]
+    return None
+
+def read_csv_transactions(lines: Iterable[str], on_error: Optional[ErrorHandler] = None) -> Iterator[Transaction]:
+    """Yield (date, description, amount) from a bank CSV export, one row at a time.
+
+    Debits come out negative: either from a dedicated debit column, from a
+    DB/CR type column, or from the sign of a single amount column. A row with
+    an unreadable date or amount is passed to `on_error` and skipped, or
+    raises ValueError without a handler.
+    """
+    reader = csv.DictReader(lines)
+    fieldnames = reader.fieldnames or []
+    date_col = _find_column(fieldnames, DATE_COLUMNS)
+    desc_col = _find_column(fieldnames, DESCRIPTION_COLUMNS)
+    amount_col = _find_column(fieldnames, AMOUNT_COLUMNS)
+    debit_col = _find_column(fieldnames, DEBIT_COLUMNS)
+    type_col = _find_column(fieldnames, TYPE_COLUMNS)
+
+    if not date_col or not (amount_col or debit_col):
+        raise ValueError(f"Unrecognized CSV header: {fieldnames}")
+
+    for row in reader:
+        if not row.get(date_col):
+            continue
+        description = (row.get(desc_col) or "").strip() if desc_col else ""
+
+        try:
+            if debit_col:
+                debit = row.get(debit_col) or ""
+                if not debit.strip():
+                    continue
+                amount = -abs(parse_amount(debit))
+            else:
+                amount = parse_amount(row.get(amount_col) or "0")
+                if type_col and amount > 0:
+                    kind = (row.get(type_col) or "").strip().upper()
+                    if kind in ("DB", "D", "DR", "DEBIT", "DEBET"):
+                        amount = -amount
+            transaction = (parse_date(row[date_col]), description, amount)
+        except ValueError as error:
+            if on_error is None:
+                raise
+            on_error(reader.line_num, str(error))
+            continue
+
+        yield transaction
+
+_OFX_TAG = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<]*)")
+
+def read_ofx_transactions(lines: Iterable[str], on_error: Optional[ErrorHandler] = None) -> Iterator[Transaction]:
+    """Yield (date, description, amount) from an OFX/QFX export, one <STMTTRN> at a time.
+
+    Works for both SGML-style OFX 1.x (unclosed tags) and XML OFX 2.x.
+    Unreadable transactions are handled like read_csv_transactions() does.
+    """
+    current = None
+    for number, line in enumerate(lines, start=1):
+        for closing, tag, value in _OFX_TAG.findall(line):
+            tag = tag.upper()
+            if tag == "STMTTRN":
+                if closing and current is not None:
+                    if "DTPOSTED" in current and "TRNAMT" in current:
+                        description = current.get("NAME") or current.get("MEMO") or ""
+                        try:
+                            transaction = (parse_date(current["DTPOSTED"][:8]), description.strip(),
+                                           parse_amount(current["TRNAMT"]))
+                        except ValueError as error:
+                            if on_error is None:
+                                raise
+                            on_error(number, str(error))
+                        else:
+                            yield transaction
+                    current = None
+                elif not closing:
+                    current = {}
+            elif current is not None and not closing and value.strip():
+                current[tag] = value.strip()
+
+def expenses_from_transactions(transactions: Iterable[Transaction]) -> Iterator[tuple]:
+    """Keep outgoing transactions and turn them into (date, category, amount, note) rows"""
+    for date, description, amount in transactions:
+        if amount >= 0:
+            continue
+        yield (date, categorize_description(description), -amount, description)
+
+def detect_format(name: str) -> str:
+    """Guess the statement format from a file name"""
+    extension = os.path.splitext(name)[1].lower()
+    return "ofx" if extension in (".ofx", ".qfx") else "csv"
+
+def import_statement(lines: Iterable[str], fmt: str = "csv",
+                     progress: Optional[Callable[[int], None]] = None,
+                     batch_size: int = finance_db.BULK_BATCH_SIZE,
+                     *, user_id: int,
+                     on_error: Optional[ErrorHandler] = None) -> int:
+    """Import a statement from an iterable of text lines; returns the number of expenses added
+
+    Expenses are committed batch by batch, and `progress` reports the count
+    committed so far, so after an error that many expenses were kept.
+    """
+    if fmt == "ofx":
+        transactions = read_ofx_transactions(lines, on_error)
+    else:
+        transactions = read_csv_transactions(lines, on_error)
+    return finance_db.bulk_add_expenses(expenses_from_transactions(transactions),
+                                        batch_size=batch_size, progress=progress, user_id=user_id)
+
+def import_file(path: str, fmt: str = None,
+                progress: Optional[Callable[[int], None]] = None,
+                *, user_id: int,
+                on_error: Optional[ErrorHandler] = None) -> int:
+    """Import a statement file from disk"""
+    with open(path, encoding="utf-8-sig", errors="replace", newline="") as handle:
+        return import_statement(handle, fmt or detect_format(path), progress=progress, user_id=user_id,
+                                on_error=on_error)
+
+def import_upload(uploaded_file, progress: Optional[Callable[[int, float], None]] = None,
+                  *, user_id: int,
+                  on_error: Optional[ErrorHandler] = None) -> int:
+    """Import a Streamlit UploadedFile (or any binary file object with a name).
+
+    `progress` receives the running row count and the fraction of the file read.
+    """
+    size = getattr(uploaded_file, "size", 0) or 0
+    text = io.TextIOWrapper(uploaded_file, encoding="utf-8-sig", errors="replace", newline="")
+
+    def report(count: int):
+        if progress:
+            fraction = min(uploaded_file.tell() / size, 1.0) if size else 0.0
+            progress(count, fraction)
+
+    try:
+        return import_statement(text, detect_format(uploaded_file.name), progress=report, user_id=user_id,
+                                on_error=on_error)
+    finally:
+        text.detach()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import a bank statement into the finance database")
+    parser.add_argument("path", help="CSV or OFX statement file")
+    parser.add_argument("--format", choices=["csv", "ofx"], help="statement format (default: from extension)")
+    parser.add_argument("--db", default=finance_db.DB_PATH, help="database file")
+    parser.add_argument("--user", help="username to import for, created without a passphrase if new "
+                                       "(default: the default user)")
+    args = parser.parse_args(argv)
+
+    finance_db.DB_PATH = args.db
+    finance_db.init_database()
+    user_id = finance_db.get_or_create_user(args.user) if args.user else finance_db.DEFAULT_USER_ID
+
+    skipped = SkippedRows()
+
+    def report(count: int):
+        print(f"\rImported {count:,} expenses...", end="", file=sys.stderr, flush=True)
+
+    count = import_file(args.path, args.format, progress=report, user_id=user_id,
+                        on_error=skipped)
+    print(f"\rImported {count:,} expenses from {args.path}", file=sys.stderr)
+    if skipped.count:
+        print(f"Skipped {skipped.count:,} unreadable rows:", file=sys.stderr)
+        for line, message in skipped.first:
+            print(f"  line {line}: {message}", file=sys.stderr)
+        if skipped.count > len(skipped.first):
+            print(f"  ... and {skipped.count - len(skipped.first):,} more", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
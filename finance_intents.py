@@ -0,0 +1,275 @@
+# finance_intents.py
+"""Answer factual chat questions locally, without calling Gemini.
+
+A keyword classifier recognizes common lookups in Indonesian and English
+(total spending, spending in a category, top category, savings rate,
+health score, goal ETA) and answers them exactly from finance_db and
+finance_calculator. Anything else - advice, "why", "how can I", comparisons,
+what is left of a budget, several categories at once, a time period other
+than this month, last month or this year, spending on something that is
+not a known or custom category - returns None so the chat page falls
+through to the LLM.
+"""
+import re
+from collections import namedtuple
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import finance_db
+from finance_calculator import (CATEGORY_TYPES, Window, analyze_spending, format_currency, get_financial_health_score,
+                                month_window, previous_window, rolling_window, savings_per_month, window_months,
+                                ytd_window)
+from finance_goals import get_allocator
+
+# name: intent id, category: matched category (or None), period: "this_month", "last_month", "this_year" or None
+Intent = namedtuple("Intent", ["name", "category", "period", "indonesian"])
+
+# Questions asking for advice or explanations always go to the LLM
+OPEN_ENDED = re.compile(
+    r"\b(kenapa|mengapa|gimana|bagaimana( cara)?|sebaiknya|saran|tips?|rekomendasi|strategi|"
+    r"why|how (can|do|should)|should|advice|suggest\w*|recommend\w*|help me|explain|jelaskan)\b"
+)
+
+# Questions a single spending total would answer wrongly also go to the LLM:
+# comparisons, amounts left in a budget, and amounts not tracked here (tax, debt)
+NEEDS_LLM = re.compile(
+    r"\b(compare[sd]?|comparison|vs|versus|dibanding\w*|bandingkan|"
+    r"left|remaining|(ter)?sisa\w*|budget|anggaran|"
+    r"tax(es)?|pajak|owe|utang|hutang|debts?|loans?|pinjaman)\b"
+)
+
+INDONESIAN_WORDS = re.compile(r"\b(berapa|saya|aku|bulan|kapan|apa|pengeluaran|tabungan|kategori|yang|ini|lalu)\b")
+
+THIS_MONTH = re.compile(r"\b(bulan ini|this month)\b")
+LAST_MONTH = re.compile(r"\b(bulan lalu|bulan kemarin|last month)\b")
+THIS_YEAR = re.compile(r"\b(tahun ini|this year|year to date|ytd)\b")
+
+# Any other time phrase would be answered over the wrong window, so it goes to the LLM.
+# Checked after the periods above are removed from the question.
+OTHER_PERIOD = re.compile(
+    r"\b(yesterday|kemarin|today|tonight|hari ini|\d+ (days?|hari)|week\w*|minggu\w*|pekan\w*|"
+    r"years?|yearly|annual\w*|tahun\w*|quarter\w*|kuartal|semester|"
+    r"average|avg|rata-rata|rata2|per (month|bulan)|monthly|bulanan|"
+    r"januar[iy]|februar[iy]|march|maret|april|may|mei|june?|juni|july|juli|august|agustus|"
+    r"september|o[ck]tober|november|de[cs]ember|(19|20)\d\d)\b"
+)
+
+# Words that introduce what the money went to ("spend on coffee", "pengeluaran untuk Donasi")
+SUBJECT_MARKERS = {"on", "at", "for", "untuk", "buat", "di", "ke", "pada"}
+
+# Words that may follow a marker without naming a subject
+SUBJECT_FILLERS = {
+    "the", "my", "a", "an", "all", "everything", "total", "average", "in", "of", "so", "far",
+    "saya", "aku", "ku", "kamu", "semua", "semuanya", "yang", "ini", "itu", "sih", "ya", "dong", "kah",
+}
+
+# Checked in order; the first intent with a matching pattern wins
+INTENT_PATTERNS = [
+    ("health_score", [r"\b(health score|skor kesehatan|nilai kesehatan|financial health|kesehatan keuangan)\b"]),
+    ("goal_eta", [r"\b(kapan|when)\b.*\b(goal|target|tercapai|reach|achieve)", r"\b(goal|target)\b.*\b(eta|kapan|when|tercapai)\b"]),
+    ("savings_rate", [r"\b(saving[s]? rate|rasio tabungan|persentase tabungan|tingkat tabungan)\b",
+                      r"\bberapa (persen )?(tabungan|nabung)", r"\bhow much (am i|do i) sav"]),
+    ("top_category", [r"\b(top|biggest|largest|highest) (expense|spending)? ?categor", r"\bkategori (terbesar|paling besar|tertinggi)",
+                      r"\bspend (the )?most\b", r"\bpaling (banyak|boros|besar)\b", r"\bpengeluaran terbesar\b"]),
+    ("spending", [r"\b(total|berapa|how much)\b.*\b(pengeluaran|belanja|spend\w*|expense\w*|keluar)",
+                  r"\b(pengeluaran|spending|expenses)\b.*\b(total|berapa)\b"]),
+]
+
+_COMPILED_INTENTS = [(name, [re.compile(p) for p in patterns]) for name, patterns in INTENT_PATTERNS]
+
+# Everyday words for the built-in categories
+CATEGORY_ALIASES = {
+    "Makan di Luar (Restaurant)": ["makan di luar", "restaurant", "restoran", "resto", "eating out", "dining"],
+    "Makanan & Minuman": ["makanan", "minuman", "makan", "food", "groceries", "grocery"],
+    "Transportasi": ["transportasi", "transport", "bensin", "ojek", "fuel"],
+    "Tagihan (Listrik, Air, Internet)": ["tagihan", "listrik", "internet", "bills", "utilities"],
+    "Sewa/Cicilan Rumah": ["sewa", "cicilan", "kos", "rent", "mortgage"],
+    "Kesehatan": ["kesehatan", "obat", "dokter", "health", "medical"],
+    "Pendidikan": ["pendidikan", "sekolah", "kursus", "education", "school"],
+    "Hiburan": ["hiburan", "entertainment", "nonton", "movies"],
+    "Belanja (Fashion, Gadget)": ["belanja", "fashion", "gadget", "shopping", "clothes"],
+    "Traveling": ["traveling", "travel", "liburan", "jalan-jalan", "holiday", "vacation"],
+    "Hobi": ["hobi", "hobby", "hobbies"],
+}
+
+# Longest first, so "makan di luar" is matched before "makan"
+_ALIASES = sorted(((alias, category) for category, aliases in CATEGORY_ALIASES.items() for alias in aliases),
+                  key=lambda item: -len(item[0]))
+
+def _find_categories(text: str, custom_categories: Iterable[str] = ()) -> Tuple[List[str], str]:
+    """Categories mentioned in the (lowercased) question, in order found, and the rest of the question
+
+    The user's custom categories are matched by name before the aliases of
+    the built-in ones. Aliases also match their plural ("restaurants"). Each
+    match is blanked out before looking further, so one phrase never counts
+    as two categories.
+    """
+    found = []
+    for category in CATEGORY_TYPES:
+        if category.lower() in text:
+            found.append(category)
+            text = text.replace(category.lower(), " ")
+    for category in sorted(custom_categories, key=lambda name: -len(name)):
+        pattern = rf"\b{re.escape(category.lower())}s?\b"
+        if re.search(pattern, text):
+            found.append(category)
+            text = re.sub(pattern, " ", text)
+    for alias, category in _ALIASES:
+        pattern = rf"\b{re.escape(alias)}s?\b"
+        if re.search(pattern, text):
+            if category not in found:
+                found.append(category)
+            text = re.sub(pattern, " ", text)
+    return found, text
+
+def _names_unknown_subject(text: str) -> bool:
+    """Whether the question, with known categories and periods blanked out, still says what the money went to
+
+    "How much did I spend on coffee?" or "at Starbucks" has a subject no
+    category covers, and a total over everything would be the wrong answer.
+    """
+    words = re.findall(r"[\w&'-]+", text)
+    for index, word in enumerate(words):
+        if word not in SUBJECT_MARKERS:
+            continue
+        following = [w for w in words[index + 1:] if w not in SUBJECT_FILLERS]
+        if following and following[0] not in SUBJECT_MARKERS:
+            return True
+    return False
+
+def classify_intent(prompt: str, custom_categories: Iterable[str] = ()) -> Optional[Intent]:
+    """Classify a chat question into a lookup intent, or None if it is open-ended
+
+    `custom_categories` are the user's own category names, recognized
+    alongside the built-in ones.
+    """
+    text = " ".join(prompt.lower().split())
+    if OPEN_ENDED.search(text) or NEEDS_LLM.search(text):
+        return None
+    categories, rest = _find_categories(text, custom_categories)
+    if len(categories) > 1:
+        return None
+
+    # One known period at most; two periods are a comparison, and any other period can't be answered here
+    periods = []
+    for name, pattern in (("this_month", THIS_MONTH), ("last_month", LAST_MONTH), ("this_year", THIS_YEAR)):
+        if pattern.search(rest):
+            periods.append(name)
+            rest = pattern.sub(" ", rest)
+    if len(periods) > 1 or OTHER_PERIOD.search(rest):
+        return None
+    period = periods[0] if periods else None
+    indonesian = bool(INDONESIAN_WORDS.search(text))
+
+    for name, patterns in _COMPILED_INTENTS:
+        if any(pattern.search(text) for pattern in patterns):
+            if name != "goal_eta" and _names_unknown_subject(rest):
+                return None
+            category = categories[0] if name == "spending" and categories else None
+            return Intent(name, category, period, indonesian)
+    return None
+
+def _period_window(period: Optional[str], today: date = None) -> Window:
+    """Window for a period; with no period, the last 30 days like the app's pages"""
+    today = today or date.today()
+    if period == "this_month":
+        return month_window(today.year, today.month)
+    if period == "last_month":
+        return previous_window(month_window(today.year, today.month))
+    if period == "this_year":
+        return ytd_window(today)
+    return rolling_window(30, today)
+
+def _period_label(period: Optional[str], indonesian: bool) -> str:
+    labels = {
+        "this_month": ("bulan ini", "this month"),
+        "last_month": ("bulan lalu", "last month"),
+        "this_year": ("tahun ini", "this year"),
+        None: ("dalam 30 hari terakhir", "in the last 30 days"),
+    }
+    return labels[period][0 if indonesian else 1]
+
+def _goal_outlook(plan: Optional[Dict], indonesian: bool) -> str:
+    """ETA and deadline outlook for one goal's allocation plan"""
+    if plan is None or plan['months_needed'] == 0:
+        return "sudah tercapai" if indonesian else "already reached"
+    if plan['months_needed'] is None:
+        return ("belum ada tabungan yang tersisa untuk target ini" if indonesian
+                else "no savings left to allocate to this goal")
+    eta = date.fromisoformat(plan['eta']).strftime("%B %Y")
+    outlook = f"{eta} ({format_currency(plan['monthly_contribution'])}/{'bulan' if indonesian else 'month'})"
+    if plan['meets_deadline'] is True:
+        outlook += " · ✅ " + ("sesuai deadline" if indonesian else "on track")
+    elif plan['meets_deadline'] is False:
+        outlook += " · ⚠️ " + ("melewati deadline" if indonesian else "misses the deadline")
+    return outlook
+
+def answer_intent(intent: Intent, profile: Dict, goals: List[Dict]) -> str:
+    """Answer a classified intent exactly from the stored data"""
+    user_id = profile['user_id']
+    window = _period_window(intent.period)
+    totals = finance_db.get_spending_totals(window.start, window.end, user_id=user_id)
+    analysis = analyze_spending(totals, profile['monthly_income'], window_months(window),
+                                finance_db.get_budget_allocation(user_id))
+    when = _period_label(intent.period, intent.indonesian)
+    indonesian = intent.indonesian
+
+    if intent.name == "spending" and intent.category:
+        amount = analysis['category_breakdown'].get(intent.category, 0)
+        if indonesian:
+            return f"Pengeluaran kamu untuk **{intent.category}** {when}: **{format_currency(amount)}**."
+        return f"You spent **{format_currency(amount)}** on **{intent.category}** {when}."
+
+    if intent.name == "spending":
+        if indonesian:
+            return (f"Total pengeluaran kamu {when}: **{format_currency(analysis['total_expenses'])}** "
+                    f"(Kebutuhan {format_currency(analysis['needs_total'])}, Keinginan {format_currency(analysis['wants_total'])}).")
+        return (f"Your total spending {when} is **{format_currency(analysis['total_expenses'])}** "
+                f"(Needs {format_currency(analysis['needs_total'])}, Wants {format_currency(analysis['wants_total'])}).")
+
+    if intent.name == "top_category":
+        breakdown = analysis['category_breakdown']
+        if not breakdown:
+            return (f"Belum ada pengeluaran yang tercatat {when}." if indonesian
+                    else f"No expenses recorded {when}.")
+        category, amount = max(breakdown.items(), key=lambda item: item[1])
+        if indonesian:
+            return f"Kategori pengeluaran terbesar kamu {when} adalah **{category}** sebesar **{format_currency(amount)}**."
+        return f"Your biggest spending category {when} is **{category}** at **{format_currency(amount)}**."
+
+    if intent.name == "savings_rate":
+        if indonesian:
+            return (f"Saving rate kamu {when}: **{analysis['savings_percentage']:.1f}%** "
+                    f"({format_currency(analysis['actual_savings'])} dari penghasilan {format_currency(analysis['income'])}).")
+        return (f"Your savings rate {when} is **{analysis['savings_percentage']:.1f}%** "
+                f"({format_currency(analysis['actual_savings'])} of {format_currency(analysis['income'])} income).")
+
+    if intent.name == "health_score":
+        health = get_financial_health_score(analysis)
+        if indonesian:
+            return f"Skor kesehatan keuangan kamu: {health['status']} **{health['score']}/100** ({health['grade']})."
+        return f"Your financial health score is {health['status']} **{health['score']}/100** ({health['grade']})."
+
+    if intent.name == "goal_eta":
+        if not goals:
+            return "Kamu belum punya target tabungan." if indonesian else "You don't have any savings goals yet."
+        # Same split of monthly savings across all goals as the Savings Goals page
+        plans = get_allocator(savings_per_month(analysis), user_id).allocation()
+        lines = []
+        for goal in goals:
+            lines.append(f"- **{goal['goal_name']}**: {_goal_outlook(plans.get(goal['id']), indonesian)}")
+        header = "Perkiraan target tabungan tercapai:" if indonesian else "Estimated goal completion:"
+        return header + "\n" + "\n".join(lines)
+
+    raise ValueError(f"Unknown intent: {intent.name}")
+
+def route_question(prompt: str, profile: Dict, goals: List[Dict]) -> Optional[str]:
+    """Answer the question locally if it is a known lookup, otherwise return None"""
+    intent = classify_intent(prompt, finance_db.get_custom_categories(profile['user_id']))
+    if intent is None:
+        return None
+    if intent.name == "goal_eta":
+        text = prompt.lower()
+        named = [goal for goal in goals if goal['goal_name'].lower() in text]
+        goals = named or goals
+    return answer_intent(intent, profile, goals)
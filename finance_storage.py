@@ -0,0 +1,695 @@
+# finance_storage.py
+"""Pluggable storage backends behind one repository interface.
+
+Repository covers user profiles, expenses, savings goals and budget
+allocations, with the same method names and signatures as the finance_db
+functions, so code written against finance_db can take a repository
+instead. Three implementations:
+
+- SQLiteRepository: the finance_db functions (pooling, shards) on a database
+  file of its own
+- MemoryRepository: plain Python structures, for tests and benchmarks
+- PostgresRepository: Postgres-dialect SQL over any DB-API connection in
+  "format" paramstyle (psycopg), testable without a server through
+  PostgresStandIn
+
+open_repository() builds one from a URL such as "sqlite:///finance_data.db",
+"memory://" or "postgresql://user@host/db".
+"""
+import bisect
+import itertools
+import re
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import finance_db
+from finance_calculator import CATEGORY_TYPES, summarize_expenses
+from finance_db import BULK_BATCH_SIZE, DEFAULT_BUDGET, PAGE_SIZE, month_span, totals_from_rows
+
+class Repository(ABC):
+    """Storage for one or more users' finance data (see finance_db for each method's contract)"""
+
+    # Profile
+    @abstractmethod
+    def get_user_profile(self, user_id: int) -> Optional[Dict]: ...
+
+    @abstractmethod
+    def save_user_profile(self, name: str, monthly_income: float, status: str = "Single", dependents: int = 0,
+                          *, user_id: int): ...
+
+    # Expenses
+    @abstractmethod
+    def add_expense(self, date: str, category: str, amount: float, note: str = "",
+                    *, user_id: int): ...
+
+    @abstractmethod
+    def bulk_add_expenses(self, rows: Iterable, batch_size: int = BULK_BATCH_SIZE,
+                          progress: Optional[Callable[[int], None]] = None,
+                          *, user_id: int) -> int: ...
+
+    @abstractmethod
+    def get_expenses(self, start_date: str = None, end_date: str = None,
+                     *, user_id: int) -> List[Dict]: ...
+
+    @abstractmethod
+    def get_expenses_page(self, category: str = None, start_date: str = None, end_date: str = None,
+                          after: tuple = None, limit: int = PAGE_SIZE,
+                          *, user_id: int) -> List[Dict]: ...
+
+    @abstractmethod
+    def count_expenses(self, category: str = None, start_date: str = None, end_date: str = None,
+                       *, user_id: int) -> Dict[str, float]: ...
+
+    @abstractmethod
+    def get_expense_date_range(self, user_id: int) -> Tuple[Optional[str], Optional[str]]: ...
+
+    @abstractmethod
+    def delete_expenses(self, expense_ids: Iterable[int], user_id: int) -> int: ...
+
+    @abstractmethod
+    def get_spending_totals(self, start_date: str = None, end_date: str = None,
+                            *, user_id: int) -> Dict: ...
+
+    @abstractmethod
+    def get_monthly_totals(self, start_month: str = None, end_month: str = None,
+                           *, user_id: int) -> Dict[str, Dict]: ...
+
+    # Savings goals
+    @abstractmethod
+    def add_savings_goal(self, goal_name: str, target_amount: float, deadline: str = None, priority: int = 2,
+                         *, user_id: int): ...
+
+    @abstractmethod
+    def get_savings_goals(self, user_id: int) -> List[Dict]: ...
+
+    @abstractmethod
+    def update_goal_progress(self, goal_id: int, current_amount: float, user_id: int): ...
+
+    # Budget allocation
+    @abstractmethod
+    def get_budget_allocation(self, user_id: int) -> Dict[str, float]: ...
+
+    @abstractmethod
+    def save_budget_allocation(self, needs_percentage: float, wants_percentage: float, savings_percentage: float,
+                               user_id: int): ...
+
+    def close(self):
+        """Release connections held by the backend"""
+
+def _expense_row(row, user_id: int, created_at: str) -> Dict:
+    """Normalize a dict or (date, category, amount[, note]) row like finance_db._expense_tuple()"""
+    if isinstance(row, dict):
+        date, category, amount, note = row["date"], row["category"], row["amount"], row.get("note")
+    else:
+        date, category, amount = row[:3]
+        note = row[3] if len(row) > 3 else ""
+    return {"date": date, "category": category, "amount": amount, "note": note or "",
+            "created_at": created_at, "user_id": user_id}
+
+def _batches(rows: Iterable, batch_size: int, user_id: int) -> Iterator[List[Dict]]:
+    """Normalized, category-checked batches of at most `batch_size` rows, read lazily like finance_db"""
+    rows = iter(rows)
+    while True:
+        created_at = datetime.now().isoformat()
+        batch = [_expense_row(row, user_id, created_at) for row in islice(rows, batch_size)]
+        if not batch:
+            return
+        _check_categories(batch)
+        yield batch
+
+def _check_categories(rows: List[Dict]):
+    unknown = {row["category"] for row in rows} - CATEGORY_TYPES.keys()
+    if unknown:
+        raise ValueError(f"Unknown categories: {', '.join(sorted(unknown))}")
+
+def _check_budget(needs_percentage: float, wants_percentage: float, savings_percentage: float):
+    if abs(needs_percentage + wants_percentage + savings_percentage - 100) > 1e-6:
+        raise ValueError("Budget percentages must add up to 100")
+
+# ==================== SQLITE ====================
+class SQLiteRepository(Repository):
+    """The finance_db functions as a repository on a database file of its own
+
+    Each repository has its own ShardRouter (pools for `path` and its shard
+    files) and runs every call inside finance_db.use_router(), so several
+    repositories in one process never touch each other's files or DB_PATH.
+    """
+
+    def __init__(self, path: str = None, shard_count: int = None):
+        self._router = finance_db.ShardRouter(path or finance_db.DB_PATH,
+                                              finance_db.SHARD_COUNT if shard_count is None else shard_count)
+        self._call(finance_db.init_database)
+
+    def _call(self, func: Callable, *args, **kwargs):
+        with finance_db.use_router(self._router):
+            return func(*args, **kwargs)
+
+    def get_user_profile(self, user_id):
+        return self._call(finance_db.get_user_profile, user_id)
+
+    def save_user_profile(self, name, monthly_income, status="Single", dependents=0, *, user_id):
+        self._call(finance_db.save_user_profile, name, monthly_income, status, dependents, user_id=user_id)
+
+    def add_expense(self, date, category, amount, note="", *, user_id):
+        self._call(finance_db.add_expense, date, category, amount, note, user_id=user_id)
+
+    def bulk_add_expenses(self, rows, batch_size=BULK_BATCH_SIZE, progress=None, *, user_id):
+        return self._call(finance_db.bulk_add_expenses, rows, batch_size, progress, user_id=user_id)
+
+    def get_expenses(self, start_date=None, end_date=None, *, user_id):
+        return self._call(finance_db.get_expenses, start_date, end_date, user_id=user_id)
+
+    def get_expenses_page(self, category=None, start_date=None, end_date=None, after=None, limit=PAGE_SIZE,
+                          *, user_id):
+        return self._call(finance_db.get_expenses_page, category, start_date, end_date, after, limit,
+                          user_id=user_id)
+
+    def count_expenses(self, category=None, start_date=None, end_date=None, *, user_id):
+        return self._call(finance_db.count_expenses, category, start_date, end_date, user_id=user_id)
+
+    def get_expense_date_range(self, user_id):
+        return self._call(finance_db.get_expense_date_range, user_id)
+
+    def delete_expenses(self, expense_ids, user_id):
+        return self._call(finance_db.delete_expenses, expense_ids, user_id)
+
+    def get_spending_totals(self, start_date=None, end_date=None, *, user_id):
+        return self._call(finance_db.get_spending_totals, start_date, end_date, user_id=user_id)
+
+    def get_monthly_totals(self, start_month=None, end_month=None, *, user_id):
+        return self._call(finance_db.get_monthly_totals, start_month, end_month, user_id=user_id)
+
+    def add_savings_goal(self, goal_name, target_amount, deadline=None, priority=2, *, user_id):
+        self._call(finance_db.add_savings_goal, goal_name, target_amount, deadline, priority, user_id=user_id)
+
+    def get_savings_goals(self, user_id):
+        return self._call(finance_db.get_savings_goals, user_id)
+
+    def update_goal_progress(self, goal_id, current_amount, user_id):
+        self._call(finance_db.update_goal_progress, goal_id, current_amount, user_id)
+
+    def get_budget_allocation(self, user_id):
+        return self._call(finance_db.get_budget_allocation, user_id)
+
+    def save_budget_allocation(self, needs_percentage, wants_percentage, savings_percentage,
+                               user_id):
+        self._call(finance_db.save_budget_allocation, needs_percentage, wants_percentage, savings_percentage,
+                   user_id)
+
+    def close(self):
+        finance_db.close_router(self._router)
+
+# ==================== IN-MEMORY ====================
+class MemoryRepository(Repository):
+    """Everything in Python dicts and lists; nothing survives the process
+
+    Each user's expenses are kept sorted by (date, id) so date ranges and
+    keyset pages are found by bisection, and a per-user monthly rollup
+    answers whole-month and all-time totals like the SQLite rollup does.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._ids = itertools.count(1)
+        self._goal_ids = itertools.count(1)
+        self._profiles = {}
+        self._keys = {}         # user_id -> sorted [(date, id)]
+        self._expenses = {}     # id -> expense
+        self._rollup = {}       # user_id -> {(year_month, category): [total, count]}
+        self._goals = {}        # id -> goal
+        self._budgets = {}
+
+    def get_user_profile(self, user_id):
+        with self._lock:
+            profile = self._profiles.get(user_id)
+            return dict(profile) if profile else None
+
+    def save_user_profile(self, name, monthly_income, status="Single", dependents=0, *, user_id):
+        with self._lock:
+            profile = self._profiles.setdefault(user_id, {"id": len(self._profiles) + 1, "user_id": user_id,
+                                                          "created_at": datetime.now().isoformat()})
+            profile.update(name=name, monthly_income=monthly_income, status=status, dependents=dependents)
+
+    def _insert(self, expense: Dict):
+        expense["id"] = next(self._ids)
+        self._expenses[expense["id"]] = expense
+        bisect.insort(self._keys.setdefault(expense["user_id"], []), (expense["date"], expense["id"]))
+        totals = self._rollup.setdefault(expense["user_id"], {}).setdefault(
+            (expense["date"][:7], expense["category"]), [0.0, 0])
+        totals[0] += expense["amount"]
+        totals[1] += 1
+
+    def add_expense(self, date, category, amount, note="", *, user_id):
+        with self._lock:
+            self._insert(_expense_row((date, category, amount, note), user_id, datetime.now().isoformat()))
+
+    def bulk_add_expenses(self, rows, batch_size=BULK_BATCH_SIZE, progress=None, *, user_id):
+        inserted = 0
+        for batch in _batches(rows, batch_size, user_id):
+            with self._lock:
+                for row in batch:
+                    self._insert(row)
+            inserted += len(batch)
+            if progress:
+                progress(inserted)
+        return inserted
+
+    def _range(self, user_id: int, start_date: str = None, end_date: str = None) -> List[Tuple[str, int]]:
+        """(date, id) keys of a user's expenses in a date range, oldest first"""
+        keys = self._keys.get(user_id, [])
+        low = bisect.bisect_left(keys, (start_date,)) if start_date else 0
+        high = bisect.bisect_right(keys, (end_date, float("inf"))) if end_date else len(keys)
+        return keys[low:high]
+
+    def get_expenses(self, start_date=None, end_date=None, *, user_id):
+        if not (start_date and end_date):
+            start_date = end_date = None
+        with self._lock:
+            return [dict(self._expenses[key[1]]) for key in reversed(self._range(user_id, start_date, end_date))]
+
+    def get_expenses_page(self, category=None, start_date=None, end_date=None, after=None, limit=PAGE_SIZE,
+                          *, user_id):
+        with self._lock:
+            keys = self._range(user_id, start_date, end_date)
+            end = bisect.bisect_left(keys, tuple(after)) if after else len(keys)
+            page = []
+            for key in reversed(keys[:end]):
+                expense = self._expenses[key[1]]
+                if category and expense["category"] != category:
+                    continue
+                page.append(dict(expense))
+                if len(page) == limit:
+                    break
+            return page
+
+    def count_expenses(self, category=None, start_date=None, end_date=None, *, user_id):
+        with self._lock:
+            amounts = [self._expenses[key[1]]["amount"] for key in self._range(user_id, start_date, end_date)
+                       if not category or self._expenses[key[1]]["category"] == category]
+        return {"count": len(amounts), "total": sum(amounts)}
+
+    def get_expense_date_range(self, user_id):
+        with self._lock:
+            keys = self._keys.get(user_id)
+            return (keys[0][0], keys[-1][0]) if keys else (None, None)
+
+    def delete_expenses(self, expense_ids, user_id):
+        deleted = 0
+        with self._lock:
+            for expense_id in expense_ids:
+                expense = self._expenses.get(expense_id)
+                if expense is None or expense["user_id"] != user_id:
+                    continue
+                del self._expenses[expense_id]
+                keys = self._keys[user_id]
+                del keys[bisect.bisect_left(keys, (expense["date"], expense_id))]
+                rollup = self._rollup[user_id]
+                key = (expense["date"][:7], expense["category"])
+                rollup[key][0] -= expense["amount"]
+                rollup[key][1] -= 1
+                if rollup[key][1] <= 0:
+                    del rollup[key]
+                deleted += 1
+        return deleted
+
+    def _rollup_rows(self, user_id: int, start_month: str, end_month: str) -> List[Dict]:
+        return [{"year_month": month, "category": category, "amount": totals[0], "count": totals[1]}
+                for (month, category), totals in self._rollup.get(user_id, {}).items()
+                if start_month <= month <= end_month]
+
+    @staticmethod
+    def _summarize(rows: List[Dict]) -> Dict:
+        totals = summarize_expenses(rows)
+        totals["expense_count"] = sum(row.get("count", 1) for row in rows)
+        return totals
+
+    def get_spending_totals(self, start_date=None, end_date=None, *, user_id):
+        months = month_span(start_date, end_date)
+        with self._lock:
+            if months or not (start_date or end_date):
+                return self._summarize(self._rollup_rows(user_id, *(months or ("0000-00", "9999-99"))))
+            return self._summarize([self._expenses[key[1]] for key in self._range(user_id, start_date, end_date)])
+
+    def get_monthly_totals(self, start_month=None, end_month=None, *, user_id):
+        by_month = {}
+        with self._lock:
+            for row in self._rollup_rows(user_id, start_month or "0000-00", end_month or "9999-99"):
+                by_month.setdefault(row["year_month"], []).append(row)
+        return {month: self._summarize(rows) for month, rows in sorted(by_month.items())}
+
+    def add_savings_goal(self, goal_name, target_amount, deadline=None, priority=2, *, user_id):
+        with self._lock:
+            goal_id = next(self._goal_ids)
+            self._goals[goal_id] = {"id": goal_id, "user_id": user_id, "goal_name": goal_name,
+                                    "target_amount": target_amount, "current_amount": 0.0, "deadline": deadline,
+                                    "status": "active", "priority": priority,
+                                    "created_at": datetime.now().isoformat()}
+
+    def get_savings_goals(self, user_id):
+        with self._lock:
+            goals = [dict(goal) for goal in self._goals.values()
+                     if goal["user_id"] == user_id and goal["status"] == "active"]
+        return sorted(goals, key=lambda goal: (goal["created_at"], goal["id"]), reverse=True)
+
+    def update_goal_progress(self, goal_id, current_amount, user_id):
+        with self._lock:
+            goal = self._goals.get(goal_id)
+            if goal and goal["user_id"] == user_id:
+                goal["current_amount"] = current_amount
+
+    def get_budget_allocation(self, user_id):
+        with self._lock:
+            return dict(self._budgets.get(user_id, DEFAULT_BUDGET))
+
+    def save_budget_allocation(self, needs_percentage, wants_percentage, savings_percentage,
+                               user_id):
+        _check_budget(needs_percentage, wants_percentage, savings_percentage)
+        with self._lock:
+            self._budgets[user_id] = {"needs_percentage": needs_percentage, "wants_percentage": wants_percentage,
+                                      "savings_percentage": savings_percentage}
+
+# ==================== POSTGRES ====================
+POSTGRES_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS user_profile (
+        id BIGSERIAL PRIMARY KEY,
+        user_id BIGINT NOT NULL UNIQUE,
+        name TEXT NOT NULL,
+        monthly_income DOUBLE PRECISION NOT NULL,
+        status TEXT,
+        dependents INTEGER DEFAULT 0,
+        created_at TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS expenses (
+        id BIGSERIAL PRIMARY KEY,
+        user_id BIGINT NOT NULL,
+        date TEXT NOT NULL,
+        category TEXT NOT NULL,
+        amount DOUBLE PRECISION NOT NULL,
+        note TEXT,
+        created_at TEXT NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_expenses_user_date ON expenses (user_id, date, id)",
+    "CREATE INDEX IF NOT EXISTS idx_expenses_user_category_date ON expenses (user_id, category, date, id)",
+    """
+    CREATE TABLE IF NOT EXISTS savings_goals (
+        id BIGSERIAL PRIMARY KEY,
+        user_id BIGINT NOT NULL,
+        goal_name TEXT NOT NULL,
+        target_amount DOUBLE PRECISION NOT NULL,
+        current_amount DOUBLE PRECISION DEFAULT 0,
+        deadline TEXT,
+        status TEXT DEFAULT 'active',
+        priority INTEGER NOT NULL DEFAULT 2,
+        created_at TEXT NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_savings_goals_user ON savings_goals (user_id, status, created_at)",
+    """
+    CREATE TABLE IF NOT EXISTS budget_allocations (
+        id BIGSERIAL PRIMARY KEY,
+        user_id BIGINT NOT NULL UNIQUE,
+        needs_percentage DOUBLE PRECISION DEFAULT 50,
+        wants_percentage DOUBLE PRECISION DEFAULT 30,
+        savings_percentage DOUBLE PRECISION DEFAULT 20,
+        updated_at TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS category_types (
+        category TEXT PRIMARY KEY,
+        expense_type TEXT NOT NULL
+    )
+    """,
+]
+
+# Largest IN (...) list sent in one statement
+POSTGRES_BATCH_SIZE = 500
+
+class PostgresRepository(Repository):
+    """Postgres-dialect SQL over a DB-API connection using %s placeholders
+
+    Dates stay ISO-8601 TEXT, as in SQLite, so both backends compare and slice
+    them the same way; monthly totals are grouped from the expenses index
+    rather than a rollup table. `connect` returns a new connection, e.g.
+    lambda: connect_postgres(dsn) or PostgresStandIn.
+    """
+
+    def __init__(self, connect: Callable[[], object]):
+        self._conn = connect()
+        self._lock = threading.Lock()
+        with self._cursor() as cursor:
+            for statement in POSTGRES_SCHEMA:
+                cursor.execute(statement)
+            cursor.execute("DELETE FROM category_types")
+            cursor.executemany("INSERT INTO category_types (category, expense_type) VALUES (%s, %s)",
+                               list(CATEGORY_TYPES.items()))
+
+    @contextmanager
+    def _cursor(self):
+        """One transaction: commits on success and rolls back on error"""
+        with self._lock:
+            cursor = self._conn.cursor()
+            try:
+                yield cursor
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    @staticmethod
+    def _dicts(cursor) -> List[Dict]:
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def _query(self, sql: str, params: tuple = ()) -> List[Dict]:
+        with self._cursor() as cursor:
+            cursor.execute(sql, params)
+            return self._dicts(cursor)
+
+    def get_user_profile(self, user_id):
+        rows = self._query("SELECT * FROM user_profile WHERE user_id = %s", (user_id,))
+        return rows[0] if rows else None
+
+    def save_user_profile(self, name, monthly_income, status="Single", dependents=0, *, user_id):
+        with self._cursor() as cursor:
+            cursor.execute("""
+            INSERT INTO user_profile (user_id, name, monthly_income, status, dependents, created_at)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            ON CONFLICT (user_id) DO UPDATE
+            SET name = EXCLUDED.name, monthly_income = EXCLUDED.monthly_income,
+                status = EXCLUDED.status, dependents = EXCLUDED.dependents
+            """, (user_id, name, monthly_income, status, dependents, datetime.now().isoformat()))
+
+    def _insert(self, rows: List[Dict]):
+        with self._cursor() as cursor:
+            cursor.executemany("""
+            INSERT INTO expenses (user_id, date, category, amount, note, created_at)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            """, [(row["user_id"], row["date"], row["category"], row["amount"], row["note"], row["created_at"])
+                  for row in rows])
+
+    def add_expense(self, date, category, amount, note="", *, user_id):
+        # Single expenses may use custom categories, as in finance_db.add_expense()
+        self._insert([_expense_row((date, category, amount, note), user_id, datetime.now().isoformat())])
+
+    def bulk_add_expenses(self, rows, batch_size=BULK_BATCH_SIZE, progress=None, *, user_id):
+        # One transaction per batch, as in finance_db.bulk_add_expenses()
+        inserted = 0
+        for batch in _batches(rows, batch_size, user_id):
+            self._insert(batch)
+            inserted += len(batch)
+            if progress:
+                progress(inserted)
+        return inserted
+
+    @staticmethod
+    def _filters(category=None, start_date=None, end_date=None, *, user_id):
+        clauses, params = ["user_id = %s"], [user_id]
+        if category:
+            clauses.append("category = %s")
+            params.append(category)
+        if start_date:
+            clauses.append("date >= %s")
+            params.append(start_date)
+        if end_date:
+            clauses.append("date <= %s")
+            params.append(end_date)
+        return clauses, params
+
+    def get_expenses(self, start_date=None, end_date=None, *, user_id):
+        if not (start_date and end_date):
+            start_date = end_date = None
+        clauses, params = self._filters(None, start_date, end_date, user_id=user_id)
+        return self._query("SELECT * FROM expenses WHERE " + " AND ".join(clauses) + " ORDER BY date DESC, id DESC",
+                           tuple(params))
+
+    def get_expenses_page(self, category=None, start_date=None, end_date=None, after=None, limit=PAGE_SIZE,
+                          *, user_id):
+        clauses, params = self._filters(category, start_date, end_date, user_id=user_id)
+        if after:
+            clauses.append("(date, id) < (%s, %s)")
+            params.extend(after)
+        params.append(limit)
+        return self._query("SELECT * FROM expenses WHERE " + " AND ".join(clauses)
+                           + " ORDER BY date DESC, id DESC LIMIT %s", tuple(params))
+
+    def count_expenses(self, category=None, start_date=None, end_date=None, *, user_id):
+        clauses, params = self._filters(category, start_date, end_date, user_id=user_id)
+        row = self._query("SELECT COUNT(*) AS count, COALESCE(SUM(amount), 0) AS total FROM expenses WHERE "
+                          + " AND ".join(clauses), tuple(params))[0]
+        return {"count": row["count"], "total": float(row["total"])}
+
+    def get_expense_date_range(self, user_id):
+        row = self._query("SELECT MIN(date) AS first, MAX(date) AS last FROM expenses WHERE user_id = %s",
+                          (user_id,))[0]
+        return row["first"], row["last"]
+
+    def delete_expenses(self, expense_ids, user_id):
+        expense_ids = list(expense_ids)
+        deleted = 0
+        with self._cursor() as cursor:
+            for start in range(0, len(expense_ids), POSTGRES_BATCH_SIZE):
+                batch = expense_ids[start:start + POSTGRES_BATCH_SIZE]
+                cursor.execute(f"DELETE FROM expenses WHERE user_id = %s AND id IN ({', '.join(['%s'] * len(batch))})",
+                               (user_id, *batch))
+                deleted += cursor.rowcount
+        return deleted
+
+    def _grouped_totals(self, group_month: bool, clauses: List[str], params: List) -> List[Dict]:
+        month = "substr(e.date, 1, 7)"
+        return self._query(f"""
+        SELECT {month + " AS year_month, " if group_month else ""}e.category,
+               COALESCE(t.expense_type, 'Other') AS expense_type, SUM(e.amount) AS total, COUNT(*) AS count
+        FROM expenses e
+        LEFT JOIN category_types t ON t.category = e.category
+        WHERE {" AND ".join("e." + clause for clause in clauses)}
+        GROUP BY {month + ", " if group_month else ""}e.category, t.expense_type
+        ORDER BY total DESC
+        """, tuple(params))
+
+    def get_spending_totals(self, start_date=None, end_date=None, *, user_id):
+        clauses, params = self._filters(None, start_date, end_date, user_id=user_id)
+        return totals_from_rows(self._grouped_totals(False, clauses, params))
+
+    def get_monthly_totals(self, start_month=None, end_month=None, *, user_id):
+        clauses, params = self._filters(None, (start_month or "0000-00") + "-01",
+                                        (end_month or "9999-99") + "-99", user_id=user_id)
+        by_month = {}
+        for row in self._grouped_totals(True, clauses, params):
+            by_month.setdefault(row["year_month"], []).append(row)
+        return {month: totals_from_rows(rows) for month, rows in sorted(by_month.items())}
+
+    def add_savings_goal(self, goal_name, target_amount, deadline=None, priority=2, *, user_id):
+        with self._cursor() as cursor:
+            cursor.execute("""
+            INSERT INTO savings_goals (user_id, goal_name, target_amount, deadline, priority, created_at)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            """, (user_id, goal_name, target_amount, deadline, priority, datetime.now().isoformat()))
+
+    def get_savings_goals(self, user_id):
+        return self._query("""
+        SELECT * FROM savings_goals WHERE user_id = %s AND status = 'active' ORDER BY created_at DESC, id DESC
+        """, (user_id,))
+
+    def update_goal_progress(self, goal_id, current_amount, user_id):
+        with self._cursor() as cursor:
+            cursor.execute("UPDATE savings_goals SET current_amount = %s WHERE id = %s AND user_id = %s",
+                           (current_amount, goal_id, user_id))
+
+    def get_budget_allocation(self, user_id):
+        rows = self._query("""
+        SELECT needs_percentage, wants_percentage, savings_percentage
+        FROM budget_allocations WHERE user_id = %s
+        """, (user_id,))
+        return rows[0] if rows else dict(DEFAULT_BUDGET)
+
+    def save_budget_allocation(self, needs_percentage, wants_percentage, savings_percentage,
+                               user_id):
+        _check_budget(needs_percentage, wants_percentage, savings_percentage)
+        with self._cursor() as cursor:
+            cursor.execute("""
+            INSERT INTO budget_allocations (user_id, needs_percentage, wants_percentage, savings_percentage, updated_at)
+            VALUES (%s, %s, %s, %s, %s)
+            ON CONFLICT (user_id) DO UPDATE
+            SET needs_percentage = EXCLUDED.needs_percentage, wants_percentage = EXCLUDED.wants_percentage,
+                savings_percentage = EXCLUDED.savings_percentage, updated_at = EXCLUDED.updated_at
+            """, (user_id, needs_percentage, wants_percentage, savings_percentage, datetime.now().isoformat()))
+
+    def close(self):
+        self._conn.close()
+
+def connect_postgres(dsn: str):
+    """Open a Postgres connection with psycopg (pip install "psycopg[binary]")"""
+    import psycopg
+    return psycopg.connect(dsn)
+
+class PostgresStandIn:
+    """sqlite3 connection that accepts the Postgres dialect PostgresRepository emits
+
+    Only translates what that SQL needs (%s placeholders and BIGSERIAL keys),
+    so the Postgres backend can run the conformance suite without a server.
+    It is not a general Postgres emulator.
+    """
+    _TRANSLATIONS = [(re.compile(r"BIGSERIAL PRIMARY KEY"), "INTEGER PRIMARY KEY AUTOINCREMENT"),
+                     (re.compile(r"%s"), "?")]
+
+    def __init__(self, path: str = ":memory:"):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+
+    @classmethod
+    def translate(cls, sql: str) -> str:
+        for pattern, replacement in cls._TRANSLATIONS:
+            sql = pattern.sub(replacement, sql)
+        return sql
+
+    def cursor(self):
+        return _StandInCursor(self._conn.cursor())
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
+
+class _StandInCursor:
+    def __init__(self, cursor: sqlite3.Cursor):
+        self._cursor = cursor
+
+    def execute(self, sql: str, params=()):
+        self._cursor.execute(PostgresStandIn.translate(sql), params)
+        return self
+
+    def executemany(self, sql: str, params):
+        self._cursor.executemany(PostgresStandIn.translate(sql), params)
+        return self
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+def open_repository(url: str) -> Repository:
+    """Build a repository from "sqlite:///path", "memory://", "postgresql://..." or "standin://[path]" """
+    scheme, _, rest = url.partition("://")
+    if scheme == "sqlite":
+        # sqlite:///relative.db and sqlite:////absolute/path.db, as in SQLAlchemy
+        return SQLiteRepository(rest[1:] if rest.startswith("/") else rest or None)
+    if scheme == "memory":
+        return MemoryRepository()
+    if scheme in ("postgres", "postgresql"):
+        return PostgresRepository(lambda: connect_postgres(url))
+    if scheme == "standin":
+        return PostgresRepository(lambda: PostgresStandIn(rest or ":memory:"))
+    raise ValueError(f"Unknown storage URL: {url}")
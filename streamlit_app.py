@@ -1,14 +1,17 @@
 # streamlit_app.py - Fixed Complete Version
+import threading
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 from datetime import datetime, date
 from dateutil.relativedelta import relativedelta
 
-from google import genai
 from finance_db import *
 from finance_calculator import *
+from finance_importer import SkippedRows, import_upload
+from finance_chat import (CHAT_MODEL, FAKE_LLM, AsyncChatClient, ChatCancelledError, ChatRequestError, cached_reply,
+                          create_client, get_response_cache, local_reply)
+from finance_context import budget_rule, get_financial_context, system_instruction
+from finance_history import ChatHistory, make_content
+from finance_goals import PRIORITIES, get_allocator
 
 # Page config
 st.set_page_config(
@@ -245,14 +248,211 @@ st.markdown("""
 
 """, unsafe_allow_html=True)
 
-# Initialize database
-init_database()
+# pandas, plotly and the NumPy forecaster are imported by the pages that use
+# them, so the other pages start without loading them. The database schema
+# is set up by finance_db on the first connection of the process.
+
+# ==================== CACHED READS ====================
+# Every cached loader takes the finance_db data version as its first argument.
+# Writes bump that version, so reruns caused by pure UI changes hit the cache
+# and any write invalidates it. Loaders that depend on the budget allocation
+# also take its version, so saving a new allocation recomputes only them.
+@st.cache_data(show_spinner=False, max_entries=16)
+def load_user_profile(data_version: int, user_id: int):
+    return get_user_profile(user_id)
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def load_expenses_page(data_version: int, user_id: int, category, start_date, end_date, after):
+    return get_expenses_page(category, start_date, end_date, after, user_id=user_id)
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def load_expense_count(data_version: int, user_id: int, category=None, start_date=None, end_date=None):
+    return count_expenses(category, start_date, end_date, user_id=user_id)
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def load_categories(data_version: int, user_id: int):
+    return get_categories(user_id)
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def load_savings_goals(data_version: int, user_id: int):
+    return get_savings_goals(user_id)
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def load_budget_allocation(budget_version: int, user_id: int):
+    return get_budget_allocation(user_id)
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def load_expense_date_range(data_version: int, user_id: int):
+    return get_expense_date_range(user_id)
+
+def analysis_window(data_version: int, user_id: int, choice: str = "Last 30 days") -> Window:
+    """Analysis window for a period choice; "All time" spans the recorded expenses"""
+    if choice == "This month":
+        return month_window(date.today().year, date.today().month)
+    if choice == "Year to date":
+        return ytd_window()
+    if choice == "All time":
+        first, last = load_expense_date_range(data_version, user_id)
+        if first:
+            return Window(first[:10], max(last[:10], date.today().isoformat()), "All time")
+    return rolling_window(30)
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def load_window_totals(data_version: int, user_id: int, window: Window):
+    """Spending totals for a window and the window before it
+
+    All-time and whole-month windows are read from the monthly rollup; the
+    rolling windows with partial months share one batched raw-row query.
+    """
+    windows = [window, previous_window(window)]
+    totals, partial = [None] * len(windows), []
+    for index, current in enumerate(windows):
+        if current.label == "All time":
+            totals[index] = get_spending_totals(user_id=user_id)
+        elif month_span(current.start, current.end):
+            totals[index] = get_spending_totals(current.start, current.end, user_id=user_id)
+        else:
+            partial.append(index)
+    batched = get_spending_totals_for_windows([windows[index] for index in partial], user_id)
+    for index, window_totals in zip(partial, batched):
+        totals[index] = window_totals
+    return totals
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def load_analysis(data_version: int, budget_version: int, user_id: int, monthly_income: float, window: Window):
+    """Totals, analysis and health score for a window, plus the analysis of the window before it"""
+    previous = previous_window(window)
+    totals, previous_totals = load_window_totals(data_version, user_id, window)
+    allocation = load_budget_allocation(budget_version, user_id)
+    analysis = analyze_spending(totals, monthly_income, window_months(window), allocation)
+    previous_analysis = analyze_spending(previous_totals, monthly_income, window_months(previous), allocation)
+    return totals, analysis, get_financial_health_score(analysis), previous_analysis
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def load_monthly_totals(data_version: int, user_id: int, start_month: str, end_month: str):
+    return get_monthly_totals(start_month, end_month, user_id=user_id)
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def load_monthly_trend(data_version: int, budget_version: int, user_id: int, monthly_income: float, months: int = 12):
+    """Per-month totals, savings rate and health score for the last `months` months"""
+    windows = recent_month_windows(months)
+    monthly_totals = load_monthly_totals(data_version, user_id, windows[0].start[:7], windows[-1].start[:7])
+    return monthly_trend(monthly_totals, monthly_income, windows, load_budget_allocation(budget_version, user_id))
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def load_goal_forecasts(data_version: int, user_id: int, monthly_income: float, shares: tuple):
+    """Monte Carlo forecasts for all active goals, keyed by goal id
+
+    `shares` holds (goal id, fraction of monthly savings) pairs from the allocator.
+    """
+    from finance_forecast import forecast_goals, historical_net_flows
+    
+    goals = get_savings_goals(user_id)
+    share_by_goal = dict(shares)
+    forecasts = forecast_goals(goals, historical_net_flows(monthly_income, user_id=user_id), seed=0,
+                               shares=[share_by_goal.get(goal['id'], 0.0) for goal in goals])
+    return {forecast['goal_id']: forecast for forecast in forecasts}
+
+# ==================== SESSION USER ====================
+# Each browser session works on one user's data. Users sign in with a
+# passphrase, and the session is kept in a signed ?session= token so a reload
+# stays signed in; a user id or name typed into the URL binds nothing. The
+# default user, which owns everything recorded before data was split per
+# user, is open to every session until an administrator gives it a passphrase
+# with `python finance_db.py set-passphrase`.
+def reset_conversation():
+    """Abort any request in flight and drop the chat state"""
+    if "chat_cancel" in st.session_state:
+        st.session_state.chat_cancel.set()
+    for key in ("chat_cancel", "messages", "chat", "chat_context", "chat_history", "chat_metrics"):
+        st.session_state.pop(key, None)
+
+def bind_session(user_id: int, username: str):
+    """Sign this browser session in as a user and keep the binding in the URL"""
+    reset_conversation()
+    st.session_state.user_id = user_id
+    st.session_state.username = username
+    st.query_params["session"] = issue_session_token(user_id)
+
+def sign_out():
+    reset_conversation()
+    st.session_state.pop("user_id", None)
+    st.query_params.pop("session", None)
+
+def open_session():
+    """(user_id, username) from the session token, the open default user, or (None, None)"""
+    token_user = user_for_session_token(st.query_params.get("session", ""))
+    if token_user is not None:
+        return token_user, get_username(token_user)
+    if not has_passphrase(DEFAULT_USER_ID):
+        return DEFAULT_USER_ID, None
+    return None, None
+
+def account_forms():
+    """Sign-in and create-account forms; either binds the session on success"""
+    sign_in, create = st.tabs(["Sign in", "Create account"])
+    with sign_in:
+        with st.form("sign_in_form"):
+            username = st.text_input("Username", key="sign_in_username").strip()
+            passphrase = st.text_input("Passphrase", type="password", key="sign_in_passphrase")
+            if st.form_submit_button("🔓 Sign in", use_container_width=True):
+                signed_in = authenticate(username, passphrase)
+                if signed_in is None:
+                    st.error("Wrong username or passphrase.")
+                else:
+                    bind_session(signed_in, username)
+                    st.rerun()
+    with create:
+        with st.form("create_account_form"):
+            username = st.text_input("Username", key="new_username").strip()
+            passphrase = st.text_input("Passphrase", type="password", key="new_passphrase")
+            confirm = st.text_input("Repeat passphrase", type="password", key="new_passphrase_repeat")
+            if st.form_submit_button("➕ Create account", use_container_width=True):
+                try:
+                    if not username:
+                        raise ValueError("Choose a username.")
+                    if passphrase != confirm:
+                        raise ValueError("The passphrases don't match.")
+                    bind_session(create_user(username, passphrase), username)
+                    st.rerun()
+                except ValueError as e:
+                    st.error(str(e))
+
+if "user_id" not in st.session_state:
+    st.session_state.user_id, st.session_state.username = open_session()
+user_id = st.session_state.user_id
+
+if user_id is None:
+    st.title("💰 Personal Finance Assistant")
+    st.info("Sign in to see your household's finances.")
+    account_forms()
+    st.stop()
+
+# Read the write counters once per rerun; every cached loader below is keyed on them
+data_version = get_data_version(user_id)
+budget_version = get_budget_version(user_id)
 
 # ==================== SIDEBAR ====================
 with st.sidebar:
     st.markdown("### ⚙️ Settings")
     
+    if st.session_state.username:
+        st.caption(f"👤 Signed in as **{st.session_state.username}**")
+        if st.button("🚪 Sign out", use_container_width=True):
+            sign_out()
+            st.rerun()
+    else:
+        with st.expander("👤 Sign in"):
+            account_forms()
+            st.caption("This household is open to everyone. To require sign-in, run "
+                       "`python finance_db.py set-passphrase` on the server.")
+    
     google_api_key = st.text_input("🔑 Google AI API Key", type="password", key="api_key")
+    if FAKE_LLM and not google_api_key:
+        google_api_key = "offline"
+    
+    stream_responses = st.toggle("⚡ Stream responses", value=True, key="stream_responses")
+    use_response_cache = st.toggle("♻️ Reuse cached answers", value=True, key="use_response_cache")
     
     st.markdown("---")
     
@@ -269,7 +469,7 @@ with st.sidebar:
     
     st.markdown("### 👤 Your Profile")
     
-    profile = get_user_profile()
+    profile = load_user_profile(data_version, user_id)
     
     if profile:
         st.markdown(f"""
@@ -297,7 +497,7 @@ with st.sidebar:
             col1, col2 = st.columns(2)
             with col1:
                 if st.form_submit_button("💾 Save", use_container_width=True):
-                    save_user_profile(name, income, status, dependents)
+                    save_user_profile(name, income, status, dependents, user_id=user_id)
                     st.session_state.edit_profile = False
                     st.success("Profile saved!")
                     st.rerun()
@@ -309,12 +509,11 @@ with st.sidebar:
     st.markdown("---")
     
     if st.button("🔄 Reset Conversation", use_container_width=True):
-        st.session_state.pop("messages", None)
-        st.session_state.pop("chat", None)
+        reset_conversation()
         st.rerun()
 
 # Check profile
-profile = get_user_profile()
+profile = load_user_profile(data_version, user_id)
 if not profile and page != "Dashboard":
     st.warning("⚠️ Please setup your profile in the sidebar first!")
     st.stop()
@@ -323,7 +522,7 @@ if not profile and page != "Dashboard":
 if google_api_key and page == "Chat Assistant":
     if ("genai_client" not in st.session_state) or (getattr(st.session_state, "_last_key", None) != google_api_key):
         try:
-            st.session_state.genai_client = genai.Client(api_key=google_api_key)
+            st.session_state.genai_client = create_client(google_api_key)
             st.session_state._last_key = google_api_key
             st.session_state.pop("chat", None)
             st.session_state.pop("messages", None)
@@ -331,11 +530,18 @@ if google_api_key and page == "Chat Assistant":
             st.error(f"Invalid API Key: {e}")
             st.stop()
     
-    if "chat" not in st.session_state:
-        st.session_state.chat = st.session_state.genai_client.chats.create(model="gemini-2.5-flash")
-    
     if "messages" not in st.session_state:
         st.session_state.messages = []
+    
+    if "chat_metrics" not in st.session_state:
+        st.session_state.chat_metrics = []
+    
+    if "chat_history" not in st.session_state:
+        st.session_state.chat_history = ChatHistory()
+    
+    # Set by Reset Conversation to abort a request that is still in flight
+    if "chat_cancel" not in st.session_state:
+        st.session_state.chat_cancel = threading.Event()
 
 # ==================== DASHBOARD ====================
 if page == "Dashboard":
@@ -353,22 +559,30 @@ if page == "Dashboard":
     
     st.caption(f"Hello, **{profile['name']}**! Here's your financial overview.")
     
-    expenses = get_expenses()
-    
-    if not expenses:
+    if not load_expense_count(data_version, user_id)['count']:
         st.info("📝 No expenses recorded yet. Start by adding your first expense!")
         st.stop()
     
-    analysis = analyze_spending(expenses, profile['monthly_income'])
-    health_score = get_financial_health_score(analysis)
+    import pandas as pd
+    import plotly.express as px
+    import plotly.graph_objects as go
+    
+    period = st.radio("📅 Period", ["This month", "Last 30 days", "Year to date", "All time"], index=1, horizontal=True)
+    window = analysis_window(data_version, user_id, period)
+    totals, analysis, health_score, previous = load_analysis(data_version, budget_version, user_id, profile['monthly_income'], window)
+    st.caption(f"{window.start} → {window.end}")
     
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.metric("💵 Monthly Income", format_currency(profile['monthly_income']))
+        st.metric("💵 Income", format_currency(analysis['income']),
+                  delta=f"{analysis['months']:.1f} months" if analysis['months'] != 1 else None, delta_color="off")
     
     with col2:
-        st.metric("💸 Total Expenses", format_currency(analysis['total_expenses']))
+        expense_change = None
+        if previous['total_expenses']:
+            expense_change = f"{(analysis['total_expenses'] / previous['total_expenses'] - 1) * 100:+.1f}% vs previous"
+        st.metric("💸 Total Expenses", format_currency(analysis['total_expenses']), delta=expense_change, delta_color="inverse")
     
     with col3:
         st.metric("💰 Current Savings", format_currency(analysis['actual_savings']), delta=f"{analysis['savings_percentage']:.1f}%")
@@ -404,6 +618,26 @@ if page == "Dashboard":
     
     st.divider()
     
+    st.subheader("📈 Monthly Trend")
+    trend_months = st.select_slider("Months", options=[3, 6, 12, 24], value=12, label_visibility="collapsed")
+    df_trend = pd.DataFrame(load_monthly_trend(data_version, budget_version, user_id, profile['monthly_income'], trend_months))
+    fig = go.Figure(data=[
+        go.Bar(name='Needs', x=df_trend['label'], y=df_trend['needs_total'], marker_color='#457b9d'),
+        go.Bar(name='Wants', x=df_trend['label'], y=df_trend['wants_total'], marker_color='#e63946'),
+        go.Bar(name='Other', x=df_trend['label'], y=df_trend['other_total'], marker_color='#a8dadc'),
+        go.Scatter(name='Savings Rate (%)', x=df_trend['label'], y=df_trend['savings_percentage'],
+                   yaxis='y2', mode='lines+markers', line=dict(color='#2a9d8f')),
+        go.Scatter(name='Health Score', x=df_trend['label'], y=df_trend['health_score'],
+                   yaxis='y2', mode='lines+markers', line=dict(color='#f4a261', dash='dot'))
+    ])
+    fig.update_layout(barmode='stack', font=dict(family="Inter"), height=420,
+                      yaxis=dict(title='Expenses (Rp)'),
+                      yaxis2=dict(title='% / score', overlaying='y', side='right', showgrid=False),
+                      legend=dict(orientation='h', y=-0.15))
+    st.plotly_chart(fig, use_container_width=True)
+    
+    st.divider()
+    
     st.subheader("💡 Personalized Financial Tips")
     tips = get_financial_tips(analysis)
     for tip in tips:
@@ -418,7 +652,7 @@ elif page == "Add Expense":
         
         with col1:
             expense_date = st.date_input("📅 Date", value=date.today())
-            category = st.selectbox("🏷️ Category", ALL_CATEGORIES)
+            category = st.selectbox("🏷️ Category", load_categories(data_version, user_id))
         
         with col2:
             amount = st.number_input("💵 Amount (Rp)", min_value=0, step=1000)
@@ -428,82 +662,184 @@ elif page == "Add Expense":
         
         if submitted:
             if amount > 0:
-                add_expense(expense_date.isoformat(), category, amount, note)
+                add_expense(expense_date.isoformat(), category, amount, note, user_id=user_id)
                 st.success(f"✅ Expense added: {format_currency(amount)} for {category}")
                 st.balloons()
             else:
                 st.error("❌ Amount must be greater than 0")
+    
+    with st.expander("🏷️ Add Custom Category"):
+        with st.form("category_form"):
+            custom_category = st.text_input("Category Name", placeholder="e.g., Donasi")
+            custom_type = st.selectbox("Type", EXPENSE_TYPES)
+            
+            if st.form_submit_button("➕ Add Category", use_container_width=True):
+                if not custom_category.strip():
+                    st.error("❌ Category name is required")
+                elif save_custom_category(custom_category.strip(), custom_type, user_id=user_id):
+                    st.success(f"✅ Category '{custom_category.strip()}' added")
+                    st.rerun()
+                else:
+                    st.error("❌ Category already exists")
+    
+    st.divider()
+    
+    st.subheader("📥 Import Bank Statement")
+    st.caption("Upload a CSV or OFX export from your bank. Outgoing transactions are added as expenses and categorized automatically. "
+               "Uploads are held in memory; for very large exports use `python finance_importer.py statement.csv`.")
+    
+    uploaded = st.file_uploader("Statement file", type=["csv", "ofx", "qfx"])
+    if uploaded is not None and st.button("📥 Import Statement", use_container_width=True):
+        import_progress = st.progress(0.0, text="Importing...")
+        committed = [0]
+        skipped = SkippedRows()
+        
+        def report_import(count, fraction):
+            committed[0] = count
+            import_progress.progress(fraction, text=f"Imported {count:,} expenses...")
+        
+        try:
+            imported = import_upload(uploaded, progress=report_import, user_id=user_id,
+                                     on_error=skipped)
+            import_progress.progress(1.0, text=f"Imported {imported:,} expenses")
+            st.success(f"✅ Imported {imported:,} expenses from {uploaded.name}")
+        except ValueError as e:
+            st.error(f"❌ Import stopped: {e}. {committed[0]:,} expenses imported before the error were kept.")
+        if skipped.count:
+            st.warning(f"⚠️ Skipped {skipped.count:,} rows that could not be read")
+            with st.expander("Skipped rows"):
+                more = skipped.count - len(skipped.first)
+                st.text("\n".join([f"line {line}: {message}" for line, message in skipped.first] +
+                                   ([f"... and {more:,} more"] if more else [])))
 
 # ==================== EXPENSES HISTORY ====================
 elif page == "Expenses History":
-    st.title("📋 Expenses History")
+    import pandas as pd
     
-    expenses = get_expenses()
+    st.title("📋 Expenses History")
     
-    if not expenses:
+    if not load_expense_count(data_version, user_id)['count']:
         st.info("No expenses recorded yet.")
     else:
         col1, col2 = st.columns(2)
         with col1:
-            filter_category = st.selectbox("🏷️ Filter by Category", ["All"] + ALL_CATEGORIES)
+            filter_category = st.selectbox("🏷️ Filter by Category",
+                                           ["All"] + load_categories(data_version, user_id))
         with col2:
             filter_month = st.selectbox("📅 Filter by Month", ["All", "This Month", "Last Month"])
         
-        df = pd.DataFrame(expenses)
-        df['date'] = pd.to_datetime(df['date'])
-        
-        if filter_category != "All":
-            df = df[df['category'] == filter_category]
-        
+        category_filter = None if filter_category == "All" else filter_category
+        start_date = end_date = None
         if filter_month == "This Month":
-            start_of_month = datetime.now().replace(day=1)
-            df = df[df['date'] >= start_of_month]
+            start_date = date.today().replace(day=1).isoformat()
         elif filter_month == "Last Month":
-            start_last_month = (datetime.now().replace(day=1) - relativedelta(months=1))
-            end_last_month = datetime.now().replace(day=1)
-            df = df[(df['date'] >= start_last_month) & (df['date'] < end_last_month)]
+            start_of_month = date.today().replace(day=1)
+            start_date = (start_of_month - relativedelta(months=1)).isoformat()
+            end_date = (start_of_month - relativedelta(days=1)).isoformat()
+        
+        # Keyset cursors: one (date, id) per page visited, reset when filters change
+        filters = (category_filter, start_date, end_date)
+        if st.session_state.get("history_filters") != filters:
+            st.session_state.history_filters = filters
+            st.session_state.history_cursors = [None]
+        cursors = st.session_state.history_cursors
         
-        st.markdown(f"### Total: **{format_currency(df['amount'].sum())}**")
+        summary = load_expense_count(data_version, user_id, *filters)
+        st.markdown(f"### Total: **{format_currency(summary['total'])}** ({summary['count']:,} expenses)")
         st.divider()
         
-        for idx, row in df.iterrows():
-            with st.expander(f"📅 {row['date'].strftime('%Y-%m-%d')} | {row['category']} | {format_currency(row['amount'])}"):
-                st.markdown(f"**Note:** {row['note'] if row['note'] else '_No note_'}")
-                if st.button(f"🗑️ Delete", key=f"del_{row['id']}"):
-                    delete_expense(row['id'])
-                    st.success("Expense deleted!")
+        rows = load_expenses_page(data_version, user_id, *filters, cursors[-1])
+        
+        if not rows:
+            st.info("No expenses match these filters.")
+        else:
+            df = pd.DataFrame(rows)[['id', 'date', 'category', 'amount', 'note']]
+            df.insert(0, 'delete', False)
+            edited = st.data_editor(
+                df,
+                hide_index=True,
+                use_container_width=True,
+                disabled=['id', 'date', 'category', 'amount', 'note'],
+                column_config={
+                    "delete": st.column_config.CheckboxColumn("🗑️", width="small"),
+                    "id": None,
+                    "date": "Date",
+                    "category": "Category",
+                    "amount": st.column_config.NumberColumn("Amount (Rp)", format="%d"),
+                    "note": "Note"
+                },
+                key=f"history_page_{len(cursors)}_{data_version}"
+            )
+            selected = edited.loc[edited['delete'], 'id'].tolist()
+            
+            col1, col2, col3 = st.columns([1, 2, 1])
+            with col1:
+                if st.button("⬅️ Newer", disabled=len(cursors) == 1, use_container_width=True):
+                    cursors.pop()
+                    st.rerun()
+            with col2:
+                if st.button(f"🗑️ Delete {len(selected)} selected", disabled=not selected, use_container_width=True):
+                    deleted = delete_expenses(selected, user_id)
+                    st.session_state.history_cursors = [None]
+                    st.success(f"Deleted {deleted} expenses!")
+                    st.rerun()
+            with col3:
+                if st.button("Older ➡️", disabled=len(rows) < PAGE_SIZE, use_container_width=True):
+                    cursors.append((rows[-1]['date'], rows[-1]['id']))
                     st.rerun()
+            
+            st.caption(f"Page {len(cursors)} · {PAGE_SIZE} per page")
 
 # ==================== BUDGET PLANNER ====================
 elif page == "Budget Planner":
-    st.title("📝 Budget Planner (50/30/20)")
+    allocation = load_budget_allocation(budget_version, user_id)
+    st.title(f"📝 Budget Planner ({budget_rule(allocation)})")
+    
+    with st.expander("⚙️ Adjust Allocation"):
+        with st.form("budget_form"):
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                needs_pct = st.number_input("Needs (%)", 0.0, 100.0, float(allocation['needs_percentage']), step=5.0)
+            with col2:
+                wants_pct = st.number_input("Wants (%)", 0.0, 100.0, float(allocation['wants_percentage']), step=5.0)
+            with col3:
+                savings_pct = st.number_input("Savings (%)", 0.0, 100.0, float(allocation['savings_percentage']), step=5.0)
+            
+            if st.form_submit_button("💾 Save Allocation", use_container_width=True):
+                try:
+                    save_budget_allocation(needs_pct, wants_pct, savings_pct, user_id)
+                    st.rerun()
+                except ValueError as e:
+                    st.error(f"❌ {e}")
     
-    expenses = get_expenses()
-    if not expenses:
-        st.info("Add expenses first to see budget analysis")
+    totals, analysis, _, _ = load_analysis(data_version, budget_version, user_id, profile['monthly_income'], analysis_window(data_version, user_id))
+    if not totals['expense_count']:
+        st.info("No expenses in the last 30 days. Add expenses to see budget analysis")
     else:
-        analysis = analyze_spending(expenses, profile['monthly_income'])
+        st.caption("Based on your spending over the last 30 days")
         
         col1, col2, col3 = st.columns(3)
         
         with col1:
-            st.metric("🏠 Needs (50%)", format_currency(analysis['ideal_budget']['needs']), 
+            st.metric(f"🏠 Needs ({allocation['needs_percentage']:g}%)", format_currency(analysis['ideal_budget']['needs']), 
                      delta=format_currency(analysis['needs_difference']) if analysis['needs_difference'] != 0 else None, delta_color="inverse")
             # Fix: ensure progress is between 0 and 1
-            needs_progress = max(0, min(analysis['needs_total'] / analysis['ideal_budget']['needs'], 1.0))
+            needs_progress = (max(0, min(analysis['needs_total'] / analysis['ideal_budget']['needs'], 1.0))
+                    if analysis['ideal_budget']['needs'] > 0 else 0)
             st.progress(needs_progress)
             st.caption(f"Actual: {format_currency(analysis['needs_total'])}")
         
         with col2:
-            st.metric("🎉 Wants (30%)", format_currency(analysis['ideal_budget']['wants']),
+            st.metric(f"🎉 Wants ({allocation['wants_percentage']:g}%)", format_currency(analysis['ideal_budget']['wants']),
                      delta=format_currency(analysis['wants_difference']) if analysis['wants_difference'] != 0 else None, delta_color="inverse")
             # Fix: ensure progress is between 0 and 1
-            wants_progress = max(0, min(analysis['wants_total'] / analysis['ideal_budget']['wants'], 1.0))
+            wants_progress = (max(0, min(analysis['wants_total'] / analysis['ideal_budget']['wants'], 1.0))
+                    if analysis['ideal_budget']['wants'] > 0 else 0)
             st.progress(wants_progress)
             st.caption(f"Actual: {format_currency(analysis['wants_total'])}")
         
         with col3:
-            st.metric("💎 Savings (20%)", format_currency(analysis['ideal_budget']['savings']),
+            st.metric(f"💎 Savings ({allocation['savings_percentage']:g}%)", format_currency(analysis['ideal_budget']['savings']),
                      delta=format_currency(analysis['savings_difference']) if analysis['savings_difference'] != 0 else None)
             # Fix: handle negative savings (deficit)
             if analysis['ideal_budget']['savings'] > 0:
@@ -529,25 +865,35 @@ elif page == "Savings Goals":
                 target_amount = st.number_input("Target Amount (Rp)", min_value=0, step=100000)
             with col2:
                 deadline = st.date_input("Target Date (optional)")
+                priority = st.selectbox("Priority", list(PRIORITIES), index=1, format_func=PRIORITIES.get)
             
             if st.form_submit_button("➕ Add Goal", use_container_width=True):
                 if goal_name and target_amount > 0:
-                    add_savings_goal(goal_name, target_amount, deadline.isoformat())
+                    add_savings_goal(goal_name, target_amount, deadline.isoformat(), priority, user_id=user_id)
                     st.success(f"Goal '{goal_name}' added!")
                     st.rerun()
     
     st.divider()
     
-    goals = get_savings_goals()
-    expenses = get_expenses()
+    goals = load_savings_goals(data_version, user_id)
+    totals, analysis, _, _ = load_analysis(data_version, budget_version, user_id, profile['monthly_income'], analysis_window(data_version, user_id))
     
     if not goals:
         st.info("No savings goals yet. Add your first goal above!")
-    elif not expenses:
+    elif not load_expense_count(data_version, user_id)['count']:
         st.warning("Add expenses first to calculate savings timeline")
     else:
-        analysis = analyze_spending(expenses, profile['monthly_income'])
-        
+        # Monthly savings are split across goals once, instead of counted in full for each goal
+        monthly_savings = savings_per_month(analysis)
+        plans = get_allocator(monthly_savings, user_id).allocation()
+        shares = tuple((goal_id, plan['monthly_contribution'] / monthly_savings if monthly_savings else 0.0)
+                       for goal_id, plan in sorted(plans.items()))
+        forecasts = load_goal_forecasts(data_version, user_id, profile['monthly_income'], shares)
+        met = sum(plan['meets_deadline'] is True for plan in plans.values())
+        with_deadline = sum(plan['meets_deadline'] is not None for plan in plans.values())
+        st.markdown(f"**💰 Monthly savings to allocate:** {format_currency(monthly_savings)} · "
+                    f"**{met}/{with_deadline}** deadlines on track")
+        st.caption("Forecasts simulate 10,000 possible futures from your past monthly savings (P10 / P50 / P90).")
         for goal in goals:
             st.subheader(f"🎯 {goal['goal_name']}")
             progress_pct = (goal['current_amount'] / goal['target_amount'] * 100) if goal['target_amount'] > 0 else 0
@@ -558,14 +904,27 @@ elif page == "Savings Goals":
                 st.progress(min(progress_pct / 100, 1.0))
                 st.markdown(f"**Progress:** {format_currency(goal['current_amount'])} / {format_currency(goal['target_amount'])} ({progress_pct:.1f}%)")
                 
-                timeline = calculate_savings_timeline(goal['current_amount'], goal['target_amount'], analysis['actual_savings'])
-                if timeline['is_achievable']:
-                    st.markdown(f"**📅 Estimated completion:** {timeline['estimated_completion']}")
+                plan = plans.get(goal['id'])
+                if plan and plan['months_needed']:
+                    outlook = {True: " · ✅ on track", False: " · ⚠️ misses deadline", None: ""}[plan['meets_deadline']]
+                    st.markdown(f"**💸 Allocated:** {format_currency(plan['monthly_contribution'])}/month · "
+                                f"**📅 ETA:** {datetime.fromisoformat(plan['eta']).strftime('%B %Y')}{outlook}")
+                elif plan and plan['months_needed'] is None:
+                    st.markdown("**💸 Allocated:** nothing left this month · ⚠️ no ETA")
+                
+                forecast = forecasts.get(goal['id'])
+                if forecast and forecast['p50_months'] > 0:
+                    dates = [forecast[f"p{p}_date"] for p in (10, 50, 90)]
+                    labels = [datetime.fromisoformat(d).strftime("%b %Y") if d else "10+ years" for d in dates]
+                    line = f"**🎲 Forecast:** optimistic {labels[0]} · likely {labels[1]} · pessimistic {labels[2]}"
+                    if forecast['deadline_probability'] is not None:
+                        line += f" · **{forecast['deadline_probability']:.0%}** chance by the deadline"
+                    st.markdown(line)
             
             with col2:
                 new_amount = st.number_input("Update (Rp)", min_value=0.0, value=float(goal['current_amount']), step=10000.0, key=f"goal_{goal['id']}")
                 if st.button("💾", key=f"update_{goal['id']}", use_container_width=True):
-                    update_goal_progress(goal['id'], new_amount)
+                    update_goal_progress(goal['id'], new_amount, user_id)
                     st.success("Updated!")
                     st.rerun()
             
@@ -580,35 +939,28 @@ elif page == "Chat Assistant":
         st.info("🔑 Please add your Google AI API key in the sidebar to start chatting.")
         st.stop()
     
-    expenses = get_expenses()
-    goals = get_savings_goals()
+    window = analysis_window(data_version, user_id)
+    totals, analysis, _, _ = load_analysis(data_version, budget_version, user_id, profile['monthly_income'], window)
+    goals = load_savings_goals(data_version, user_id)
     
-    if expenses:
-        analysis = analyze_spending(expenses, profile['monthly_income'])
-        
-        context = f"""
-User Profile:
-- Name: {profile['name']}
-- Monthly Income: {format_currency(profile['monthly_income'])}
-- Status: {profile['status']}
-
-Financial Summary:
-- Total Expenses: {format_currency(analysis['total_expenses'])}
-- Current Savings: {format_currency(analysis['actual_savings'])}
-- Savings Rate: {analysis['savings_percentage']:.1f}%
-- Needs Spending: {format_currency(analysis['needs_total'])} ({analysis['needs_percentage']:.1f}%)
-- Wants Spending: {format_currency(analysis['wants_total'])} ({analysis['wants_percentage']:.1f}%)
-
-Top Expense Categories:
-"""
-        for cat, amt in sorted(analysis['category_breakdown'].items(), key=lambda x: x[1], reverse=True)[:3]:
-            context += f"- {cat}: {format_currency(amt)}\n"
-        
-        if goals:
-            context += "\nSavings Goals:\n"
-            for goal in goals:
-                context += f"- {goal['goal_name']}: {format_currency(goal['current_amount'])} / {format_currency(goal['target_amount'])}\n"
-        
+    # The financial context goes into the system instruction once per session.
+    # A new session is started when the context changes (after a write) or when
+    # the history outgrows its limits; older turns are then folded into a digest
+    # that rides along in the system instruction.
+    context = get_financial_context((data_version, budget_version), profile, analysis if totals['expense_count'] else None, goals, window)
+    chat_history = st.session_state.chat_history
+    history = st.session_state.chat.get_history() if "chat" in st.session_state else []
+    if ("chat" not in st.session_state or st.session_state.get("chat_context") != context
+            or chat_history.needs_compaction(history)):
+        history = chat_history.compact(history)
+        st.session_state.chat = st.session_state.genai_client.aio.chats.create(
+            model=CHAT_MODEL,
+            config={"system_instruction": system_instruction(context, chat_history.digest)},
+            history=history
+        )
+        st.session_state.chat_context = context
+    
+    if totals['expense_count']:
         if len(st.session_state.messages) == 0:
             st.session_state.messages.append({
                 "role": "assistant", 
@@ -625,20 +977,63 @@ Top Expense Categories:
             st.markdown(prompt)
         
         try:
-            full_prompt = prompt
-            if expenses:
-                full_prompt = f"[User's financial context: {context}]\n\nUser question: {prompt}"
-            
-            response = st.session_state.chat.send_message(full_prompt)
-            answer = response.text if hasattr(response, "text") else str(response)
+            response_cache = get_response_cache()
+            earlier_turns = st.session_state.chat.get_history()
+            answer = local_reply(prompt, profile, goals, st.session_state.chat_metrics)
+            if answer is None and use_response_cache:
+                answer = cached_reply(response_cache, prompt, context, earlier_turns,
+                                      st.session_state.chat_metrics, user_id=user_id)
             
             with st.chat_message("assistant"):
-                st.markdown(answer)
+                if answer is not None:
+                    st.markdown(answer)
+                else:
+                    # The request runs on a background loop; updating the status
+                    # placeholder while waiting lets a rerun interrupt (and cancel) it
+                    status = st.empty()
+                    reply = AsyncChatClient().stream(
+                        st.session_state.chat, prompt, st.session_state.chat_metrics,
+                        cancel=st.session_state.chat_cancel,
+                        on_wait=lambda elapsed: status.caption(f"⏳ Waiting for Gemini... {elapsed:.0f}s"),
+                        streaming=stream_responses
+                    )
+                    if stream_responses:
+                        answer = st.write_stream(reply)
+                    else:
+                        answer = "".join(reply)
+                        st.markdown(answer)
+                    status.empty()
+            
+            last_turn = st.session_state.chat_metrics[-1]
+            if last_turn.get("cached") or last_turn.get("local"):
+                # Gemini never saw this turn; add it to the session so follow-up questions have it
+                st.session_state.chat = st.session_state.genai_client.aio.chats.create(
+                    model=CHAT_MODEL,
+                    config={"system_instruction": system_instruction(context, chat_history.digest)},
+                    history=earlier_turns + [make_content("user", prompt), make_content("model", answer)]
+                )
+            else:
+                response_cache.put(prompt, context, answer, earlier_turns, user_id=user_id)
             
             st.session_state.messages.append({"role": "assistant", "content": answer})
             
+        except ChatCancelledError:
+            st.info("Request cancelled.")
+        except ChatRequestError as e:
+            st.error(f"Gemini did not respond: {e}")
         except Exception as e:
             st.error(f"An error occurred: {e}")
+    
+    if st.session_state.chat_metrics:
+        last_turn = st.session_state.chat_metrics[-1]
+        cache_stats = get_response_cache().stats()
+        source = "local" if last_turn.get("local") else "cache" if last_turn.get("cached") else "Gemini"
+        st.caption(f"⏱️ First token {last_turn['ttft']:.2f}s · Total {last_turn['total']:.2f}s ({source}) · "
+                   f"Cache hit rate {cache_stats['hit_rate']:.0%} ({cache_stats['hits']}/{cache_stats['hits'] + cache_stats['misses']})")
+    
+    payload = chat_history.payload_tokens(system_instruction(context, chat_history.digest), history)
+    st.caption(f"📦 Request size ~{payload:,} tokens · {len(history) // 2} recent turns kept · "
+               f"{chat_history.compacted_turns} older turns summarized")
 
 # Footer
 st.divider()
@@ -0,0 +1,24 @@
+# tests/conftest.py
+"""Import path and fixtures shared by the test modules."""
+import os
+import sys
+
+import pytest
+
+# The one place the repository root is put on the import path; test modules import the app modules directly
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import finance_db
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    """Point finance_db at a fresh database file in tmp_path; yields its path
+
+    Pooled connections are closed before and after, so no test reuses a
+    connection to another test's file.
+    """
+    monkeypatch.chdir(tmp_path)
+    finance_db.close_connections()
+    monkeypatch.setattr(finance_db, "DB_PATH", str(tmp_path / "finance_data.db"))
+    yield finance_db.DB_PATH
+    finance_db.close_connections()
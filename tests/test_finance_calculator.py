@@ -0,0 +1,158 @@
+# tests/test_finance_calculator.py
+"""finance_calculator: summarize_columnar() against summarize_expenses(), analysis windows, monthly trends and budget rules."""
+import random
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import finance_db
+from finance_calculator import (ALL_CATEGORIES, CATEGORY_CODES, DAYS_PER_MONTH, Window, analyze_spending,
+                                get_financial_health_score, get_financial_tips, month_window, monthly_trend, previous_window,
+                                recent_month_windows, rolling_window, summarize_columnar, summarize_expenses,
+                                window_months, ytd_window)
+
+ROWS = [("Transportasi", 120_000.0), (None, 50_000.0), ("Hobi", 75_000.0),
+        (None, 25_000.0), ("Kategori Baru", 10_000.0), ("Transportasi", 30_000.0)]
+
+def row_summary(categories):
+    return summarize_expenses([{"category": category, "amount": amount}
+                               for category, (_, amount) in zip(categories, ROWS)])
+
+def amounts():
+    return [amount for _, amount in ROWS]
+
+def test_names_with_none_match_summarize_expenses():
+    categories = [category for category, _ in ROWS]
+    assert summarize_columnar(categories, amounts()) == row_summary(categories)
+
+def test_categorical_with_nan_counts_missing_rows_as_other():
+    categories = pd.Series([category for category, _ in ROWS], dtype="category")
+    columnar = summarize_columnar(categories, amounts())
+    expected = row_summary(categories.tolist())
+
+    # NaN keys never compare equal, so compare the breakdown item by item
+    assert list(columnar["category_breakdown"].values()) == list(expected["category_breakdown"].values())
+    assert [key for key in columnar["category_breakdown"] if isinstance(key, str)] == \
+        [key for key in expected["category_breakdown"] if isinstance(key, str)]
+    for key in ("total_expenses", "needs_total", "wants_total", "other_total", "expense_count"):
+        assert columnar[key] == expected[key]
+    assert columnar["other_total"] >= 75_000.0
+
+def test_negative_integer_codes_count_as_other():
+    codes = np.array([CATEGORY_CODES["Transportasi"], -1, CATEGORY_CODES["Hobi"]])
+    summary = summarize_columnar(codes, [100.0, 40.0, 60.0])
+    assert summary["category_breakdown"] == {"Transportasi": 100.0, None: 40.0, "Hobi": 60.0}
+    assert summary["total_expenses"] == 200.0
+    assert summary["needs_total"] + summary["wants_total"] + summary["other_total"] == 200.0
+    assert summary["other_total"] >= 40.0
+
+def test_random_floats_match_summarize_expenses_exactly():
+    rng = random.Random(11)
+    for _ in range(20):
+        count = rng.randrange(1, 2_000)
+        categories = [rng.choice(ALL_CATEGORIES) for _ in range(count)]
+        # Mixed magnitudes, so a different summation order shows up in the last bits
+        amounts = [rng.uniform(0, 1) * 10 ** rng.randrange(-2, 12) for _ in range(count)]
+        expected = summarize_expenses([{"category": category, "amount": amount}
+                                       for category, amount in zip(categories, amounts)])
+        assert summarize_columnar(categories, amounts) == expected
+        codes = np.array([CATEGORY_CODES[category] for category in categories])
+        assert summarize_columnar(codes, amounts) == expected
+
+# ==================== ANALYSIS WINDOWS ====================
+
+def test_previous_window_of_a_month_is_the_month_before():
+    assert previous_window(month_window(2024, 3)) == month_window(2024, 2)
+    assert previous_window(month_window(2024, 1)) == Window("2023-12-01", "2023-12-31", "Dec 2023")
+
+def test_previous_window_of_a_rolling_window_has_the_same_length():
+    assert previous_window(rolling_window(30, date(2024, 3, 31))) == \
+        Window("2024-02-01", "2024-03-01", "Previous 30 days")
+    assert previous_window(rolling_window(7, date(2024, 3, 3))) == \
+        Window("2024-02-19", "2024-02-25", "Previous 7 days")
+
+def test_previous_window_of_year_to_date_is_the_same_period_last_year():
+    assert previous_window(ytd_window(date(2024, 3, 15))) == Window("2023-01-01", "2023-03-15", "YTD 2023")
+    # February 29th has no counterpart, so last year's period ends on the 28th
+    assert previous_window(ytd_window(date(2024, 2, 29))) == Window("2023-01-01", "2023-02-28", "YTD 2023")
+
+def test_window_months_counts_whole_months_exactly():
+    assert window_months(month_window(2024, 2)) == 1.0
+    assert window_months(Window("2024-01-01", "2024-03-31", "Q1 2024")) == 3.0
+
+def test_window_months_of_partial_months_is_days_over_an_average_month():
+    assert window_months(rolling_window(30, date(2024, 3, 31))) == 30 / DAYS_PER_MONTH
+    assert window_months(ytd_window(date(2024, 3, 15))) == 75 / DAYS_PER_MONTH
+
+# ==================== MONTHLY TREND ====================
+
+def test_trend_matches_analyzing_each_month_on_its_own(temp_db):
+    user_id = finance_db.DEFAULT_USER_ID
+    rng = random.Random(5)
+    finance_db.bulk_add_expenses([(f"2024-{rng.randrange(1, 6):02d}-{rng.randrange(1, 29):02d}",
+                                   rng.choice(ALL_CATEGORIES), float(rng.randrange(10_000, 900_000)))
+                                  for _ in range(300)], user_id=user_id)
+    windows = recent_month_windows(6, date(2024, 6, 10))
+    allocation = {"needs_percentage": 60.0, "wants_percentage": 25.0, "savings_percentage": 15.0}
+
+    trend = monthly_trend(finance_db.get_monthly_totals(windows[0].start[:7], windows[-1].start[:7], user_id=user_id),
+                          10_000_000, windows, allocation)
+
+    assert [point["month"] for point in trend] == ["2024-01", "2024-02", "2024-03", "2024-04", "2024-05", "2024-06"]
+    for point, window in zip(trend, windows):
+        totals = finance_db.get_spending_totals(window.start, window.end, user_id=user_id)
+        analysis = analyze_spending(totals, 10_000_000, allocation=allocation)
+        assert point["label"] == window.label
+        assert point["total_expenses"] == pytest.approx(analysis["total_expenses"])
+        assert point["category_breakdown"] == pytest.approx(analysis["category_breakdown"])
+        assert point["savings_percentage"] == pytest.approx(analysis["savings_percentage"])
+        assert point["health_score"] == get_financial_health_score(analysis)["score"]
+        assert point["expense_count"] == totals["expense_count"]
+
+def test_months_without_expenses_are_zero_spending_months():
+    windows = recent_month_windows(2, date(2024, 2, 1))
+    trend = monthly_trend({"2024-02": summarize_expenses([{"category": "Hobi", "amount": 2_000_000.0}])},
+                          10_000_000, windows)
+    empty, february = trend
+    assert (empty["month"], empty["total_expenses"], empty["expense_count"]) == ("2024-01", 0, 0)
+    assert empty["savings_percentage"] == 100.0 and empty["category_breakdown"] == {}
+    assert (february["wants_total"], february["savings_percentage"]) == (2_000_000.0, 80.0)
+
+# ==================== BUDGET ALLOCATION ====================
+
+NEEDS_HEAVY = {"needs_percentage": 60.0, "wants_percentage": 25.0, "savings_percentage": 15.0}
+SAVER = {"needs_percentage": 40.0, "wants_percentage": 30.0, "savings_percentage": 30.0}
+
+def spending(needs: float, wants: float, allocation=None):
+    """Analysis of one month on a 10.000.000 income"""
+    return analyze_spending([{"category": "Transportasi", "amount": needs}, {"category": "Hobi", "amount": wants}],
+                            10_000_000, allocation=allocation)
+
+def test_budget_follows_the_allocation():
+    analysis = spending(6_000_000, 1_500_000, NEEDS_HEAVY)
+    assert analysis["ideal_budget"] == {"needs": 6_000_000, "wants": 2_500_000, "savings": 1_500_000}
+    assert (analysis["needs_difference"], analysis["savings_difference"]) == (0, 1_000_000)
+    assert spending(6_000_000, 1_500_000)["needs_difference"] == 1_000_000
+
+def test_health_score_uses_the_allocation_of_the_analysis():
+    # 60% needs and 25% savings: on target for 60/25/15, over on needs for 50/30/20, under on savings for 40/30/30
+    assert get_financial_health_score(spending(6_000_000, 1_500_000, NEEDS_HEAVY))["score"] == 90
+    assert get_financial_health_score(spending(6_000_000, 1_500_000))["score"] == 85
+    assert get_financial_health_score(spending(6_000_000, 1_500_000, SAVER))["score"] == 70
+
+def test_explicit_allocation_overrides_the_analysis_one():
+    analysis = spending(6_000_000, 1_500_000, NEEDS_HEAVY)
+    assert get_financial_health_score(analysis, SAVER) == get_financial_health_score(spending(6_000_000, 1_500_000, SAVER))
+
+def test_tips_use_the_savings_target_and_budget_of_the_allocation():
+    # 12% savings: fine for a 20% target, below half of a 30% target
+    default_tips = " ".join(get_financial_tips(spending(6_000_000, 2_800_000)))
+    saver_tips = " ".join(get_financial_tips(spending(6_000_000, 2_800_000, SAVER)))
+    assert "Tip Tabungan" not in default_tips
+    assert "di bawah 15%" in saver_tips and "15-30%" in saver_tips
+    # Needs are over budget by 1.000.000 on 50/30/20, by 2.000.000 on 40/30/30, and not at all on 60/25/15
+    assert "Over budget Rp 1.000.000" in default_tips
+    assert "Over budget Rp 2.000.000" in saver_tips
+    assert "Pengeluaran Kebutuhan" not in " ".join(get_financial_tips(spending(6_000_000, 2_800_000, NEEDS_HEAVY)))
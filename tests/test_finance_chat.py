@@ -0,0 +1,204 @@
+# tests/test_finance_chat.py
+"""AsyncChatClient against the offline fake client: latency metrics, retry, timeout, cancellation and concurrency."""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from finance_chat import (AsyncChatClient, ChatCancelledError, ChatRequestError, FakeAsyncChat, FakeClient,
+                          ResponseCache, cached_reply)
+from finance_history import make_content
+
+def make_client(**options) -> AsyncChatClient:
+    options.setdefault("timeout", 5.0)
+    options.setdefault("backoff", 0.01)
+    return AsyncChatClient(**options)
+
+# ==================== METRICS ====================
+
+def test_streamed_turn_records_time_to_first_token_and_total():
+    chat = FakeClient(replies=["Pengeluaran terbesar kamu: Makanan."], chunk_size=4, delay=0.05).aio.chats.create()
+    metrics = []
+    chunks = list(make_client().stream(chat, "hi", metrics))
+
+    turn = metrics[-1]
+    assert "".join(chunks) == "Pengeluaran terbesar kamu: Makanan."
+    assert turn["streamed"] is True
+    assert turn["chunks"] == len(chunks) == 9
+    assert turn["chars"] == 35
+    # The first chunk waits one delay, the whole reply waits one per chunk
+    assert 0.05 <= turn["ttft"] < 0.3
+    assert turn["total"] >= 9 * 0.05
+    assert turn["ttft"] < turn["total"]
+
+def test_non_streamed_turn_arrives_in_one_chunk():
+    chat = FakeClient(replies=["Halo!"], delay=0.1).aio.chats.create()
+    metrics = []
+    assert make_client().send(chat, "hi", metrics) == "Halo!"
+
+    turn = metrics[-1]
+    assert turn["streamed"] is False
+    assert turn["chunks"] == 1
+    assert 0.1 <= turn["ttft"] <= turn["total"]
+
+def test_failed_turn_still_records_latency():
+    metrics = []
+    with pytest.raises(ChatRequestError):
+        make_client(timeout=0.1, max_retries=0).send(FakeAsyncChat(hang=True), "hi", metrics)
+    assert metrics[-1]["chunks"] == 0
+    assert metrics[-1]["ttft"] == metrics[-1]["total"] >= 0.1
+
+def test_cache_hit_is_recorded_as_cached(tmp_path):
+    cache = ResponseCache(path=str(tmp_path / "chat_cache.db"))
+    metrics = []
+    assert cached_reply(cache, "Berapa tabunganku?", "context", [], metrics, user_id=1) is None
+    assert metrics == []
+
+    cache.put("Berapa tabunganku?", "context", "Rp 1.000.000", [], user_id=1)
+    assert cached_reply(cache, "berapa  tabunganku", "context", [], metrics, user_id=1) == "Rp 1.000.000"
+    assert metrics[-1]["cached"] is True
+    assert metrics[-1]["ttft"] == metrics[-1]["total"]
+
+# ==================== RESPONSE CACHE ====================
+
+def turn(question: str, answer: str):
+    return [make_content("user", question), make_content("model", answer)]
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResponseCache(path=str(tmp_path / "chat_cache.db"), max_entries=3, ttl=60)
+
+def test_answers_are_not_shared_between_users(cache):
+    cache.put("Berapa tabunganku?", "context", "Rp 1.000.000", user_id=1)
+    assert cache.get("Berapa tabunganku?", "context", user_id=2) is None
+    assert cache.get("Berapa tabunganku?", "context", user_id=1) == "Rp 1.000.000"
+
+def test_follow_ups_only_match_the_same_conversation(cache):
+    food = turn("Berapa pengeluaran makan bulan ini?", "Rp 1.200.000")
+    travel = turn("Berapa pengeluaran traveling bulan ini?", "Rp 3.000.000")
+    cache.put("Kenapa?", "context", "Karena sering makan di luar.", food, user_id=1)
+
+    assert cache.get("Kenapa?", "context", travel, user_id=1) is None
+    assert cache.get("Kenapa?", "context", [], user_id=1) is None
+    assert cache.get("Kenapa?", "context", food, user_id=1) == "Karena sering makan di luar."
+    # Only the last CACHE_HISTORY_TURNS turns count, not how the conversation started
+    cache.put("Dan bulan lalu?", "context", "Rp 900.000", turn("Halo", "Halo!") + travel + food, user_id=1)
+    assert cache.get("Dan bulan lalu?", "context", turn("Hai", "Hai!") + travel + food, user_id=1) == "Rp 900.000"
+
+def test_expired_answers_are_dropped(cache, monkeypatch):
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now)
+    cache.put("Berapa tabunganku?", "context", "Rp 1.000.000", user_id=1)
+
+    monkeypatch.setattr(time, "time", lambda: now + 59)
+    assert cache.get("Berapa tabunganku?", "context", user_id=1) == "Rp 1.000.000"
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    assert cache.get("Berapa tabunganku?", "context", user_id=1) is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5, "entries": 0}
+
+def test_least_recently_used_answer_is_evicted(cache, monkeypatch):
+    clock = iter(range(1_000, 2_000))
+    monkeypatch.setattr(time, "time", lambda: next(clock))
+    for question in ("a?", "b?", "c?"):
+        cache.put(question, "context", question.upper(), user_id=1)
+    assert cache.get("a?", "context", user_id=1) == "A?"
+
+    cache.put("d?", "context", "D?", user_id=1)
+    assert cache.stats()["entries"] == 3
+    assert cache.get("b?", "context", user_id=1) is None
+    assert [cache.get(q, "context", user_id=1) for q in ("a?", "c?", "d?")] == ["A?", "C?", "D?"]
+
+# ==================== RETRY ====================
+
+def test_transient_errors_are_retried():
+    chat = FakeAsyncChat(fail_times=2, replies=["Halo!"])
+    metrics = []
+    assert "".join(make_client(max_retries=3).stream(chat, "hi", metrics)) == "Halo!"
+    assert chat.attempts == 3
+    assert metrics[0]["chars"] == len("Halo!")
+
+def test_retries_give_up_after_max_retries():
+    chat = FakeAsyncChat(fail_times=10)
+    with pytest.raises(ChatRequestError, match="503"):
+        make_client(max_retries=2).send(chat, "hi")
+    assert chat.attempts == 3
+    assert chat.sent == []
+
+def test_non_transient_errors_are_not_retried():
+    class BrokenChat(FakeAsyncChat):
+        async def send_message(self, message, config=None):
+            self.attempts += 1
+            raise ValueError("bad request")
+
+    chat = BrokenChat()
+    with pytest.raises(ChatRequestError, match="bad request"):
+        make_client(max_retries=3).send(chat, "hi")
+    assert chat.attempts == 1
+
+# ==================== TIMEOUT ====================
+
+def test_hanging_request_times_out_after_each_attempt():
+    chat = FakeAsyncChat(hang=True)
+    started = time.perf_counter()
+    with pytest.raises(ChatRequestError, match="No reply within 0.2s"):
+        list(make_client(timeout=0.2, max_retries=1).stream(chat, "hi"))
+    assert chat.attempts == 2
+    assert time.perf_counter() - started < 2.0
+
+# ==================== CANCELLATION ====================
+
+def test_cancel_event_aborts_a_hanging_request():
+    chat = FakeAsyncChat(hang=True)
+    cancel = threading.Event()
+    waits = []
+
+    def on_wait(elapsed):
+        waits.append(elapsed)
+        if elapsed > 0.3:
+            cancel.set()
+
+    with pytest.raises(ChatCancelledError):
+        list(make_client(timeout=30.0, max_concurrent=1).stream(chat, "hi", cancel=cancel, on_wait=on_wait))
+    assert waits
+    # The cancelled request gave its slot back
+    assert make_client(timeout=5.0, max_concurrent=1).send(FakeAsyncChat(replies=["ok"]), "hi") == "ok"
+
+def test_closing_the_stream_cancels_the_request():
+    chat = FakeAsyncChat(replies=["a" * 64], chunk_size=1, delay=0.05)
+    reply = make_client(max_concurrent=1).stream(chat, "hi")
+    assert next(reply) == "a"
+    reply.close()
+    time.sleep(0.2)
+    assert len(chat.history) == 0
+    assert make_client(max_concurrent=1).send(FakeAsyncChat(replies=["ok"]), "hi") == "ok"
+
+# ==================== CONCURRENCY ====================
+
+class CountingChat(FakeAsyncChat):
+    """Records the most requests that were in flight at once"""
+    active = 0
+    peak = 0
+
+    async def send_message(self, message, config=None):
+        CountingChat.active += 1
+        CountingChat.peak = max(CountingChat.peak, CountingChat.active)
+        try:
+            await asyncio.sleep(0.1)
+            return await super().send_message(message, config)
+        finally:
+            CountingChat.active -= 1
+
+def run_concurrently(client: AsyncChatClient, requests: int) -> int:
+    CountingChat.active = CountingChat.peak = 0
+    threads = [threading.Thread(target=client.send, args=(CountingChat(), "hi")) for _ in range(requests)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return CountingChat.peak
+
+def test_each_client_gets_its_own_limit():
+    assert run_concurrently(make_client(max_concurrent=3), 6) == 3
+    assert run_concurrently(make_client(max_concurrent=1), 4) == 1
+    assert run_concurrently(make_client(max_concurrent=2), 4) == 2
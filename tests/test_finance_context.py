@@ -0,0 +1,102 @@
+# tests/test_finance_context.py
+"""Financial context for chat prompts: section priority, token trimming and memoization."""
+import threading
+from datetime import date
+
+import pytest
+
+import finance_context
+from finance_calculator import DEFAULT_BUDGET, analyze_spending, rolling_window
+from finance_context import build_financial_context, estimate_tokens, get_financial_context
+
+PROFILE = {"user_id": 1, "name": "Budi", "monthly_income": 10_000_000, "status": "Single"}
+
+ANALYSIS = analyze_spending([{"category": category, "amount": amount} for category, amount in (
+    ("Makanan & Minuman", 1_500_000), ("Hiburan", 700_000), ("Transportasi", 500_000), ("Hobi", 200_000))],
+    10_000_000, allocation=dict(DEFAULT_BUDGET))
+
+def goals(count: int):
+    return [{"goal_name": f"Target {i}", "current_amount": 1_000_000, "target_amount": 10_000_000}
+            for i in range(count)]
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    finance_context._context_cache.clear()
+    yield
+    finance_context._context_cache.clear()
+
+# ==================== BUILD ====================
+
+def test_full_context_lists_every_section():
+    context = build_financial_context(PROFILE, ANALYSIS, goals(2))
+    for heading in ("User Profile:", "Financial Summary:", "Top Expense Categories:", "Savings Goals:"):
+        assert heading in context
+    assert "- Budget Rule: 50/30/20 (Needs/Wants/Savings)" in context
+    # Only the top three categories, largest first
+    assert context.index("Makanan & Minuman") < context.index("Hiburan") < context.index("Transportasi")
+    assert "Hobi" not in context
+
+def test_context_without_expenses_has_no_summary():
+    context = build_financial_context(PROFILE, None, [])
+    assert context.startswith("User Profile:")
+    assert "Financial Summary:" not in context and "Savings Goals:" not in context
+
+def test_goals_are_cut_off_at_the_token_budget():
+    budget = estimate_tokens(build_financial_context(PROFILE, ANALYSIS, [])) + 40
+    context = build_financial_context(PROFILE, ANALYSIS, goals(50), max_tokens=budget)
+    shown = context.count("/ Rp 10.000.000")
+    assert 0 < shown < 50
+    assert f"- ... and {50 - shown} more goals" in context
+    # Everything but the "... more" line fits the budget
+    assert estimate_tokens(context.rsplit("- ...", 1)[0]) <= budget
+
+def test_lower_priority_sections_are_dropped_first():
+    budget = estimate_tokens(build_financial_context(PROFILE, None, [])) + 5
+    context = build_financial_context(PROFILE, ANALYSIS, goals(3), max_tokens=budget)
+    assert context.startswith("User Profile:")
+    assert "Financial Summary:" not in context and "Top Expense Categories:" not in context
+
+def test_profile_is_kept_even_over_budget():
+    assert build_financial_context(PROFILE, ANALYSIS, [], max_tokens=1).startswith("User Profile:")
+
+# ==================== MEMOIZATION ====================
+
+def test_context_is_memoized_per_data_version():
+    first = get_financial_context(1, PROFILE, ANALYSIS, goals(1))
+    assert get_financial_context(1, PROFILE, None, []) is first
+    assert "Financial Summary:" not in get_financial_context(2, PROFILE, None, [])
+
+def test_context_is_rebuilt_when_the_window_moves():
+    yesterday = rolling_window(30, date(2024, 3, 10))
+    today = rolling_window(30, date(2024, 3, 11))
+    get_financial_context(1, PROFILE, ANALYSIS, [], yesterday)
+    assert "Financial Summary:" in get_financial_context(1, PROFILE, None, [], yesterday)
+    assert "Financial Summary:" not in get_financial_context(1, PROFILE, None, [], today)
+
+def test_context_without_a_window_is_keyed_on_today(monkeypatch):
+    class Tomorrow(date):
+        @classmethod
+        def today(cls):
+            return date(2099, 1, 1)
+
+    get_financial_context(1, PROFILE, ANALYSIS, [])
+    monkeypatch.setattr(finance_context, "date", Tomorrow)
+    assert "Financial Summary:" not in get_financial_context(1, PROFILE, None, [])
+
+def test_concurrent_callers_share_one_bounded_cache():
+    errors = []
+
+    def ask(thread: int):
+        try:
+            for version in range(100):
+                get_financial_context((thread, version % 40), PROFILE, ANALYSIS, [])
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=ask, args=(index % 2,)) for index in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(finance_context._context_cache) == finance_context.CACHE_SIZE
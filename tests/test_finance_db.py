@@ -0,0 +1,337 @@
+# tests/test_finance_db.py
+"""finance_db against a temporary database."""
+import sqlite3
+import threading
+
+import pytest
+
+import finance_db
+from finance_calculator import ALL_CATEGORIES, CATEGORY_TYPES
+
+@pytest.fixture(autouse=True)
+def database(temp_db):
+    finance_db.init_database()
+
+@pytest.fixture
+def alice():
+    return finance_db.get_or_create_user("alice")
+
+def rollup_matches_expenses() -> bool:
+    """Whether monthly_category_totals equals a GROUP BY over the raw expenses"""
+    with finance_db.get_connection() as conn:
+        rollup = conn.execute("""
+        SELECT user_id, year_month, category, ROUND(total, 6), expense_count FROM monthly_category_totals
+        ORDER BY 1, 2, 3
+        """).fetchall()
+        expected = conn.execute("""
+        SELECT user_id, substr(date, 1, 7), category, ROUND(SUM(amount), 6), COUNT(*) FROM expenses
+        GROUP BY 1, 2, 3 ORDER BY 1, 2, 3
+        """).fetchall()
+    return [tuple(row) for row in rollup] == [tuple(row) for row in expected]
+
+# ==================== CONNECTION POOL ====================
+
+def test_pool_reuses_released_connections(tmp_path):
+    pool = finance_db.ConnectionPool(str(tmp_path / "pool.db"), size=1)
+    try:
+        first = pool.acquire()
+        pool.release(first)
+        assert pool.acquire() is first
+        # Borrowers never share a connection; one past the pool size is closed on release
+        second = pool.acquire()
+        assert second is not first
+        pool.release(first)
+        pool.release(second)
+        assert pool._idle == [first]
+        with pytest.raises(sqlite3.ProgrammingError):
+            second.execute("SELECT 1")
+    finally:
+        pool.close()
+    assert pool._idle == []
+
+def test_pool_connections_are_tuned(tmp_path, monkeypatch):
+    opened = []
+    connect = sqlite3.connect
+    monkeypatch.setattr(sqlite3, "connect", lambda *args, **kwargs: opened.append(kwargs) or connect(*args, **kwargs))
+    pool = finance_db.ConnectionPool(str(tmp_path / "pool.db"))
+    conn = pool.acquire()
+    try:
+        assert opened[0]["cached_statements"] == finance_db.STATEMENT_CACHE_SIZE
+        assert opened[0]["check_same_thread"] is False
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1
+        assert conn.path == pool.path
+    finally:
+        pool.release(conn)
+        pool.close()
+
+def test_write_connection_rolls_back_on_error(alice):
+    version = finance_db.get_data_version(alice)
+    with pytest.raises(RuntimeError):
+        with finance_db.write_connection(alice) as conn:
+            conn.execute("INSERT INTO expenses (user_id, date, category, amount, note, created_at) "
+                         "VALUES (?, '2024-01-01', 'Hobi', 5.0, '', '2024-01-01')", (alice,))
+            raise RuntimeError("failed halfway")
+    # Neither the row nor the version bump was kept, and the pooled connection is clean again
+    assert finance_db.count_expenses(user_id=alice)["count"] == 0
+    assert finance_db.get_data_version(alice) == version
+    with finance_db.get_connection(alice) as conn:
+        assert not conn.in_transaction
+
+def test_schema_is_set_up_once_per_process(monkeypatch):
+    finance_db.close_connections()
+    calls = []
+    init_database = finance_db.init_database
+    monkeypatch.setattr(finance_db, "init_database", lambda: calls.append(1) or init_database())
+
+    threads = [threading.Thread(target=finance_db.get_data_version, args=(finance_db.DEFAULT_USER_ID,))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    finance_db.get_or_create_user("alice")
+    assert calls == [1]
+    # Closing the connections checks the schema again on next use
+    finance_db.close_connections()
+    finance_db.get_data_version(finance_db.DEFAULT_USER_ID)
+    assert calls == [1, 1]
+
+# ==================== CUSTOM CATEGORIES ====================
+
+def test_custom_categories_are_private_to_their_user(alice):
+    default = finance_db.DEFAULT_USER_ID
+    assert finance_db.save_custom_category("Donasi", "Needs", user_id=alice)
+    assert not finance_db.save_custom_category("Donasi", "Wants", user_id=alice)
+
+    assert finance_db.get_categories(alice) == ALL_CATEGORIES + ["Donasi"]
+    assert finance_db.get_categories(default) == ALL_CATEGORIES
+    assert "Donasi" not in CATEGORY_TYPES
+    with finance_db.get_connection() as conn:
+        assert not conn.execute("SELECT 1 FROM category_types WHERE category='Donasi'").fetchone()
+
+    # Another user can add the same name with a type of their own
+    assert finance_db.save_custom_category("Donasi", "Wants", user_id=default)
+    assert finance_db.get_custom_categories(default) == {"Donasi": "Wants"}
+    assert finance_db.get_custom_categories(alice) == {"Donasi": "Needs"}
+
+def test_built_in_names_and_unknown_types_are_rejected(alice):
+    assert not finance_db.save_custom_category("Hobi", "Needs", user_id=alice)
+    with pytest.raises(ValueError):
+        finance_db.save_custom_category("Donasi", "Luxury", user_id=alice)
+
+def test_totals_use_each_users_own_category_type(alice):
+    default = finance_db.DEFAULT_USER_ID
+    finance_db.save_custom_category("Donasi", "Needs", user_id=alice)
+    finance_db.save_custom_category("Donasi", "Wants", user_id=default)
+    for user_id in (alice, default):
+        finance_db.add_expense("2024-03-05", "Donasi", 100.0, user_id=user_id)
+
+    for start, end in ((None, None), ("2024-03-01", "2024-03-31"), ("2024-03-02", "2024-03-20")):
+        assert finance_db.get_spending_totals(start, end, user_id=alice)["needs_total"] == 100.0
+        assert finance_db.get_spending_totals(start, end, user_id=default)["wants_total"] == 100.0
+    assert finance_db.get_monthly_totals(user_id=alice)["2024-03"]["needs_total"] == 100.0
+    assert finance_db.get_spending_totals_for_windows([("2024-03-01", "2024-03-10")], alice)[0]["needs_total"] == 100.0
+
+def test_bulk_insert_accepts_only_the_users_own_categories(alice):
+    finance_db.save_custom_category("Donasi", "Needs", user_id=alice)
+    assert finance_db.bulk_add_expenses([("2024-03-05", "Donasi", 100.0)], user_id=alice) == 1
+    with pytest.raises(ValueError, match="Donasi"):
+        finance_db.bulk_add_expenses([("2024-03-05", "Donasi", 100.0)], user_id=finance_db.DEFAULT_USER_ID)
+
+def test_custom_categories_move_with_their_user(alice):
+    finance_db.save_custom_category("Donasi", "Needs", user_id=alice)
+    finance_db.move_user(alice, "shard-x")
+    assert finance_db.get_custom_categories(alice) == {"Donasi": "Needs"}
+    with finance_db.get_connection() as conn:
+        assert not conn.execute("SELECT 1 FROM custom_categories WHERE user_id=?", (alice,)).fetchone()
+
+def test_existing_custom_categories_go_to_the_default_user(tmp_path):
+    finance_db.close_connections()
+    with finance_db.get_connection() as conn:
+        conn.execute("PRAGMA user_version = 10")
+        conn.execute("DROP TABLE custom_categories")
+        conn.execute("INSERT INTO category_types (category, expense_type, code, is_custom) VALUES ('Zakat', 'Needs', 999, 1)")
+    finance_db.close_connections()
+    finance_db.init_database()
+
+    assert finance_db.get_custom_categories(finance_db.DEFAULT_USER_ID) == {"Zakat": "Needs"}
+    with finance_db.get_connection() as conn:
+        assert not conn.execute("SELECT 1 FROM category_types WHERE category='Zakat'").fetchone()
+
+# ==================== MONTHLY ROLLUP ====================
+
+def rollup(user_id: int) -> dict:
+    with finance_db.get_connection() as conn:
+        rows = conn.execute("SELECT year_month, category, total, expense_count FROM monthly_category_totals "
+                            "WHERE user_id=?", (user_id,)).fetchall()
+    return {(row[0], row[1]): (row[2], row[3]) for row in rows}
+
+def expense_ids(user_id: int) -> list:
+    return [e["id"] for e in sorted(finance_db.get_expenses(user_id=user_id), key=lambda e: e["id"])]
+
+def test_rollup_follows_inserts(alice):
+    finance_db.add_expense("2024-03-05", "Hobi", 100.0, user_id=alice)
+    finance_db.add_expense("2024-03-20", "Hobi", 50.0, user_id=alice)
+    finance_db.add_expense("2024-04-01", "Hobi", 10.0, user_id=alice)
+    assert rollup(alice) == {("2024-03", "Hobi"): (150.0, 2), ("2024-04", "Hobi"): (10.0, 1)}
+    assert rollup(finance_db.DEFAULT_USER_ID) == {}
+    assert rollup_matches_expenses()
+
+def test_rollup_follows_updates_of_every_rolled_up_column(alice):
+    finance_db.add_expense("2024-03-05", "Hobi", 100.0, user_id=alice)
+    finance_db.add_expense("2024-03-06", "Hobi", 40.0, user_id=alice)
+    first, second = expense_ids(alice)
+    with finance_db.write_connection(alice) as conn:
+        conn.execute("UPDATE expenses SET amount = 70.0 WHERE id = ?", (first,))
+    assert rollup(alice) == {("2024-03", "Hobi"): (110.0, 2)}
+    with finance_db.write_connection(alice) as conn:
+        conn.execute("UPDATE expenses SET date = '2024-05-01' WHERE id = ?", (first,))
+    assert rollup(alice) == {("2024-03", "Hobi"): (40.0, 1), ("2024-05", "Hobi"): (70.0, 1)}
+    with finance_db.write_connection(alice) as conn:
+        conn.execute("UPDATE expenses SET category = 'Transportasi' WHERE id = ?", (second,))
+    # The emptied month/category row is removed, not left at zero
+    assert rollup(alice) == {("2024-03", "Transportasi"): (40.0, 1), ("2024-05", "Hobi"): (70.0, 1)}
+    with finance_db.write_connection(alice) as conn:
+        conn.execute("UPDATE expenses SET note = 'only the note' WHERE id = ?", (second,))
+    assert rollup(alice) == {("2024-03", "Transportasi"): (40.0, 1), ("2024-05", "Hobi"): (70.0, 1)}
+    assert rollup_matches_expenses()
+
+def test_rollup_follows_deletes(alice):
+    for day in ("2024-03-05", "2024-03-06", "2024-03-07"):
+        finance_db.add_expense(day, "Hobi", 10.0, user_id=alice)
+    first, second, third = expense_ids(alice)
+    finance_db.delete_expense(first, alice)
+    assert rollup(alice) == {("2024-03", "Hobi"): (20.0, 2)}
+    # Another user's delete of the same id is ignored
+    finance_db.delete_expense(second, finance_db.DEFAULT_USER_ID)
+    assert rollup(alice) == {("2024-03", "Hobi"): (20.0, 2)}
+    assert finance_db.delete_expenses([second, third], alice) == 2
+    assert rollup(alice) == {}
+    assert finance_db.get_monthly_totals(user_id=alice) == {}
+
+def test_rebuild_restores_a_damaged_rollup(alice):
+    finance_db.bulk_add_expenses(days(200), user_id=alice)
+    with finance_db.get_connection() as conn:
+        conn.execute("UPDATE monthly_category_totals SET total = 0")
+        conn.execute("DELETE FROM monthly_category_totals WHERE year_month = '2024-01'")
+    assert not rollup_matches_expenses()
+    assert finance_db.rebuild_monthly_totals() == 12
+    assert rollup_matches_expenses()
+
+# ==================== PAGINATION ====================
+
+def walk_pages(limit: int, category: str = None, start_date: str = None, end_date: str = None):
+    """Every page from newest to oldest, with the cursor each one was fetched after"""
+    pages, cursor = [], None
+    while True:
+        page = finance_db.get_expenses_page(category, start_date, end_date, cursor, limit,
+                                            user_id=finance_db.DEFAULT_USER_ID)
+        if not page:
+            return pages
+        pages.append((cursor, page))
+        cursor = (page[-1]["date"], page[-1]["id"])
+
+def test_pages_cover_equal_dates_once_in_both_directions(alice):
+    # Five rows a day, so most page boundaries fall between rows of the same date
+    rows = [(f"2024-03-{day:02d}", category, float(day)) for day in range(1, 8)
+            for category in ("Hobi", "Transportasi", "Hobi", "Kesehatan", "Hobi")]
+    finance_db.bulk_add_expenses(rows, user_id=finance_db.DEFAULT_USER_ID)
+    finance_db.bulk_add_expenses(rows, user_id=alice)
+    everything = sorted(finance_db.get_expenses(user_id=finance_db.DEFAULT_USER_ID),
+                        key=lambda e: (e["date"], e["id"]), reverse=True)
+
+    for limit in (1, 3, 5, 7, 35, 50):
+        pages = walk_pages(limit)
+        assert [e["id"] for _, page in pages for e in page] == [e["id"] for e in everything]
+        assert all(len(page) == limit for _, page in pages[:-1])
+        # Going back to newer pages from the stored cursors returns the same pages
+        for cursor, page in reversed(pages):
+            again = finance_db.get_expenses_page(after=cursor, limit=limit, user_id=finance_db.DEFAULT_USER_ID)
+            assert [e["id"] for e in again] == [e["id"] for e in page]
+
+def test_filtered_pages_match_the_filtered_count():
+    rows = [(f"2024-{month:02d}-{day:02d}", category, 10.0) for month in (2, 3, 4) for day in (1, 15, 28)
+            for category in ("Hobi", "Hobi", "Transportasi")]
+    finance_db.bulk_add_expenses(rows, user_id=finance_db.DEFAULT_USER_ID)
+    filters = ("Hobi", "2024-03-01", "2024-03-31")
+    pages = walk_pages(4, *filters)
+    seen = [e for _, page in pages for e in page]
+    assert len(seen) == 6 == finance_db.count_expenses(*filters, user_id=finance_db.DEFAULT_USER_ID)["count"]
+    assert {e["category"] for e in seen} == {"Hobi"} and {e["date"][:7] for e in seen} == {"2024-03"}
+
+# ==================== BULK INSERT ====================
+
+def days(count: int, category: str = "Hobi"):
+    return [(f"2024-{1 + index % 12:02d}-{1 + index % 28:02d}", category, float(index + 1)) for index in range(count)]
+
+@pytest.mark.parametrize("count, batches", [(0, []), (9, [9]), (10, [10]), (11, [10, 11]), (30, [10, 20, 30])])
+def test_bulk_insert_reports_progress_after_each_batch(count, batches):
+    reported = []
+    assert finance_db.bulk_add_expenses(iter(days(count)), 10, reported.append,
+                                        user_id=finance_db.DEFAULT_USER_ID) == count
+    assert reported == batches
+    assert finance_db.count_expenses(user_id=finance_db.DEFAULT_USER_ID)["count"] == count
+    assert rollup_matches_expenses()
+
+def test_unknown_category_rejects_its_batch_only():
+    rows = days(20) + [("2024-05-01", "No Such Category", 1.0)] + days(5)
+    reported = []
+    with pytest.raises(ValueError, match="No Such Category"):
+        finance_db.bulk_add_expenses(rows, 10, reported.append, user_id=finance_db.DEFAULT_USER_ID)
+    # The first two batches were committed; the third, holding the bad row, was not
+    assert reported == [10, 20]
+    assert finance_db.count_expenses(user_id=finance_db.DEFAULT_USER_ID)["count"] == 20
+    assert rollup_matches_expenses()
+
+def test_bulk_insert_accepts_dicts_and_tuples_with_or_without_note():
+    rows = [{"date": "2024-01-02", "category": "Hobi", "amount": 1.0, "note": "dict"},
+            {"date": "2024-01-01", "category": "Hobi", "amount": 2.0},
+            ("2024-01-03", "Transportasi", 3.0), ("2024-01-04", "Transportasi", 4.0, None)]
+    assert finance_db.bulk_add_expenses(rows, user_id=finance_db.DEFAULT_USER_ID) == 4
+    stored = finance_db.get_expenses(user_id=finance_db.DEFAULT_USER_ID)
+    assert sorted((e["amount"], e["note"]) for e in stored) == [(1.0, "dict"), (2.0, ""), (3.0, ""), (4.0, "")]
+
+def test_ids_follow_the_date_within_a_batch():
+    rows = [("2024-01-03", "Hobi", 1.0), ("2024-01-01", "Hobi", 2.0), ("2024-01-02", "Hobi", 3.0),
+            ("2024-01-01", "Hobi", 4.0)]
+    finance_db.bulk_add_expenses(rows, user_id=finance_db.DEFAULT_USER_ID)
+    stored = sorted(finance_db.get_expenses(user_id=finance_db.DEFAULT_USER_ID), key=lambda e: e["id"])
+    # Same-day rows keep their input order
+    assert [e["amount"] for e in stored] == [2.0, 4.0, 3.0, 1.0]
+
+def test_rollup_stays_consistent_after_bulk_insert_on_top_of_existing_rows(alice):
+    finance_db.add_expense("2024-03-05", "Hobi", 7.0, user_id=alice)
+    finance_db.bulk_add_expenses(days(500), 64, user_id=alice)
+    finance_db.bulk_add_expenses(days(300, "Transportasi"), user_id=finance_db.DEFAULT_USER_ID)
+    assert rollup_matches_expenses()
+    assert finance_db.get_spending_totals(user_id=alice)["total_expenses"] == 7.0 + sum(range(1, 501))
+    assert finance_db.get_spending_totals(user_id=alice)["expense_count"] == 501
+
+# ==================== DATA VERSIONS ====================
+
+def test_writes_bump_the_data_version_and_invalidate_cached_loaders(alice):
+    st = pytest.importorskip("streamlit")
+    bob = finance_db.get_or_create_user("bob")
+    calls = []
+
+    # Keyed the way streamlit_app's loaders are: on the version read once per rerun
+    @st.cache_data(show_spinner=False)
+    def load_expense_count(data_version: int, user_id: int):
+        calls.append(data_version)
+        return finance_db.count_expenses(user_id=user_id)["count"]
+
+    try:
+        version, bob_version = finance_db.get_data_version(alice), finance_db.get_data_version(bob)
+        assert load_expense_count(version, alice) == 0
+        assert load_expense_count(finance_db.get_data_version(alice), alice) == 0
+        assert len(calls) == 1
+
+        finance_db.add_expense("2024-03-05", "Hobi", 7.0, user_id=alice)
+        assert finance_db.get_data_version(alice) != version
+        assert load_expense_count(finance_db.get_data_version(alice), alice) == 1
+        assert len(calls) == 2
+        # Another user's version, and so their cached loaders, are untouched
+        assert finance_db.get_data_version(bob) == bob_version
+    finally:
+        load_expense_count.clear()
@@ -0,0 +1,41 @@
+# tests/test_finance_forecast.py
+"""forecast_goals deadline probabilities, including goals already reached and deadlines already past."""
+from datetime import date
+
+import numpy as np
+import pytest
+
+from finance_forecast import forecast_goals
+
+TODAY = date(2024, 6, 15)
+SAVING = np.array([1_000_000.0])
+
+def goal(current: float, target: float, deadline: str = None) -> dict:
+    return {"id": 1, "goal_name": "Laptop", "current_amount": current, "target_amount": target, "deadline": deadline}
+
+def probability(goals, net_flows=SAVING) -> list:
+    return [forecast["deadline_probability"]
+            for forecast in forecast_goals(goals, net_flows, paths=200, seed=0, today=TODAY)]
+
+@pytest.mark.parametrize("deadline", ["2024-01-31", "2024-06-01", "2024-06-15", "2025-06-15"])
+def test_reached_goals_are_certain_whatever_the_deadline(deadline):
+    assert probability([goal(5_000_000, 5_000_000, deadline), goal(6_000_000, 5_000_000, deadline)]) == [1.0, 1.0]
+
+def test_reached_goals_are_certain_even_when_nothing_is_saved():
+    assert probability([goal(5_000_000, 5_000_000, "2025-01-01")], np.array([-500_000.0])) == [1.0]
+
+def test_past_deadlines_of_open_goals_have_probability_zero():
+    assert probability([goal(0, 3_000_000, "2023-12-31"), goal(0, 3_000_000, "2024-06-01")]) == [0.0, 0.0]
+
+def test_future_deadlines_follow_the_simulated_savings():
+    # A steady 1,000,000 a month reaches 3,000,000 in the third month
+    assert probability([goal(0, 3_000_000, "2024-09-15"), goal(0, 3_000_000, "2024-08-15")]) == [1.0, 0.0]
+
+def test_deadlines_a_few_days_away_count_as_one_month():
+    # The first simulated month is the one the deadline falls in, as in finance_goals.months_until
+    assert probability([goal(0, 1_000_000, "2024-06-20"), goal(0, 2_000_000, "2024-06-20")]) == [1.0, 0.0]
+
+def test_goals_without_a_deadline_have_no_probability():
+    forecast, = forecast_goals([goal(5_000_000, 5_000_000)], SAVING, paths=10, seed=0, today=TODAY)
+    assert forecast["deadline_probability"] is None
+    assert forecast["p50_months"] == 0.0 and forecast["p50_date"] == TODAY.isoformat()
@@ -0,0 +1,120 @@
+# tests/test_finance_goals.py
+"""GoalAllocator: the two allocation passes, incremental updates, and the finance_db goal-update hook."""
+from datetime import date
+
+import pytest
+
+import finance_db
+import finance_goals
+from finance_goals import GoalAllocator, allocate_savings, months_until
+
+TODAY = date(2024, 1, 15)
+
+def goal(goal_id: int, target: float, current: float = 0.0, deadline: str = None, priority: int = 2):
+    return {"id": goal_id, "goal_name": f"Goal {goal_id}", "target_amount": target, "current_amount": current,
+            "deadline": deadline, "priority": priority}
+
+def contributions(plans):
+    return {goal_id: plan["monthly_contribution"] for goal_id, plan in plans.items()}
+
+GOALS = [
+    goal(1, 12_000_000, deadline="2025-01-15"),                 # needs 1.000.000 a month
+    goal(2, 3_000_000, deadline="2024-04-15"),                  # needs 1.000.000 a month
+    goal(3, 6_000_000, deadline="2024-07-15", priority=1),      # needs 1.000.000 a month, high priority
+    goal(4, 5_000_000),                                         # no deadline
+    goal(5, 2_000_000, current=2_000_000, deadline="2024-06-15"),  # already reached
+]
+
+# ==================== ALLOCATION ====================
+
+def test_months_until_a_deadline():
+    assert months_until(None, TODAY) is None
+    assert months_until("2024-01-01", TODAY) == 0
+    assert months_until("2024-01-20", TODAY) == 1
+    assert months_until("2025-01-15", TODAY) == 12
+
+def test_deadlines_are_funded_first_then_the_rest_is_spread():
+    plans = allocate_savings(GOALS, 3_500_000, TODAY)
+    assert contributions(plans) == {1: 1_000_000, 2: 1_000_000, 3: 1_500_000, 4: 0.0, 5: 0.0}
+    assert all(plans[goal_id]["meets_deadline"] for goal_id in (1, 2, 3, 5))
+    assert plans[4]["months_needed"] is None and plans[4]["eta"] is None
+    assert plans[5]["months_needed"] == 0
+
+def test_contributions_never_exceed_monthly_savings():
+    for savings in (0, 500_000, 2_500_000, 10_000_000, 50_000_000):
+        assert sum(contributions(allocate_savings(GOALS, savings, TODAY)).values()) <= savings
+
+def test_high_priority_deadline_is_funded_before_cheaper_normal_ones():
+    plans = allocate_savings(GOALS, 1_000_000, TODAY)
+    assert contributions(plans)[3] == 1_000_000
+    assert plans[1]["meets_deadline"] is False and plans[2]["meets_deadline"] is False
+
+def test_eta_follows_the_contribution():
+    plan = allocate_savings([goal(1, 3_000_000)], 1_000_000, TODAY)[1]
+    assert (plan["months_needed"], plan["eta"]) == (3, "2024-04-15")
+
+# ==================== INCREMENTAL UPDATES ====================
+
+@pytest.mark.parametrize("goal_id, changes", [
+    (4, {"current_amount": 4_500_000}),
+    (1, {"current_amount": 11_000_000}),
+    (2, {"current_amount": 3_000_000}),
+    (5, {"current_amount": 0}),
+    (4, {"deadline": "2024-03-15", "priority": 1}),
+    (3, {"target_amount": 1_000_000, "priority": 3}),
+])
+def test_updating_one_goal_matches_a_fresh_solve(goal_id, changes):
+    allocator = GoalAllocator(GOALS, 3_500_000, TODAY)
+    allocator.update_goal(goal_id, **changes)
+
+    changed = [dict(g, **changes) if g["id"] == goal_id else g for g in GOALS]
+    assert allocator.allocation() == allocate_savings(changed, 3_500_000, TODAY)
+
+def test_changing_monthly_savings_matches_a_fresh_solve():
+    allocator = GoalAllocator(GOALS, 3_500_000, TODAY)
+    allocator.set_monthly_savings(8_000_000)
+    assert allocator.allocation() == allocate_savings(GOALS, 8_000_000, TODAY)
+
+def test_updating_an_unknown_goal_changes_nothing():
+    allocator = GoalAllocator(GOALS, 3_500_000, TODAY)
+    allocator.update_goal(99, 1_000)
+    assert allocator.allocation() == allocate_savings(GOALS, 3_500_000, TODAY)
+
+# ==================== GOAL UPDATE HOOK ====================
+
+@pytest.fixture
+def user(temp_db, monkeypatch):
+    monkeypatch.setattr(finance_goals, "_allocators", {})
+    user_id = finance_db.DEFAULT_USER_ID
+    finance_db.add_savings_goal("Laptop", 15_000_000, user_id=user_id)
+    finance_db.add_savings_goal("Liburan", 5_000_000, user_id=user_id)
+    return user_id
+
+def test_progress_updates_patch_the_cached_allocator(user):
+    allocator = finance_goals.get_allocator(2_000_000, user)
+    laptop = next(g for g in finance_db.get_savings_goals(user) if g["goal_name"] == "Laptop")
+
+    finance_db.update_goal_progress(laptop["id"], 14_500_000, user)
+
+    # The same allocator was patched in place and is current for the new data version
+    assert finance_goals.get_allocator(2_000_000, user) is allocator
+    assert allocator.data_version == finance_db.get_data_version(user)
+    fresh = allocate_savings(finance_db.get_savings_goals(user), 2_000_000, allocator.today)
+    assert allocator.allocation() == fresh
+    assert allocator.allocation()[laptop["id"]]["monthly_contribution"] == 500_000
+
+def test_other_writes_reload_the_allocator(user):
+    allocator = finance_goals.get_allocator(2_000_000, user)
+    finance_db.add_savings_goal("Motor", 20_000_000, user_id=user)
+    reloaded = finance_goals.get_allocator(2_000_000, user)
+    assert reloaded is not allocator
+    assert len(reloaded.allocation()) == 3
+
+def test_stale_allocator_is_not_patched(user):
+    allocator = finance_goals.get_allocator(2_000_000, user)
+    finance_db.add_savings_goal("Motor", 20_000_000, user_id=user)
+    laptop = next(g for g in finance_db.get_savings_goals(user) if g["goal_name"] == "Laptop")
+
+    finance_db.update_goal_progress(laptop["id"], 14_500_000, user)
+    assert allocator.allocation()[laptop["id"]]["monthly_contribution"] != 500_000
+    assert finance_goals.get_allocator(2_000_000, user) is not allocator
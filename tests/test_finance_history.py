@@ -0,0 +1,82 @@
+# tests/test_finance_history.py
+"""ChatHistory: when a history needs compacting, what compact() keeps, and what goes into the digest."""
+from finance_history import DIGEST_HEADER, ChatHistory, content_text, make_content
+
+LEGACY_PROMPT = ("[User's financial context: \nUser Profile:\n- Name: Budi\n- Monthly Income: Rp 10.000.000\n\n"
+                 "Savings Goals:\n- Laptop: Rp 1.000.000 / Rp 15.000.000\n]\n\nUser question: Berapa tabunganku?")
+
+GOALS_REPLY = ("Ini target kamu.\nSavings Goals:\n- Beli rumah: Rp 50.000.000 / Rp 500.000.000\n"
+               "- Laptop: Rp 1.000.000 / Rp 15.000.000\n")
+
+def conversation(turns: int):
+    history = []
+    for i in range(turns):
+        history.append(make_content("user", f"Pertanyaan {i}?"))
+        history.append(make_content("model", f"Jawaban {i}. Detail lainnya."))
+    return history
+
+def texts(history):
+    return [content_text(content) for content in history]
+
+# ==================== NEEDS COMPACTION ====================
+
+def test_short_history_needs_no_compaction():
+    assert not ChatHistory(keep_turns=3).needs_compaction(conversation(3))
+
+def test_too_many_turns_need_compaction():
+    assert ChatHistory(keep_turns=3).needs_compaction(conversation(4))
+
+def test_too_many_tokens_need_compaction():
+    history = conversation(2)
+    history[1] = make_content("model", "x" * 400)
+    assert ChatHistory(keep_turns=6, max_tokens=50).needs_compaction(history)
+    # A single turn is never compacted, however long
+    assert not ChatHistory(keep_turns=6, max_tokens=50).needs_compaction(history[:2])
+
+def test_legacy_context_in_a_prompt_needs_compaction():
+    history = [make_content("user", LEGACY_PROMPT), make_content("model", "Rp 1.000.000.")]
+    assert ChatHistory().needs_compaction(history)
+
+def test_model_reply_listing_goals_needs_no_compaction():
+    history = [make_content("user", "Apa saja targetku?"), make_content("model", GOALS_REPLY)]
+    assert not ChatHistory().needs_compaction(history)
+
+# ==================== COMPACT ====================
+
+def test_compact_keeps_the_last_turns_and_folds_the_rest():
+    chat_history = ChatHistory(keep_turns=2)
+    kept = chat_history.compact(conversation(5))
+
+    assert texts(kept) == ["Pertanyaan 3?", "Jawaban 3. Detail lainnya.", "Pertanyaan 4?", "Jawaban 4. Detail lainnya."]
+    assert chat_history.compacted_turns == 3
+    assert chat_history.digest == DIGEST_HEADER + "\n" + "\n".join(
+        f"- Q: Pertanyaan {i}? A: Jawaban {i}." for i in range(3))
+    assert not chat_history.needs_compaction(kept)
+
+def test_compact_folds_turns_until_the_rest_fits_the_token_budget():
+    history = conversation(4)
+    history[5] = make_content("model", "y" * 400)
+    chat_history = ChatHistory(keep_turns=6, max_tokens=60)
+    kept = chat_history.compact(history)
+    assert texts(kept) == ["Pertanyaan 3?", "Jawaban 3. Detail lainnya."]
+    assert chat_history.compacted_turns == 3
+
+def test_latest_turn_is_kept_even_over_budget():
+    history = [make_content("user", "z" * 400), make_content("model", "z" * 400)]
+    assert len(ChatHistory(max_tokens=10).compact(history)) == 2
+
+def test_digest_drops_the_oldest_lines_over_its_budget():
+    chat_history = ChatHistory(keep_turns=1, digest_tokens=30)
+    chat_history.compact(conversation(10))
+    assert chat_history.compacted_turns == 9
+    assert "Pertanyaan 8?" in chat_history.digest
+    assert "Pertanyaan 0?" not in chat_history.digest
+
+def test_compact_strips_legacy_context_from_prompts():
+    history = [make_content("user", LEGACY_PROMPT), make_content("model", "Rp 1.000.000.")]
+    assert texts(ChatHistory().compact(history)) == ["Berapa tabunganku?", "Rp 1.000.000."]
+
+def test_model_reply_with_a_goals_section_survives_compact():
+    history = [make_content("user", "Apa saja targetku?"), make_content("model", GOALS_REPLY)]
+    history += conversation(1)
+    assert texts(ChatHistory().compact(history))[1] == GOALS_REPLY.strip()
@@ -0,0 +1,41 @@
+# tests/test_finance_importer.py
+"""Statement import: debits become expenses, unreadable rows are skipped and reported in bounded memory."""
+import io
+
+import pytest
+
+import finance_db
+import finance_importer
+from finance_importer import SKIPPED_SHOWN, SkippedRows, import_statement
+
+pytestmark = pytest.mark.usefixtures("temp_db")
+
+def statement(bad_rows: int) -> io.StringIO:
+    lines = ["date,description,amount", "2024-03-01,GRAB RIDE,-50000", "2024-03-02,SALARY,9000000"]
+    lines += [f"not a date,ROW {index},-1" for index in range(bad_rows)]
+    lines.append("2024-03-03,NETFLIX,-150000")
+    return io.StringIO("\n".join(lines) + "\n")
+
+def test_debits_are_imported_and_bad_rows_skipped():
+    skipped = SkippedRows()
+    assert import_statement(statement(3), "csv", user_id=finance_db.DEFAULT_USER_ID, on_error=skipped) == 2
+    assert skipped.count == 3
+    assert [line for line, _ in skipped.first] == [4, 5, 6]
+    totals = finance_db.get_spending_totals(user_id=finance_db.DEFAULT_USER_ID)
+    assert totals["category_breakdown"] == {"Hiburan": 150_000.0, "Transportasi": 50_000.0}
+
+def test_skipped_rows_keep_a_count_and_only_the_first_few():
+    skipped = SkippedRows()
+    assert import_statement(statement(10_000), "csv", user_id=finance_db.DEFAULT_USER_ID, on_error=skipped) == 2
+    assert skipped.count == 10_000
+    assert len(skipped.first) == SKIPPED_SHOWN
+    assert skipped.first[0][0] == 4
+
+def test_cli_reports_how_many_more_rows_were_skipped(tmp_path, capsys):
+    path = tmp_path / "statement.csv"
+    path.write_text(statement(SKIPPED_SHOWN + 5).getvalue())
+    assert finance_importer.main([str(path), "--db", finance_db.DB_PATH]) == 0
+    err = capsys.readouterr().err
+    assert f"Skipped {SKIPPED_SHOWN + 5:,} unreadable rows" in err
+    assert err.count("  line ") == SKIPPED_SHOWN
+    assert "... and 5 more" in err
@@ -0,0 +1,139 @@
+# tests/test_finance_intents.py
+"""Local chat answers: which questions are classified as lookups, and what the lookups answer."""
+from datetime import date
+
+import pytest
+
+import finance_db
+from finance_intents import Intent, answer_intent, classify_intent, route_question
+
+RESTAURANT = "Makan di Luar (Restaurant)"
+FOOD = "Makanan & Minuman"
+
+# ==================== CLASSIFICATION ====================
+
+LOOKUPS = [
+    ("Berapa total pengeluaran saya bulan ini?", Intent("spending", None, "this_month", True)),
+    ("How much did I spend last month?", Intent("spending", None, "last_month", False)),
+    ("total expenses", Intent("spending", None, None, False)),
+    ("berapa pengeluaran untuk makan di luar bulan lalu", Intent("spending", RESTAURANT, "last_month", True)),
+    ("berapa pengeluaran makanan & minuman bulan ini", Intent("spending", FOOD, "this_month", True)),
+    ("How much do I spend on restaurants?", Intent("spending", RESTAURANT, None, False)),
+    ("How much did I spend on groceries this month", Intent("spending", FOOD, "this_month", False)),
+    ("berapa pengeluaran hobi", Intent("spending", "Hobi", None, True)),
+    ("berapa pengeluaran tahun ini", Intent("spending", None, "this_year", True)),
+    ("How much did I spend on transport this year?", Intent("spending", "Transportasi", "this_year", False)),
+    ("Kategori pengeluaran terbesar apa?", Intent("top_category", None, None, True)),
+    ("What is my biggest spending category?", Intent("top_category", None, None, False)),
+    ("Berapa saving rate saya?", Intent("savings_rate", None, None, True)),
+    ("What's my savings rate this month?", Intent("savings_rate", None, "this_month", False)),
+    ("Berapa skor kesehatan keuangan saya?", Intent("health_score", None, None, True)),
+    ("What is my financial health score?", Intent("health_score", None, None, False)),
+    ("Kapan target laptop tercapai?", Intent("goal_eta", None, None, True)),
+    ("When will I reach my goal?", Intent("goal_eta", None, None, False)),
+]
+
+FOR_THE_LLM = [
+    # Advice and explanations
+    "Why is my spending so high?",
+    "Bagaimana cara menabung lebih banyak?",
+    "Kenapa pengeluaran saya naik bulan ini?",
+    # What is left of a budget
+    "how much do I have left to spend on entertainment",
+    "How much of my budget remains this month?",
+    "Berapa sisa budget hiburan bulan ini?",
+    "Berapa anggaran transportasi saya?",
+    # Comparisons
+    "How much do I spend on restaurants compared to groceries?",
+    "How much did I spend on food vs transport?",
+    "Pengeluaran makan dibanding transportasi bulan ini?",
+    # Several categories at once
+    "Berapa pengeluaran makanan dan transportasi?",
+    "How much did I spend on rent and bills last month?",
+    # Amounts the app doesn't track
+    "how much tax do I owe on my expenses",
+    "Berapa pajak dari pengeluaran saya?",
+    "How much debt do I have?",
+    # Periods other than this month, last month and this year
+    "How much did I spend last week?",
+    "How much did I spend in January?",
+    "how much did I spend yesterday",
+    "berapa pengeluaran kemarin",
+    "total spending in 2023",
+    "average spending per month",
+    "berapa rata-rata pengeluaran bulanan saya?",
+    "How much did I spend last year?",
+    "Berapa pengeluaran saya minggu ini?",
+    "How much did I spend in the last 7 days?",
+    "What was my biggest spending category in March?",
+    # Two periods at once
+    "How much did I spend this month and last month?",
+    # Subjects that are not a category: merchants, items, unknown custom categories
+    "How much did I spend on coffee?",
+    "How much did I spend at Starbucks this month?",
+    "berapa pengeluaran untuk kopi bulan ini",
+    "Berapa pengeluaran saya di Indomaret?",
+    "berapa pengeluaran untuk Donasi",
+]
+
+@pytest.mark.parametrize("prompt, intent", LOOKUPS)
+def test_lookups_are_classified(prompt, intent):
+    assert classify_intent(prompt) == intent
+
+@pytest.mark.parametrize("prompt", FOR_THE_LLM)
+def test_other_questions_go_to_the_llm(prompt):
+    assert classify_intent(prompt) is None
+
+def test_custom_categories_are_recognized():
+    assert classify_intent("berapa pengeluaran untuk Donasi", ["Donasi"]) == Intent("spending", "Donasi", None, True)
+    assert classify_intent("How much did I spend on zakat this year?", ["Zakat", "Donasi"]) == \
+        Intent("spending", "Zakat", "this_year", False)
+    # A custom category and a built-in one are still two categories
+    assert classify_intent("berapa pengeluaran donasi dan transportasi", ["Donasi"]) is None
+    assert classify_intent("How much did I spend on coffee?", ["Donasi"]) is None
+
+# ==================== ANSWERS ====================
+
+@pytest.fixture
+def profile(temp_db):
+    user_id = finance_db.DEFAULT_USER_ID
+    finance_db.save_user_profile("Budi", 10_000_000, user_id=user_id)
+    today = date.today().isoformat()
+    finance_db.bulk_add_expenses([(today, RESTAURANT, 300_000.0), (today, FOOD, 1_200_000.0),
+                                  (today, "Transportasi", 500_000.0)], user_id=user_id)
+    return finance_db.get_user_profile(user_id)
+
+ANSWERS = [
+    ("How much do I spend on restaurants this month?", ["Rp 300.000", RESTAURANT]),
+    ("berapa pengeluaran makan di luar bulan ini", ["Pengeluaran kamu", "Rp 300.000"]),
+    ("How much did I spend this month?", ["Rp 2.000.000", "Needs Rp 1.700.000", "Wants Rp 300.000"]),
+    ("Berapa total pengeluaran bulan ini?", ["Rp 2.000.000", "Kebutuhan Rp 1.700.000"]),
+    ("What is my biggest spending category this month?", [FOOD, "Rp 1.200.000"]),
+    ("Kategori pengeluaran terbesar bulan ini?", ["terbesar", FOOD]),
+    ("What's my savings rate this month?", ["80.0%", "Rp 8.000.000"]),
+    ("When will I reach my goal?", ["don't have any savings goals"]),
+    ("Kapan target tercapai?", ["belum punya target"]),
+    ("How much did I spend this year?", ["Your total spending this year", "Rp 2.000.000"]),
+]
+
+@pytest.mark.parametrize("prompt, expected", ANSWERS)
+def test_lookups_are_answered_from_the_stored_data(profile, prompt, expected):
+    answer = route_question(prompt, profile, finance_db.get_savings_goals(profile['user_id']))
+    for text in expected:
+        assert text in answer
+
+def test_questions_for_the_llm_get_no_local_answer(profile):
+    assert route_question("how much do I have left to spend on entertainment", profile, []) is None
+    assert route_question("How much did I spend on coffee this month?", profile, []) is None
+    assert route_question("How much did I spend at Starbucks?", profile, []) is None
+
+def test_custom_categories_are_answered_from_the_stored_data(profile):
+    user_id = profile['user_id']
+    finance_db.save_custom_category("Donasi", "Needs", user_id=user_id)
+    finance_db.add_expense(date.today().isoformat(), "Donasi", 150_000.0, user_id=user_id)
+    answer = route_question("berapa pengeluaran untuk Donasi bulan ini", profile, [])
+    assert "Donasi" in answer and "Rp 150.000" in answer
+
+def test_unknown_intents_are_rejected(profile):
+    with pytest.raises(ValueError):
+        answer_intent(Intent("weather", None, None, False), profile, [])
@@ -0,0 +1,158 @@
+# tests/test_finance_storage.py
+"""Conformance of every storage backend to the Repository contract: SQLite, in-memory and Postgres (stand-in)."""
+import os
+
+import pytest
+
+import finance_db
+from finance_storage import SQLiteRepository, open_repository
+
+ALICE, BOB, CAROL = 101, 102, 103
+
+ROWS = [("2024-01-31", "Hobi", 100.0, "a"), ("2024-02-01", "Transportasi", 50.0),
+        ("2024-02-15", "Hobi", 25.0, "b"), ("2024-02-29", "Kesehatan", 10.0), ("2024-03-01", "Hobi", 5.0)]
+
+@pytest.fixture(params=["sqlite", "memory", "standin"])
+def repo(request, tmp_path):
+    urls = {"sqlite": f"sqlite:///{tmp_path / 'finance.db'}", "memory": "memory://", "standin": "standin://"}
+    repository = open_repository(urls[request.param])
+    yield repository
+    repository.close()
+
+@pytest.fixture
+def expenses(repo):
+    """Alice's five bulk rows plus one single insert, and one expense for Bob"""
+    assert repo.bulk_add_expenses(ROWS, user_id=ALICE) == 5
+    repo.add_expense("2024-02-15", "Hiburan", 7.0, "c", user_id=ALICE)
+    repo.add_expense("2024-02-10", "Hobi", 1000.0, "", user_id=BOB)
+    return repo
+
+# ==================== PROFILE ====================
+
+def test_profile_upsert_is_per_user(repo):
+    assert repo.get_user_profile(ALICE) is None
+    repo.save_user_profile("Alice", 8_000_000, "Single", 0, user_id=ALICE)
+    repo.save_user_profile("Alice", 9_000_000, "Married", 1, user_id=ALICE)
+    profile = repo.get_user_profile(ALICE)
+    assert (profile["name"], profile["monthly_income"], profile["status"], profile["dependents"]) == \
+        ("Alice", 9_000_000, "Married", 1)
+    assert repo.get_user_profile(BOB) is None
+
+# ==================== BULK INSERT ====================
+
+def test_bulk_insert_commits_in_batches_and_reports_progress(repo):
+    reported = []
+    rows = (("2024-01-%02d" % (1 + index % 28), "Hobi", 1.0) for index in range(25))
+    assert repo.bulk_add_expenses(rows, 10, reported.append, user_id=ALICE) == 25
+    assert reported == [10, 20, 25]
+    assert repo.count_expenses(user_id=ALICE) == {"count": 25, "total": 25.0}
+
+def test_unknown_category_rejects_its_batch_and_keeps_earlier_ones(repo):
+    rows = [("2024-01-01", "Hobi", 1.0)] * 4 + [("2024-01-02", "No Such Category", 1.0)]
+    with pytest.raises(ValueError, match="No Such Category"):
+        repo.bulk_add_expenses(rows, 2, user_id=ALICE)
+    assert repo.count_expenses(user_id=ALICE)["count"] == 4
+
+def test_bulk_insert_takes_user_id_only_by_keyword(repo):
+    with pytest.raises(TypeError):
+        repo.bulk_add_expenses(ROWS, ALICE)
+
+def test_single_expenses_may_use_a_custom_category(repo):
+    repo.add_expense("2024-02-05", "Kursus Bahasa", 40.0, "", user_id=CAROL)
+    custom = repo.get_spending_totals("2024-02-01", "2024-02-29", user_id=CAROL)
+    assert (custom["category_breakdown"], custom["other_total"], custom["needs_total"]) == \
+        ({"Kursus Bahasa": 40.0}, 40.0, 0)
+
+# ==================== EXPENSE QUERIES ====================
+
+def test_date_ranges_are_inclusive_and_newest_first(expenses):
+    february = expenses.get_expenses("2024-02-01", "2024-02-29", user_id=ALICE)
+    assert sorted(e["amount"] for e in february) == [7.0, 10.0, 25.0, 50.0]
+    assert [e["date"] for e in february] == sorted((e["date"] for e in february), reverse=True)
+    assert sorted(e["note"] for e in february) == ["", "", "b", "c"]
+    assert len(expenses.get_expenses(user_id=ALICE)) == 6
+    assert expenses.get_expense_date_range(ALICE) == ("2024-01-31", "2024-03-01")
+    assert expenses.get_expense_date_range(999) == (None, None)
+
+def test_keyset_pages_cover_every_row_once(expenses):
+    walked, after = [], None
+    while True:
+        page = expenses.get_expenses_page(after=after, limit=2, user_id=ALICE)
+        if not page:
+            break
+        walked.extend(page)
+        after = (page[-1]["date"], page[-1]["id"])
+    assert len({e["id"] for e in walked}) == 6
+    assert [(e["date"], e["id"]) for e in walked] == sorted(((e["date"], e["id"]) for e in walked), reverse=True)
+    assert [e["amount"] for e in expenses.get_expenses_page("Hobi", user_id=ALICE)] == [5.0, 25.0, 100.0]
+    assert [e["amount"] for e in expenses.get_expenses_page("Hobi", "2024-02-01", "2024-02-29",
+                                                            user_id=ALICE)] == [25.0]
+
+def test_counts_and_totals(expenses):
+    assert expenses.count_expenses(user_id=ALICE) == {"count": 6, "total": 197.0}
+    assert expenses.count_expenses("Hobi", "2024-02-01", None, user_id=ALICE) == {"count": 2, "total": 30.0}
+
+    totals = expenses.get_spending_totals("2024-02-01", "2024-02-29", user_id=ALICE)
+    assert (totals["total_expenses"], totals["expense_count"], totals["category_breakdown"]) == \
+        (92.0, 4, {"Transportasi": 50.0, "Hobi": 25.0, "Kesehatan": 10.0, "Hiburan": 7.0})
+    assert (totals["needs_total"], totals["wants_total"]) == (60.0, 32.0)
+    partial = expenses.get_spending_totals("2024-02-10", "2024-03-01", user_id=ALICE)
+    assert (partial["total_expenses"], partial["expense_count"]) == (47.0, 4)
+    assert expenses.get_spending_totals(user_id=ALICE)["total_expenses"] == 197.0
+    # A single bound is an open-ended range, not all time
+    assert expenses.get_spending_totals("2024-02-15", user_id=ALICE)["total_expenses"] == 47.0
+    assert expenses.get_spending_totals(None, "2024-02-01", user_id=ALICE)["total_expenses"] == 150.0
+
+    monthly = expenses.get_monthly_totals("2024-01", "2024-02", user_id=ALICE)
+    assert sorted(monthly) == ["2024-01", "2024-02"]
+    assert monthly["2024-02"]["total_expenses"] == 92.0
+
+def test_deletes_are_user_scoped_and_update_totals(expenses):
+    bob_expense = expenses.get_expenses(user_id=BOB)[0]["id"]
+    january = [e["id"] for e in expenses.get_expenses("2024-01-01", "2024-01-31", user_id=ALICE)]
+    assert expenses.delete_expenses([bob_expense], ALICE) == 0
+    assert expenses.delete_expenses(january, ALICE) == 1
+    assert expenses.get_spending_totals("2024-01-01", "2024-01-31", user_id=ALICE)["total_expenses"] == 0
+    assert sorted(expenses.get_monthly_totals(user_id=ALICE)) == ["2024-02", "2024-03"]
+    assert expenses.count_expenses(user_id=BOB) == {"count": 1, "total": 1000.0}
+
+# ==================== GOALS AND BUDGET ====================
+
+def test_savings_goals(repo):
+    repo.add_savings_goal("Laptop", 15_000_000, "2025-12-31", 1, user_id=ALICE)
+    repo.add_savings_goal("Trip", 5_000_000, None, 3, user_id=ALICE)
+    goals = repo.get_savings_goals(ALICE)
+    assert [g["goal_name"] for g in goals] == ["Trip", "Laptop"]
+    assert (goals[1]["target_amount"], goals[1]["current_amount"], goals[1]["deadline"], goals[1]["priority"]) == \
+        (15_000_000, 0, "2025-12-31", 1)
+    repo.update_goal_progress(goals[1]["id"], 2_500_000, ALICE)
+    repo.update_goal_progress(goals[1]["id"], 9_999_999, BOB)
+    assert repo.get_savings_goals(ALICE)[1]["current_amount"] == 2_500_000
+    assert repo.get_savings_goals(BOB) == []
+
+def test_budget_allocation(repo):
+    assert repo.get_budget_allocation(ALICE) == {"needs_percentage": 50.0, "wants_percentage": 30.0,
+                                                 "savings_percentage": 20.0}
+    repo.save_budget_allocation(60, 25, 15, ALICE)
+    assert repo.get_budget_allocation(ALICE) == {"needs_percentage": 60.0, "wants_percentage": 25.0,
+                                                 "savings_percentage": 15.0}
+    assert repo.get_budget_allocation(BOB)["needs_percentage"] == 50.0
+    with pytest.raises(ValueError):
+        repo.save_budget_allocation(60, 30, 20, ALICE)
+
+# ==================== SQLITE FILES ====================
+
+def test_sqlite_repositories_keep_their_own_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(finance_db, "DB_PATH", str(tmp_path / "module.db"))
+    first = SQLiteRepository(str(tmp_path / "first.db"))
+    second = SQLiteRepository(str(tmp_path / "second.db"))
+    try:
+        first.add_expense("2024-01-01", "Hobi", 1.0, user_id=ALICE)
+        second.bulk_add_expenses([("2024-01-01", "Hobi", 2.0)] * 2, user_id=ALICE)
+        assert first.count_expenses(user_id=ALICE) == {"count": 1, "total": 1.0}
+        assert second.count_expenses(user_id=ALICE) == {"count": 2, "total": 4.0}
+        assert finance_db.DB_PATH == str(tmp_path / "module.db")
+        assert not os.path.exists(tmp_path / "module.db")
+    finally:
+        first.close()
+        second.close()
@@ -0,0 +1,70 @@
+# tests/test_query_plans.py
+"""Query-plan regression test: the SQL finance_db runs for the hot reads never scans the expenses table."""
+import random
+import re
+import sqlite3
+from datetime import date, timedelta
+
+import pytest
+
+import finance_db
+from finance_calculator import ALL_CATEGORIES
+
+USERS = 10
+ROWS_PER_USER = 1_000
+
+@pytest.fixture
+def database(temp_db):
+    rng = random.Random(3)
+    first = date(2023, 1, 1)
+    for user_id in range(1, USERS + 1):
+        finance_db.bulk_add_expenses([((first + timedelta(days=rng.randrange(730))).isoformat(),
+                                       rng.choice(ALL_CATEGORIES), float(rng.randrange(1_000, 500_000)))
+                                      for _ in range(ROWS_PER_USER)], user_id=user_id)
+    with finance_db.get_connection() as conn:
+        conn.execute("ANALYZE")
+    finance_db.close_connections()
+    return temp_db
+
+@pytest.fixture
+def statements(database, monkeypatch):
+    """Every statement run on pooled connections opened from here on, with its parameters inlined"""
+    traced = []
+    connect = finance_db.ConnectionPool._connect
+
+    def traced_connect(pool):
+        conn = connect(pool)
+        conn.set_trace_callback(traced.append)
+        return conn
+    monkeypatch.setattr(finance_db.ConnectionPool, "_connect", traced_connect)
+    return traced
+
+def expense_scans(conn: sqlite3.Connection, sql: str) -> list:
+    """Plan steps of `sql` that scan the expenses table (under its own name or an alias)"""
+    names = {"expenses"} | set(re.findall(r"\bexpenses\s+(?:AS\s+)?(?!WHERE|ORDER|GROUP|ON\b)(\w+)", sql, re.I))
+    plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+    return [step for step in plan if step.split(" ")[0] == "SCAN" and step.split(" ")[1] in names]
+
+def test_hot_reads_use_indexes(database, statements):
+    user_id = 7
+    finance_db.get_expenses(user_id=user_id)
+    finance_db.get_expenses("2024-03-01", "2024-03-31", user_id=user_id)
+    finance_db.get_expense_summary_by_category(user_id)
+    finance_db.get_spending_totals(user_id=user_id)
+    finance_db.get_spending_totals("2024-03-01", "2024-03-31", user_id=user_id)
+    finance_db.get_spending_totals("2024-03-05", "2024-04-20", user_id=user_id)
+    finance_db.get_spending_totals_for_windows([("2024-03-01", "2024-03-10"), ("2024-01-01", "2024-06-30")], user_id)
+    first_page = finance_db.get_expenses_page(user_id=user_id)
+    finance_db.get_expenses_page("Hobi", after=(first_page[-1]["date"], first_page[-1]["id"]), user_id=user_id)
+    finance_db.count_expenses("Hobi", "2024-01-01", None, user_id=user_id)
+
+    reads = [sql for sql in statements if sql.lstrip().upper().startswith(("SELECT", "WITH"))]
+    assert any("FROM expenses" in sql for sql in reads)
+    assert any("monthly_category_totals" in sql for sql in reads)
+
+    conn = sqlite3.connect(database)
+    try:
+        scans = {sql: expense_scans(conn, sql) for sql in reads}
+    finally:
+        conn.close()
+    assert {sql: steps for sql, steps in scans.items() if steps} == {}
@@ -0,0 +1,140 @@
+# tests/test_sessions.py
+"""Sign-in and session binding: passphrases, signed session tokens and what the app shows a visitor."""
+import os
+import time
+
+import pytest
+
+import finance_db
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+@pytest.fixture(autouse=True)
+def database(temp_db):
+    finance_db.init_database()
+
+# ==================== PASSPHRASES ====================
+
+def test_sign_in_needs_the_right_passphrase():
+    alice = finance_db.create_user("alice", "correct horse")
+    assert finance_db.authenticate("alice", "correct horse") == alice
+    assert finance_db.authenticate("alice", "wrong horse") is None
+    assert finance_db.authenticate("nobody", "correct horse") is None
+
+def test_users_without_a_passphrase_cannot_sign_in():
+    finance_db.get_or_create_user("legacy")
+    assert finance_db.authenticate("legacy", "") is None
+    assert not finance_db.has_passphrase(finance_db.DEFAULT_USER_ID)
+
+def test_create_user_rejects_taken_names_and_short_passphrases():
+    finance_db.create_user("alice", "correct horse")
+    with pytest.raises(ValueError, match="taken"):
+        finance_db.create_user("alice", "another one")
+    with pytest.raises(ValueError, match="at least"):
+        finance_db.create_user("bob", "short")
+
+def test_passphrases_are_not_stored_in_clear():
+    alice = finance_db.create_user("alice", "correct horse")
+    with finance_db.get_connection() as conn:
+        stored = conn.execute("SELECT passphrase_hash FROM users WHERE id=?", (alice,)).fetchone()[0]
+    assert "correct horse" not in stored
+    assert "passphrase_hash" not in finance_db.list_users()[0]
+
+# ==================== SESSION TOKENS ====================
+
+def test_session_token_binds_its_user():
+    alice = finance_db.create_user("alice", "correct horse")
+    assert finance_db.user_for_session_token(finance_db.issue_session_token(alice)) == alice
+
+def test_forged_and_expired_tokens_bind_nobody():
+    alice = finance_db.create_user("alice", "correct horse")
+    bob = finance_db.create_user("bob", "battery staple")
+    token = finance_db.issue_session_token(alice)
+    _, expires, signature = token.split(".")
+
+    assert finance_db.user_for_session_token(f"{bob}.{expires}.{signature}") is None
+    assert finance_db.user_for_session_token(f"{alice}.{int(expires) + 1}.{signature}") is None
+    assert finance_db.user_for_session_token(str(alice)) is None
+    assert finance_db.user_for_session_token("") is None
+    assert finance_db.user_for_session_token(finance_db.issue_session_token(alice, ttl=-1)) is None
+    # Users who never signed in have no session key to sign with
+    legacy = finance_db.get_or_create_user("legacy")
+    assert finance_db.user_for_session_token(f"{legacy}.{int(time.time()) + 60}.{signature}") is None
+
+def test_changing_the_passphrase_ends_existing_sessions():
+    alice = finance_db.create_user("alice", "correct horse")
+    token = finance_db.issue_session_token(alice)
+    finance_db.set_passphrase(alice, "a new passphrase")
+    assert finance_db.user_for_session_token(token) is None
+    assert finance_db.authenticate("alice", "correct horse") is None
+    assert finance_db.user_for_session_token(finance_db.issue_session_token(alice)) == alice
+
+def test_cli_gives_an_existing_user_a_first_passphrase(monkeypatch, capsys):
+    answers = iter(["family passphrase", "family passphrase"])
+    monkeypatch.setattr(finance_db.getpass, "getpass", lambda prompt: next(answers))
+    assert finance_db.main(["set-passphrase", "--db", finance_db.DB_PATH]) == 0
+    assert finance_db.authenticate("default", "family passphrase") == finance_db.DEFAULT_USER_ID
+
+def test_cli_refuses_unknown_users_and_mismatched_passphrases(monkeypatch):
+    answers = iter(["family passphrase", "family passphrasf"])
+    monkeypatch.setattr(finance_db.getpass, "getpass", lambda prompt: next(answers))
+    assert finance_db.main(["set-passphrase", "--db", finance_db.DB_PATH, "--user", "nobody"]) == 1
+    assert finance_db.main(["set-passphrase", "--db", finance_db.DB_PATH]) == 1
+    assert not finance_db.has_passphrase(finance_db.DEFAULT_USER_ID)
+
+# ==================== APP ====================
+
+def run_app(**query_params):
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(os.path.join(ROOT, "streamlit_app.py"), default_timeout=120)
+    app.query_params.update(query_params)
+    return app.run()
+
+def sidebar_text(app) -> str:
+    return " ".join(str(element.value) for element in app.sidebar.markdown)
+
+def test_typed_user_parameters_do_not_open_another_household():
+    alice = finance_db.create_user("alice", "correct horse")
+    finance_db.save_user_profile("Alice Secret", 9_000_000, user_id=alice)
+    finance_db.save_user_profile("Default Household", 5_000_000, user_id=finance_db.DEFAULT_USER_ID)
+
+    for query in ({"user": "alice"}, {"user": str(alice)}, {"session": str(alice)}):
+        app = run_app(**query)
+        assert not app.exception
+        assert "Alice Secret" not in sidebar_text(app)
+        assert "Default Household" in sidebar_text(app)
+
+def test_visitors_cannot_set_the_open_household_passphrase():
+    app = run_app()
+    assert not app.exception
+    labels = [element.label for element in app.text_input]
+    assert labels and not any("New passphrase" in label for label in labels)
+    # Only the sign-in and create-account forms are offered
+    assert {element.key for element in app.text_input if element.key} <= {
+        "api_key", "sign_in_username", "sign_in_passphrase", "new_username", "new_passphrase", "new_passphrase_repeat"}
+    assert not finance_db.has_passphrase(finance_db.DEFAULT_USER_ID)
+
+def test_signed_token_opens_its_household():
+    alice = finance_db.create_user("alice", "correct horse")
+    finance_db.save_user_profile("Alice Secret", 9_000_000, user_id=alice)
+
+    app = run_app(session=finance_db.issue_session_token(alice))
+    assert not app.exception
+    assert "Alice Secret" in sidebar_text(app)
+
+def test_protected_default_household_asks_visitors_to_sign_in():
+    finance_db.save_user_profile("Default Household", 5_000_000, user_id=finance_db.DEFAULT_USER_ID)
+    finance_db.set_passphrase(finance_db.DEFAULT_USER_ID, "family passphrase")
+
+    app = run_app()
+    assert not app.exception
+    assert "Sign in" in app.info[0].value
+    assert "Default Household" not in sidebar_text(app)
+
+    app.text_input(key="sign_in_username").set_value("default")
+    app.text_input(key="sign_in_passphrase").set_value("family passphrase")
+    app.button[0].click().run()
+    assert not app.exception
+    assert "Default Household" in sidebar_text(app)
+    assert finance_db.user_for_session_token(app.query_params["session"]) == finance_db.DEFAULT_USER_ID
@@ -0,0 +1,143 @@
+# tests/test_shards.py
+"""Sharded storage: moving users between shard files, rebalancing, the router's pool LRU and cross-shard reads."""
+import sqlite3
+
+import pytest
+
+import finance_db
+
+ROWS = [("2024-01-05", "Hobi", 100.0), ("2024-01-20", "Transportasi", 40.0), ("2024-02-03", "Hiburan", 25.0)]
+
+@pytest.fixture(autouse=True)
+def database(temp_db):
+    finance_db.init_database()
+
+@pytest.fixture
+def users():
+    """Three users on the catalog file, each with expenses, a goal and a custom category"""
+    ids = []
+    for index, name in enumerate(("alice", "bob", "carol")):
+        user_id = finance_db.get_or_create_user(name)
+        finance_db.bulk_add_expenses([(day, category, amount * (index + 1)) for day, category, amount in ROWS],
+                                     user_id=user_id)
+        finance_db.add_savings_goal(f"Goal {name}", 1_000_000, user_id=user_id)
+        finance_db.save_custom_category("Donasi", "Needs", user_id=user_id)
+        ids.append(user_id)
+    return ids
+
+def snapshot(user_id: int):
+    """Everything a user sees, without row ids"""
+    return (sorted((e["date"], e["category"], e["amount"]) for e in finance_db.get_expenses(user_id=user_id)),
+            [g["goal_name"] for g in finance_db.get_savings_goals(user_id)],
+            finance_db.get_custom_categories(user_id),
+            finance_db.get_monthly_totals(user_id=user_id))
+
+def rows_on(shard, user_id: int) -> int:
+    with finance_db._shard_connection(shard) as conn:
+        return conn.execute("SELECT COUNT(*) FROM expenses WHERE user_id=?", (user_id,)).fetchone()[0]
+
+# ==================== MOVE USER ====================
+
+def test_move_copies_everything_and_clears_the_source(users):
+    alice = users[0]
+    before = snapshot(alice)
+    version = finance_db.get_data_version(alice)
+
+    assert finance_db.move_user(alice, "shard-x") > len(ROWS)
+    assert finance_db.list_shards() == [None, "shard-x"]
+    assert snapshot(alice) == before
+    assert (rows_on(None, alice), rows_on("shard-x", alice)) == (0, len(ROWS))
+    assert finance_db.get_data_version(alice) != version
+    # Moving to where the user already is does nothing
+    assert finance_db.move_user(alice, "shard-x") == 0
+
+def test_unknown_users_cannot_be_moved():
+    with pytest.raises(ValueError, match="Unknown user"):
+        finance_db.move_user(999, "shard-x")
+
+def test_failed_move_reports_its_error_and_can_be_retried(users, monkeypatch):
+    alice = users[0]
+    before = snapshot(alice)
+    tables = finance_db.USER_TABLES
+
+    # The copy fails after the expenses were already copied into the target
+    monkeypatch.setattr(finance_db, "USER_TABLES", ("user_profile", "expenses", "no_such_table"))
+    with pytest.raises(sqlite3.OperationalError) as failure:
+        finance_db.move_user(alice, "shard-x")
+    assert "locked" not in str(failure.value) and "in use" not in str(failure.value)
+
+    # Nothing changed: the user is still on the catalog and the target copy was rolled back
+    assert finance_db._get_router().shard_of(alice) is None
+    assert snapshot(alice) == before
+    assert rows_on("shard-x", alice) == 0
+
+    monkeypatch.setattr(finance_db, "USER_TABLES", tables)
+    assert finance_db.move_user(alice, "shard-x") > 0
+    assert snapshot(alice) == before
+
+# ==================== REBALANCE ====================
+
+def test_rebalance_moves_users_to_their_default_shard_once(users):
+    before = {user_id: snapshot(user_id) for user_id in users}
+    reported = []
+
+    moved = finance_db.rebalance(2, lambda user_id, shard: reported.append((user_id, shard)))
+
+    # The default user and the three new ones all move off the catalog
+    everyone = [user["id"] for user in finance_db.list_users()]
+    assert moved["users"] == len(everyone) == 4
+    assert sorted(reported) == [(user_id, f"shard-{user_id % 2}") for user_id in sorted(everyone)]
+    assert {user["id"]: user["shard"] for user in finance_db.list_users()} == \
+        {user_id: f"shard-{user_id % 2}" for user_id in everyone}
+    assert {user_id: snapshot(user_id) for user_id in users} == before
+    assert finance_db.rebalance(2) == {"users": 0, "rows": 0}
+
+    # Back onto a single file
+    assert finance_db.rebalance(0)["users"] == 4
+    assert finance_db.list_shards() == [None]
+    assert {user_id: snapshot(user_id) for user_id in users} == before
+
+# ==================== ROUTER ====================
+
+def test_router_closes_the_least_recently_used_pool(tmp_path):
+    router = finance_db.ShardRouter(str(tmp_path / "catalog.db"), max_open=2)
+    try:
+        first, second = router.pool("a"), router.pool("b")
+        assert router.pool("a") is first
+        third = router.pool("c")
+
+        assert second.closed and not first.closed and not third.closed
+        assert list(router._pools) == ["a", "c"]
+        # An evicted shard is opened again on its next use
+        reopened = router.pool("b")
+        assert reopened is not second and not reopened.closed
+        assert first.closed
+    finally:
+        router.close()
+
+def test_router_paths_and_default_shards(tmp_path):
+    router = finance_db.ShardRouter(str(tmp_path / "finance.db"), shard_count=4)
+    assert router.shard_path(None) == str(tmp_path / "finance.db")
+    assert router.shard_path("shard-3") == str(tmp_path / "finance.shard-3.db")
+    assert router.default_shard(7) == "shard-3"
+    assert router.default_shard(7, finance_db.PER_USER_SHARDS) == "user-7"
+    assert router.default_shard(7, 0) is None
+
+# ==================== CROSS-SHARD READS ====================
+
+def test_global_totals_and_stats_span_every_shard(users):
+    finance_db.move_user(users[1], "shard-x")
+    finance_db.move_user(users[2], "shard-y")
+
+    totals = finance_db.get_global_monthly_totals()
+    assert sorted(totals) == ["2024-01", "2024-02"]
+    assert totals["2024-01"]["total_expenses"] == pytest.approx(140.0 * 6)
+    assert totals["2024-01"]["category_breakdown"] == pytest.approx({"Hobi": 600.0, "Transportasi": 240.0})
+    assert totals["2024-02"]["expense_count"] == 3
+    assert finance_db.get_global_monthly_totals("2024-02", "2024-02")["2024-02"]["total_expenses"] == 150.0
+
+    stats = {row["shard"]: row for row in finance_db.get_shard_stats()}
+    assert sorted(stats) == ["catalog", "shard-x", "shard-y"]
+    assert (stats["catalog"]["users"], stats["catalog"]["expenses"], stats["catalog"]["total_expenses"]) == (2, 3, 165.0)
+    assert (stats["shard-y"]["users"], stats["shard-y"]["expenses"], stats["shard-y"]["active_goals"]) == (1, 3, 1)
+    assert stats["shard-x"]["path"].endswith("finance_data.shard-x.db")